@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.docx_backends import available_backends  # noqa: E402
+from src.docx_reader import read_docx_text  # noqa: E402
+
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+# Minimal OPC package parts so python-docx can open the generated file too.
+_CONTENT_TYPES = (
+    "<?xml version='1.0' encoding='UTF-8' standalone='yes'?>"
+    "<Types xmlns='http://schemas.openxmlformats.org/package/2006/content-types'>"
+    "<Default Extension='rels' "
+    "ContentType='application/vnd.openxmlformats-package.relationships+xml'/>"
+    "<Default Extension='xml' ContentType='application/xml'/>"
+    "<Override PartName='/word/document.xml' ContentType='application/"
+    "vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml'/>"
+    "</Types>"
+)
+_RELS = (
+    "<?xml version='1.0' encoding='UTF-8' standalone='yes'?>"
+    "<Relationships "
+    "xmlns='http://schemas.openxmlformats.org/package/2006/relationships'>"
+    "<Relationship Id='rId1' Type='http://schemas.openxmlformats.org/"
+    "officeDocument/2006/relationships/officeDocument' "
+    "Target='word/document.xml'/>"
+    "</Relationships>"
+)
+
+
+def build_docx(path: Path, *, paragraphs: int, numbered: bool) -> None:
+    if numbered:
+        ppr = (
+            "<w:pPr><w:numPr><w:ilvl w:val='0'/><w:numId w:val='1'/></w:numPr></w:pPr>"
+        )
+    else:
+        ppr = "<w:pPr><w:pStyle w:val='Normal'/></w:pPr>"
+
+    parts = [
+        "<?xml version='1.0' encoding='UTF-8' standalone='yes'?>",
+        f"<w:document xmlns:w='{_W_NS}'><w:body>",
+    ]
+    for i in range(paragraphs):
+        parts.append(
+            f"<w:p>{ppr}<w:r><w:rPr><w:b/></w:rPr>"
+            f"<w:t>Paragraph {i} text with some words in it to pad the line.</w:t>"
+            "</w:r><w:r><w:tab/><w:t xml:space='preserve'> more text </w:t></w:r>"
+            "</w:p>"
+        )
+    parts.append("<w:sectPr/></w:body></w:document>")
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _RELS)
+        zf.writestr("word/document.xml", "".join(parts))
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Benchmark DOCX text extraction.")
+    _ = p.add_argument("--paragraphs", type=int, default=100_000)
+    _ = p.add_argument("--unnumbered", action="store_true")
+    _ = p.add_argument("--repeat", type=int, default=3)
+    _ = p.add_argument(
+        "--backend",
+        action="append",
+        choices=["stdlib", "lxml"],
+        help="Backend(s) to measure (default: every installed backend).",
+    )
+    ns = p.parse_args()
+    backends: list[str] = ns.backend or available_backends()
+
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "bench.docx"
+        build_docx(path, paragraphs=ns.paragraphs, numbered=not ns.unnumbered)
+        with zipfile.ZipFile(path) as zf:
+            xml_mb = zf.getinfo("word/document.xml").file_size / 1e6
+
+        for backend in backends:
+            timings: list[float] = []
+            for _ in range(ns.repeat):
+                t0 = time.perf_counter()
+                _ = read_docx_text(path, backend=backend)
+                timings.append(time.perf_counter() - t0)
+
+            tracemalloc.start()
+            _ = read_docx_text(path, backend=backend)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(
+                f"backend={backend} paragraphs={ns.paragraphs} "
+                f"document.xml={xml_mb:.1f}MB best={min(timings):.3f}s "
+                f"peak_traced={peak / 1e6:.1f}MB"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPT = ROOT / "generate_prompts.py"
+
+# Startup budget for commands that never touch the network (best of --repeat).
+DEFAULT_BUDGET_MS = 250.0
+
+
+def _run(args: list[str], *, importtime: bool = False) -> tuple[float, str]:
+    cmd = [sys.executable, *(["-X", "importtime"] if importtime else []), *args]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+    elapsed = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed: {proc.stderr.strip()}")
+    return elapsed, proc.stderr
+
+
+def _slowest_imports(stderr: str, top: int) -> list[tuple[int, str]]:
+    # ``-X importtime`` lines: "import time: self [us] | cumulative | name".
+    # Only top-level imports (one-space indent) are listed.
+    found: list[tuple[int, str]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        if name.startswith("  "):
+            continue
+        found.append((int(cumulative), name.strip()))
+    return sorted(found, reverse=True)[:top]
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Benchmark CLI startup time.")
+    _ = p.add_argument("--repeat", type=int, default=10)
+    _ = p.add_argument("--top", type=int, default=8)
+    _ = p.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    ns = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        script = Path(td) / "script.txt"
+        _ = script.write_text("1. Hello\n2. World\n", encoding="utf-8")
+        commands = {
+            "python -c pass": ["-c", "pass"],
+            "--version": [str(SCRIPT), "--version"],
+            "--print-instructions": [
+                str(SCRIPT),
+                "--input",
+                str(script),
+                "--print-instructions",
+            ],
+            "--dry-run": [
+                str(SCRIPT),
+                "--input",
+                str(script),
+                "--output",
+                str(Path(td) / "out.csv"),
+                "--dry-run",
+            ],
+        }
+
+        over = 0
+        for label, args in commands.items():
+            best = min(_run(args)[0] for _ in range(ns.repeat)) * 1000
+            budget = (
+                "" if label.startswith("python") else f" budget={ns.budget_ms:.0f}ms"
+            )
+            flag = " OVER BUDGET" if budget and best > ns.budget_ms else ""
+            over += bool(flag)
+            print(f"{label}: best={best:.0f}ms{budget}{flag}")
+
+        _, stderr = _run(commands["--dry-run"], importtime=True)
+        print(f"slowest imports for --dry-run (cumulative, top {ns.top}):")
+        for us, name in _slowest_imports(stderr, ns.top):
+            print(f"  {us / 1000:7.1f}ms {name}")
+
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
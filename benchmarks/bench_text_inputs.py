@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import argparse
+import bz2
+import gzip
+import importlib
+import lzma
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.parser import parse_numbered_paragraphs  # noqa: E402
+from src.text_input import open_text_input  # noqa: E402
+
+
+def _zstd_compressor() -> Callable[[bytes], bytes] | None:
+    try:
+        zstandard = importlib.import_module("zstandard")
+    except ImportError:
+        return None
+    return zstandard.ZstdCompressor().compress
+
+
+def build_script(paragraphs: int) -> bytes:
+    lines = [
+        f"{i}. Paragraph {i} text with some words in it to pad the line.\n"
+        "A second line that continues the same paragraph.\n"
+        for i in range(1, paragraphs + 1)
+    ]
+    return "".join(lines).encode("utf-8")
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Benchmark compressed script inputs.")
+    _ = p.add_argument("--paragraphs", type=int, default=200_000)
+    _ = p.add_argument("--repeat", type=int, default=3)
+    ns = p.parse_args()
+
+    codecs: dict[str, Callable[[bytes], bytes] | None] = {
+        ".txt": lambda data: data,
+        ".txt.gz": gzip.compress,
+        ".txt.bz2": bz2.compress,
+        ".txt.xz": lzma.compress,
+        ".txt.zst": _zstd_compressor(),
+    }
+    raw = build_script(ns.paragraphs)
+    raw_mb = len(raw) / 1e6
+
+    with tempfile.TemporaryDirectory() as td:
+        for suffix, compress in codecs.items():
+            if compress is None:
+                print(f"input={suffix} skipped (codec not installed)")
+                continue
+            path = Path(td) / f"bench{suffix}"
+            _ = path.write_bytes(compress(raw))
+
+            timings: list[float] = []
+            for _ in range(ns.repeat):
+                t0 = time.perf_counter()
+                with open_text_input(path) as f:
+                    _ = parse_numbered_paragraphs(f)
+                timings.append(time.perf_counter() - t0)
+
+            tracemalloc.start()
+            with open_text_input(path) as f:
+                _ = parse_numbered_paragraphs(f)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            best = min(timings)
+            print(
+                f"input={suffix} size={path.stat().st_size / 1e6:.1f}MB "
+                f"text={raw_mb:.1f}MB best={best:.3f}s "
+                f"throughput={raw_mb / best:.1f}MB/s peak_traced={peak / 1e6:.1f}MB"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
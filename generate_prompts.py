@@ -1,22 +1,52 @@
 from __future__ import annotations
 
 import argparse
-import csv
-import json
 import os
 import sys
-import tempfile
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator, Sequence
 from dataclasses import dataclass
 from pathlib import Path
-from typing import cast
+from typing import TYPE_CHECKING, NoReturn, cast
 
-from dotenv import load_dotenv
+from src.batch import (
+    InputSource,
+    Prefetcher,
+    collect_sources,
+    interleave_ready,
+    map_completed,
+    map_ordered,
+)
+from src.doc_cache import DocumentCache, source_digest
+from src.docx_reader import iter_docx_paragraphs
+from src.download_cache import DownloadCache
+from src.openai_client import (
+    DEFAULT_INSTRUCTIONS,
+    OpenAIClient,
+    OpenAIClientConfig,
+    OpenAIClientPool,
+    PromptResult,
+)
+from src.output import (
+    BackgroundWriter,
+    FlushPolicy,
+    HeaderMismatchError,
+    JsonlSink,
+    ResultWriter,
+    Sink,
+    build_fieldnames,
+)
+from src.parser import Paragraph, Selection, Shard, iter_numbered_paragraphs
+from src.text_input import open_text_input
 
-from src.docx_reader import read_docx_text
-from src.openai_client import DEFAULT_INSTRUCTIONS, OpenAIClient, OpenAIClientConfig
-
-from src.parser import Paragraph, parse_numbered_paragraphs
-from src.yandex_docx import download_public_file
+# The SQLite store and queue (sqlite3), merging and the job server are only
+# imported by the commands that use them.
+if TYPE_CHECKING:
+    from src.result_store import ResultStore
+    from src.server import JobFn, JobSink
+    from src.work_queue import Task, WorkQueue
+    from src.yandex_docx import DownloadStats, HttpFetcher
 
 __version__ = "0.1.0"
 
@@ -24,8 +54,11 @@ __version__ = "0.1.0"
 @dataclass(frozen=True, slots=True)
 class Args:
     input: Path | None
-    yandex_url: str | None
-    output: Path
+    yandex_urls: list[str]
+    yandex_folders: list[str]
+    input_dir: Path | None
+    inputs_from: Path | None
+    output: Path | None
 
     model: str | None
     base_url: str | None
@@ -33,11 +66,15 @@ class Args:
     store: bool
     temperature: float
     max_output_tokens: int
+    workers: int
+    download_workers: int
+    http_timeout: float | None
 
     start: int | None
     end: int | None
     ids: str | None
     limit: int | None
+    shard: str | None
 
     append: bool
     format: str
@@ -45,12 +82,69 @@ class Args:
     jsonl: Path | None
     include_meta: bool
 
+    ndjson: bool
+    flush_every: int
+    flush_interval_ms: int
+    fsync: bool
+    sqlite: Path | None
+    sqlite_commit_interval: int | None
+    queue: Path | None
+    cache_dir: Path | None
+    cache_max_mb: int
+
     dry_run: bool
     print_instructions: bool
 
 
-def build_arg_parser() -> argparse.ArgumentParser:
-    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+def _add_model_arguments(parser: argparse.ArgumentParser) -> None:
+    _ = parser.add_argument(
+        "--model",
+        default=None,
+        help="Model name (defaults to env OPENAI_MODEL or gpt-4o-mini).",
+    )
+    _ = parser.add_argument(
+        "--base-url",
+        default=None,
+        help="OpenAI-compatible base URL (defaults to env OPENAI_BASE_URL).",
+    )
+    _ = parser.add_argument(
+        "--api-mode",
+        choices=["responses", "chat"],
+        default=None,
+        help="API mode (defaults to env OPENAI_API_MODE or responses).",
+    )
+    _ = parser.add_argument(
+        "--store",
+        action="store_true",
+        help="Enable OpenAI response storage (default: false).",
+    )
+    _ = parser.add_argument("--temperature", type=float, default=0.3)
+    _ = parser.add_argument("--max-output-tokens", type=int, default=800)
+
+
+def build_client_config(
+    *,
+    model: str | None,
+    base_url: str | None,
+    api_mode: str | None,
+    store: bool,
+    temperature: float,
+    max_output_tokens: int,
+) -> OpenAIClientConfig:
+    return OpenAIClientConfig(
+        model=model or os.environ.get("OPENAI_MODEL") or "gpt-4o-mini",
+        temperature=temperature,
+        max_output_tokens=max_output_tokens,
+        store=store,
+        base_url=base_url or os.environ.get("OPENAI_BASE_URL"),
+        api_mode=api_mode or os.environ.get("OPENAI_API_MODE") or "responses",
+    )
+
+
+def build_arg_parser(
+    parser_class: type[argparse.ArgumentParser] = argparse.ArgumentParser,
+) -> argparse.ArgumentParser:
+    parser: argparse.ArgumentParser = parser_class(
         prog="generate_prompts",
         description=(
             "Generate 1 English cinematic video prompt per numbered paragraph "
@@ -72,39 +166,57 @@ def build_arg_parser() -> argparse.ArgumentParser:
     )
     _ = group.add_argument(
         "--yandex-url",
-        dest="yandex_url",
-        help="Yandex Disk public URL to download (.docx).",
+        dest="yandex_urls",
+        action="append",
+        help="Yandex Disk public URL to download (.docx). Repeat for batch mode.",
+    )
+    _ = group.add_argument(
+        "--yandex-folder",
+        dest="yandex_folders",
+        action="append",
+        help=(
+            "Batch mode: Yandex Disk public folder URL; every .docx in it is "
+            "processed. Repeatable."
+        ),
+    )
+    _ = group.add_argument(
+        "--input-dir",
+        type=Path,
+        help="Batch mode: process every .txt/.docx file in this directory.",
+    )
+    _ = group.add_argument(
+        "--inputs-from",
+        type=Path,
+        help="Batch mode: file listing one input path or Yandex URL per line.",
     )
     _ = parser.add_argument(
         "--output",
-        required=True,
         type=Path,
-        help="Path to output CSV.",
+        help=(
+            "Path to output CSV. In batch mode, a directory that receives "
+            "one output per document. Optional with --sqlite."
+        ),
     )
 
+    _add_model_arguments(parser)
     _ = parser.add_argument(
-        "--model",
-        default=None,
-        help="Model name (defaults to env OPENAI_MODEL or gpt-4o-mini).",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of concurrent model calls shared by all documents (default: 1).",
     )
     _ = parser.add_argument(
-        "--base-url",
-        default=None,
-        help="OpenAI-compatible base URL (defaults to env OPENAI_BASE_URL).",
+        "--download-workers",
+        type=int,
+        default=4,
+        help="Number of documents downloaded and parsed concurrently (default: 4).",
     )
     _ = parser.add_argument(
-        "--api-mode",
-        choices=["responses", "chat"],
+        "--http-timeout",
+        type=float,
         default=None,
-        help="API mode (defaults to env OPENAI_API_MODE or responses).",
-    )
-    _ = parser.add_argument(
-        "--store",
-        action="store_true",
-        help="Enable OpenAI response storage (default: false).",
+        help="Read timeout in seconds for Yandex Disk requests (default: 60).",
     )
-    _ = parser.add_argument("--temperature", type=float, default=0.3)
-    _ = parser.add_argument("--max-output-tokens", type=int, default=800)
 
     _ = parser.add_argument(
         "--start",
@@ -129,6 +241,15 @@ def build_arg_parser() -> argparse.ArgumentParser:
         default=None,
         help="Process first N paragraphs in file order.",
     )
+    _ = parser.add_argument(
+        "--shard",
+        default=None,
+        metavar="K/N",
+        help=(
+            "Only process shard K of N: a contiguous block of the selection, "
+            "balanced by estimated token cost. Adds a 'shard' column."
+        ),
+    )
 
     _ = parser.add_argument(
         "--append",
@@ -137,9 +258,9 @@ def build_arg_parser() -> argparse.ArgumentParser:
     )
     _ = parser.add_argument(
         "--format",
-        choices=["csv", "tsv"],
+        choices=["csv", "tsv", "parquet"],
         default="csv",
-        help="Output format.",
+        help="Output format (parquet requires pyarrow).",
     )
     _ = parser.add_argument(
         "--encoding",
@@ -150,7 +271,10 @@ def build_arg_parser() -> argparse.ArgumentParser:
         "--jsonl",
         default=None,
         type=Path,
-        help="Optional JSONL output path (writes one JSON object per row).",
+        help=(
+            "Optional JSONL output path (writes one JSON object per row). "
+            "In batch mode, a directory."
+        ),
     )
     _ = parser.add_argument(
         "--include-meta",
@@ -158,6 +282,74 @@ def build_arg_parser() -> argparse.ArgumentParser:
         help="Include metadata columns: model, response_id, timestamp.",
     )
 
+    _ = parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help=(
+            "Cache parsed documents (keyed by content hash) and Yandex downloads "
+            "here (defaults to env PROMPTS_CACHE_DIR; disabled if unset)."
+        ),
+    )
+    _ = parser.add_argument(
+        "--ndjson",
+        action="store_true",
+        help=(
+            "Also stream every result to stdout as one JSON object per line, "
+            "in completion order (all metadata plus 'document')."
+        ),
+    )
+    _ = parser.add_argument(
+        "--flush-every",
+        type=int,
+        default=1,
+        help="Group commit: flush outputs after this many rows (default: every row).",
+    )
+    _ = parser.add_argument(
+        "--flush-interval-ms",
+        type=int,
+        default=0,
+        help="Group commit: also flush pending rows after this many ms (0: off).",
+    )
+    _ = parser.add_argument(
+        "--fsync",
+        action="store_true",
+        help="fsync outputs and the journal on every flush (survives power loss).",
+    )
+    _ = parser.add_argument(
+        "--sqlite",
+        type=Path,
+        default=None,
+        help=(
+            "SQLite database that keeps one row per (document, paragraph id, "
+            "model); reruns update rows in place. See the export subcommand."
+        ),
+    )
+    _ = parser.add_argument(
+        "--sqlite-commit-interval",
+        type=int,
+        default=None,
+        help="Rows per --sqlite transaction (default: 100).",
+    )
+    _ = parser.add_argument(
+        "--queue",
+        type=Path,
+        default=None,
+        help=(
+            "Add the selected paragraphs to this SQLite work queue instead of "
+            "generating them; run the worker subcommand to process it."
+        ),
+    )
+    _ = parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=256,
+        help=(
+            "Size cap for each --cache-dir cache (parsed documents, downloads); "
+            "least recently used entries are evicted."
+        ),
+    )
+
     _ = parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -179,223 +371,1191 @@ def select_paragraphs(
     start: int | None,
     end: int | None,
     limit: int | None,
+    shard: str | None = None,
 ) -> list[Paragraph]:
-    if ids_csv is not None:
-        raw_parts = [p.strip() for p in ids_csv.split(",")]
-        parts = [p for p in raw_parts if p]
-        try:
-            wanted = {int(p) for p in parts}
-        except ValueError as e:
-            raise ValueError("--ids must be a comma-separated list of integers") from e
-        return [p for p in paragraphs if p.id in wanted]
-
-    selected = paragraphs
-
-    if start is not None or end is not None:
-        if start is not None and end is not None and start > end:
-            raise ValueError("--start must be <= --end")
-        lo = start if start is not None else -(2**31)
-        hi = end if end is not None else 2**31 - 1
-        selected = [p for p in selected if lo <= p.id <= hi]
-
-    if limit is not None:
-        if limit < 0:
-            raise ValueError("--limit must be >= 0")
-        selected = selected[:limit]
-
+    selection = Selection.from_cli(ids_csv=ids_csv, start=start, end=end, limit=limit)
+    selected = selection.apply(paragraphs)
+    if shard is not None:
+        selected = Shard.from_cli(shard).apply(selected)
     return selected
 
 
-def parse_cli_args() -> Args:
-    ns = build_arg_parser().parse_args()
+def parse_cli_args(
+    argv: list[str] | None = None, parser: argparse.ArgumentParser | None = None
+) -> Args:
+    ns = (parser or build_arg_parser()).parse_args(argv)
     return Args(
         input=cast(Path | None, ns.input),
-        yandex_url=cast(str | None, ns.yandex_url),
-        output=cast(Path, ns.output),
+        yandex_urls=cast(list[str] | None, ns.yandex_urls) or [],
+        yandex_folders=cast(list[str] | None, ns.yandex_folders) or [],
+        input_dir=cast(Path | None, ns.input_dir),
+        inputs_from=cast(Path | None, ns.inputs_from),
+        output=cast(Path | None, ns.output),
         model=cast(str | None, ns.model),
         base_url=cast(str | None, ns.base_url),
         api_mode=cast(str | None, ns.api_mode),
         store=cast(bool, ns.store),
         temperature=cast(float, ns.temperature),
         max_output_tokens=cast(int, ns.max_output_tokens),
+        workers=cast(int, ns.workers),
+        download_workers=cast(int, ns.download_workers),
+        http_timeout=cast(float | None, ns.http_timeout),
         start=cast(int | None, ns.start),
         end=cast(int | None, ns.end),
         ids=cast(str | None, ns.ids),
         limit=cast(int | None, ns.limit),
+        shard=cast(str | None, ns.shard),
         append=cast(bool, ns.append),
         format=cast(str, ns.format),
         encoding=cast(str, ns.encoding),
         jsonl=cast(Path | None, ns.jsonl),
         include_meta=cast(bool, ns.include_meta),
+        ndjson=cast(bool, ns.ndjson),
+        flush_every=cast(int, ns.flush_every),
+        flush_interval_ms=cast(int, ns.flush_interval_ms),
+        fsync=cast(bool, ns.fsync),
+        sqlite=cast(Path | None, ns.sqlite),
+        sqlite_commit_interval=cast(int | None, ns.sqlite_commit_interval),
+        queue=cast(Path | None, ns.queue),
+        cache_dir=cast(Path | None, ns.cache_dir),
+        cache_max_mb=cast(int, ns.cache_max_mb),
         dry_run=cast(bool, ns.dry_run),
         print_instructions=cast(bool, ns.print_instructions),
     )
 
 
-def read_input_text(args: Args) -> str:
-    if args.input is not None:
-        suffix = args.input.suffix.lower()
-        if suffix == ".docx":
-            return read_docx_text(args.input)
-        return args.input.read_text(encoding="utf-8")
+def _parse_cached(
+    parse: Callable[[Selection | None], Iterable[Paragraph]],
+    digest: Callable[[], str],
+    *,
+    kind: str,
+    cache: DocumentCache | None,
+    selection: Selection | None,
+) -> Iterator[Paragraph]:
+    # Without a cache the selection is pushed down into extraction and parsing,
+    # and paragraphs are yielded while the rest is still being parsed. Cached
+    # entries always hold the whole document; callers select afterwards.
+    if cache is None:
+        yield from parse(selection)
+        return
+
+    key = cache.key(digest(), kind=kind)
+    cached = cache.load(key)
+    if cached is not None:
+        yield from cached
+        return
+
+    paragraphs = list(parse(None))
+    cache.store(key, paragraphs)
+    yield from paragraphs
+
+
+def read_source_paragraphs(
+    source: InputSource,
+    cache: DocumentCache | None = None,
+    selection: Selection | None = None,
+    *,
+    downloads: DownloadCache | None = None,
+    fetcher: HttpFetcher | None = None,
+) -> list[Paragraph]:
+    return list(
+        iter_source_paragraphs(
+            source, cache, selection, downloads=downloads, fetcher=fetcher
+        )
+    )
+
+
+def iter_source_paragraphs(
+    source: InputSource,
+    cache: DocumentCache | None = None,
+    selection: Selection | None = None,
+    *,
+    downloads: DownloadCache | None = None,
+    fetcher: HttpFetcher | None = None,
+) -> Iterator[Paragraph]:
+    # The result may still contain paragraphs outside ``selection``; apply it
+    # again to get the final selection. The input stays open until the
+    # iterator is exhausted or closed.
+    path = source.path
+    if path is not None:
+
+        def digest_file() -> str:
+            with path.open("rb") as f:
+                return source_digest(f)
 
-    if args.yandex_url is None:
+        if path.suffix.lower() == ".docx":
+            yield from _parse_cached(
+                lambda sel: iter_docx_paragraphs(path, selection=sel),
+                digest_file,
+                kind="docx",
+                cache=cache,
+                selection=selection,
+            )
+            return
+
+        def parse_text(sel: Selection | None) -> Iterator[Paragraph]:
+            # Compressed scripts are decoded as a stream, straight into the parser.
+            with open_text_input(path) as f:
+                yield from iter_numbered_paragraphs(f, sel)
+
+        yield from _parse_cached(
+            parse_text,
+            digest_file,
+            kind="txt",
+            cache=cache,
+            selection=selection,
+        )
+        return
+
+    if source.yandex_url is None:
         raise ValueError("Either --input or --yandex-url is required")
 
-    with tempfile.TemporaryDirectory() as td:
-        dest = Path(td) / "input.docx"
-        download_public_file(args.yandex_url, dest)
-        return read_docx_text(dest)
+    def report(stats: DownloadStats) -> None:
+        if stats.not_modified:
+            print(
+                f"{source.name}: not modified, using cached download", file=sys.stderr
+            )
+            return
+        retried = f", {stats.attempts - 1} resume(s)" if stats.attempts > 1 else ""
+        print(
+            f"downloaded {source.name}: {stats.size / 1e6:.1f} MB in "
+            f"{stats.seconds:.2f}s ({stats.throughput / 1e6:.1f} MB/s{retried})",
+            file=sys.stderr,
+        )
 
+    from src.yandex_docx import download_public_buffer
 
-def main() -> int:
-    _ = load_dotenv(dotenv_path=Path(".env"), override=False)
+    with download_public_buffer(
+        source.yandex_url,
+        path=source.yandex_path,
+        report=report,
+        cache=downloads,
+        fetcher=fetcher,
+    ) as buf:
 
-    args = parse_cli_args()
+        def parse_buffer(sel: Selection | None) -> Iterator[Paragraph]:
+            _ = buf.seek(0)
+            return iter_docx_paragraphs(buf, selection=sel)
 
-    try:
-        if args.print_instructions:
-            print(DEFAULT_INSTRUCTIONS)
-            return 0
+        def digest_buffer() -> str:
+            _ = buf.seek(0)
+            return source_digest(buf)
 
-        model = args.model or os.environ.get("OPENAI_MODEL") or "gpt-4o-mini"
-        base_url = args.base_url or os.environ.get("OPENAI_BASE_URL")
-        api_mode = args.api_mode or os.environ.get("OPENAI_API_MODE") or "responses"
-
-        text = read_input_text(args)
-        paragraphs = parse_numbered_paragraphs(text)
-        selected = select_paragraphs(
-            paragraphs,
-            ids_csv=args.ids,
-            start=args.start,
-            end=args.end,
-            limit=args.limit,
+        yield from _parse_cached(
+            parse_buffer,
+            digest_buffer,
+            kind="docx",
+            cache=cache,
+            selection=selection,
         )
 
-        total = len(selected)
-        print(f"processing {total} paragraph(s)", file=sys.stderr)
 
-        if total == 0:
-            if args.ids is not None:
-                available = ",".join(str(p.id) for p in paragraphs)
-                print(
-                    "warning: no paragraphs selected; check --ids or input numbering",
-                    file=sys.stderr,
-                )
-                print(f"requested ids: {args.ids}", file=sys.stderr)
-                print(f"available ids: {available}", file=sys.stderr)
-            else:
-                print(
-                    "warning: no paragraphs selected; check --start/--end/--limit",
-                    file=sys.stderr,
-                )
-            return 1
+@dataclass(frozen=True, slots=True)
+class _Document:
+    source: InputSource
+    # An iterator while the document is still being parsed (see ``run``).
+    selected: list[Paragraph] | Iterator[Paragraph]
+    writer: ResultWriter | None
 
-        if args.dry_run:
-            print("dry-run: skipping model calls and output writes", file=sys.stderr)
-            return 0
+    @property
+    def count(self) -> int | None:
+        # None until a streamed selection has been read to the end.
+        return len(self.selected) if isinstance(self.selected, list) else None
 
-        client = OpenAIClient(
-            OpenAIClientConfig(
-                model=model,
-                temperature=args.temperature,
-                max_output_tokens=args.max_output_tokens,
-                store=args.store,
-                base_url=base_url,
-                api_mode=api_mode,
-            )
+
+def _is_batch(args: Args, sources: list[InputSource]) -> bool:
+    return (
+        args.input_dir is not None
+        or args.inputs_from is not None
+        or bool(args.yandex_folders)
+        or len(sources) > 1
+    )
+
+
+def _warn_empty_selection(args: Args, paragraphs: list[Paragraph]) -> None:
+    if args.ids is not None:
+        available = ",".join(str(p.id) for p in paragraphs)
+        print(
+            "warning: no paragraphs selected; check --ids or input numbering",
+            file=sys.stderr,
+        )
+        print(f"requested ids: {args.ids}", file=sys.stderr)
+        print(f"available ids: {available}", file=sys.stderr)
+    else:
+        print(
+            "warning: no paragraphs selected; check --start/--end/--limit",
+            file=sys.stderr,
         )
 
-        delimiter = "\t" if args.format == "tsv" else ","
-        fieldnames = ["id", "paragraph", "prompt"]
-        if args.include_meta:
-            fieldnames += ["model", "response_id", "timestamp"]
-
-        output_mode = "a" if args.append else "w"
-        file_exists = args.output.exists()
-        file_size = args.output.stat().st_size if file_exists else 0
-
-        if args.append and file_exists and file_size > 0:
-            with args.output.open("r", newline="", encoding=args.encoding) as rf:
-                reader = csv.reader(rf, delimiter=delimiter)
-                try:
-                    existing_header = next(reader)
-                except StopIteration:
-                    existing_header = []
-
-            if existing_header != fieldnames:
-                print(
-                    f"error: header mismatch in {args.output} during --append",
-                    file=sys.stderr,
-                )
-                print(f"error: existing header: {existing_header}", file=sys.stderr)
-                print(f"error: expected header: {fieldnames}", file=sys.stderr)
-                print(
-                    "error: resolution: use consistent flags (e.g. --include-meta), a new --output path, or omit --append to overwrite",
-                    file=sys.stderr,
+
+def _print_header_mismatch(
+    e: HeaderMismatchError,
+    resolution: str = (
+        "use consistent flags (e.g. --include-meta), a new --output path, "
+        "or omit --append to overwrite"
+    ),
+) -> None:
+    print(f"error: {e}", file=sys.stderr)
+    print(f"error: existing header: {e.existing}", file=sys.stderr)
+    print(f"error: expected header: {e.expected}", file=sys.stderr)
+    print(f"error: resolution: {resolution}", file=sys.stderr)
+
+
+def build_export_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="generate_prompts export",
+        description="Export results stored with --sqlite to CSV/TSV/Parquet/JSONL.",
+    )
+    _ = parser.add_argument("--sqlite", required=True, type=Path)
+    _ = parser.add_argument("--output", required=True, type=Path)
+    _ = parser.add_argument(
+        "--format", choices=["csv", "tsv", "parquet"], default="csv"
+    )
+    _ = parser.add_argument("--encoding", default="utf-8")
+    _ = parser.add_argument("--jsonl", type=Path, default=None)
+    _ = parser.add_argument(
+        "--document",
+        default=None,
+        help="Only this document; without it a leading 'document' column is added.",
+    )
+    _ = parser.add_argument("--model", default=None, help="Only rows of this model.")
+    _ = parser.add_argument("--include-meta", action="store_true")
+    return parser
+
+
+def export_main(argv: list[str]) -> int:
+    ns = build_export_parser().parse_args(argv)
+    from src.result_store import ResultStore
+
+    sqlite = cast(Path, ns.sqlite)
+    document = cast(str | None, ns.document)
+    fmt = cast(str, ns.format)
+
+    try:
+        if not sqlite.exists():
+            raise ValueError(f"SQLite database not found: {sqlite}")
+        fieldnames = build_fieldnames(include_meta=cast(bool, ns.include_meta))
+        if document is None:
+            fieldnames = ["document", *fieldnames]
+
+        store = ResultStore(sqlite, readonly=True)
+        writer = ResultWriter(
+            cast(Path, ns.output),
+            fieldnames=fieldnames,
+            delimiter="\t" if fmt == "tsv" else ",",
+            encoding=cast(str, ns.encoding),
+            append=False,
+            jsonl=cast(Path | None, ns.jsonl),
+            parquet=fmt == "parquet",
+        )
+        try:
+            writer.open()
+            for row in store.iter_rows(
+                document=document, model=cast(str | None, ns.model)
+            ):
+                writer.write({k: row[k] for k in fieldnames})
+        finally:
+            writer.close()
+            store.close()
+    except Exception as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"exported {writer.wrote} row(s) to {writer.path}", file=sys.stderr)
+    return 0
+
+
+def build_merge_parser() -> argparse.ArgumentParser:
+    from src.merge import DEFAULT_RUN_SIZE
+
+    parser = argparse.ArgumentParser(
+        prog="generate_prompts merge",
+        description=(
+            "Merge CSV/TSV/JSONL result files (optionally .gz/.zst) into one, "
+            "keeping the newest row per id by timestamp, sorted by id."
+        ),
+    )
+    _ = parser.add_argument("inputs", nargs="+", type=Path, metavar="INPUT")
+    _ = parser.add_argument("--output", required=True, type=Path)
+    _ = parser.add_argument(
+        "--format", choices=["csv", "tsv", "parquet"], default="csv"
+    )
+    _ = parser.add_argument("--encoding", default="utf-8")
+    _ = parser.add_argument("--jsonl", type=Path, default=None)
+    _ = parser.add_argument(
+        "--run-size",
+        type=int,
+        default=DEFAULT_RUN_SIZE,
+        help=(
+            "Ids kept in memory before a sorted run is spilled to disk "
+            f"(default: {DEFAULT_RUN_SIZE})."
+        ),
+    )
+    _ = parser.add_argument(
+        "--tmp-dir",
+        type=Path,
+        default=None,
+        help="Directory for spilled runs (default: the system temp directory).",
+    )
+    return parser
+
+
+def merge_main(argv: list[str]) -> int:
+    ns = build_merge_parser().parse_args(argv)
+    from src.merge import ResultMerger, read_result_header
+
+    inputs = cast(list[Path], ns.inputs)
+    output = cast(Path, ns.output)
+    jsonl = cast(Path | None, ns.jsonl)
+    encoding = cast(str, ns.encoding)
+    fmt = cast(str, ns.format)
+
+    try:
+        for path in inputs:
+            if not path.is_file():
+                raise ValueError(f"Input file not found: {path}")
+        targets = {p.resolve() for p in (output, jsonl) if p is not None}
+        if any(p.resolve() in targets for p in inputs):
+            raise ValueError("--output and --jsonl must not be one of the inputs")
+
+        # Same rule as --append: every input must have the same columns.
+        fieldnames = read_result_header(inputs[0], encoding=encoding)
+        if "id" not in fieldnames:
+            raise ValueError(f"{inputs[0]}: no 'id' column")
+        for path in inputs[1:]:
+            header = read_result_header(path, encoding=encoding)
+            if header != fieldnames:
+                _print_header_mismatch(
+                    HeaderMismatchError(path, header, fieldnames),
+                    "merge files written with the same flags (e.g. --include-meta)",
                 )
                 return 1
 
-        write_header = (not args.append) or (
-            args.append and (not file_exists or file_size == 0)
+        merger = ResultMerger(
+            inputs,
+            fieldnames=fieldnames,
+            encoding=encoding,
+            run_size=cast(int, ns.run_size),
+            tmp_dir=cast(Path | None, ns.tmp_dir),
+        )
+        writer = ResultWriter(
+            output,
+            fieldnames=fieldnames,
+            delimiter="\t" if fmt == "tsv" else ",",
+            encoding=encoding,
+            append=False,
+            jsonl=jsonl,
+            parquet=fmt == "parquet",
         )
+        try:
+            writer.open()
+            for row in merger.rows():
+                writer.write(row)
+        finally:
+            writer.close()
+    except HeaderMismatchError as e:
+        _print_header_mismatch(e)
+        return 1
+    except Exception as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    dropped = merger.read - writer.wrote
+    print(
+        f"merged {merger.read} row(s) from {len(inputs)} file(s) into "
+        f"{writer.wrote} row(s) ({dropped} older duplicate(s) dropped)",
+        file=sys.stderr,
+    )
+    if merger.runs:
+        print(f"spilled {merger.runs} sorted run(s) to disk", file=sys.stderr)
+    print(f"wrote {writer.path}", file=sys.stderr)
+    if writer.jsonl is not None:
+        print(f"wrote {writer.jsonl}", file=sys.stderr)
+    return 0
+
+
+# Lease renewals that may fail in a row before a worker stops claiming.
+_MAX_RENEW_FAILURES = 2
 
-        args.output.parent.mkdir(parents=True, exist_ok=True)
-        with args.output.open(output_mode, newline="", encoding=args.encoding) as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=delimiter)
-            if write_header:
-                writer.writeheader()
-                f.flush()
 
-            jsonl_f = None
-            if args.jsonl is not None:
-                jsonl_mode = "a" if args.append else "w"
-                args.jsonl.parent.mkdir(parents=True, exist_ok=True)
-                jsonl_f = args.jsonl.open(jsonl_mode, encoding=args.encoding)
+def build_worker_parser() -> argparse.ArgumentParser:
+    from src.work_queue import DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS
 
-            wrote = 0
+    parser = argparse.ArgumentParser(
+        prog="generate_prompts worker",
+        description=(
+            "Claim paragraphs from a --queue database and store the generated "
+            "prompts next to them; any number of workers may share a queue."
+        ),
+    )
+    _ = parser.add_argument("--queue", required=True, type=Path)
+    _add_model_arguments(parser)
+    _ = parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Concurrent model calls in this process (default: 1).",
+    )
+    _ = parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=DEFAULT_LEASE_SECONDS,
+        help=(
+            "A claimed paragraph returns to the queue if its worker stops "
+            "renewing the lease for this long (default: 300)."
+        ),
+    )
+    _ = parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=DEFAULT_MAX_ATTEMPTS,
+        help="Give up on a paragraph after this many attempts (default: 3).",
+    )
+    _ = parser.add_argument(
+        "--worker-id",
+        default=None,
+        help="Lease owner name (default: <hostname>:<pid>).",
+    )
+    return parser
+
+
+def worker_main(argv: list[str]) -> int:
+    ns = build_worker_parser().parse_args(argv)
+    _load_dotenv()
+    import socket
+
+    from src.work_queue import WorkQueue
+
+    owner = cast(str | None, ns.worker_id) or f"{socket.gethostname()}:{os.getpid()}"
+    workers = cast(int, ns.workers)
+
+    try:
+        if workers < 1:
+            raise ValueError("--workers must be >= 1")
+        queue = WorkQueue(
+            cast(Path, ns.queue),
+            lease_seconds=cast(float, ns.lease_seconds),
+            max_attempts=cast(int, ns.max_attempts),
+        )
+    except Exception as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    client = OpenAIClient(
+        build_client_config(
+            model=cast(str | None, ns.model),
+            base_url=cast(str | None, ns.base_url),
+            api_mode=cast(str | None, ns.api_mode),
+            store=cast(bool, ns.store),
+            temperature=cast(float, ns.temperature),
+            max_output_tokens=cast(int, ns.max_output_tokens),
+        )
+    )
+    stop = threading.Event()
+    # Set once the leases can no longer be kept alive: running calls finish,
+    # but nothing new is claimed.
+    draining = threading.Event()
+    completed = 0
+    failed = 0
+    count_lock = threading.Lock()
+
+    def heartbeat() -> None:
+        # Calls may retry for longer than a lease; keep ours alive while running.
+        # A failed renewal (e.g. "database is locked") is retried on the next
+        # tick. Two failures in a row leave a third of the lease: stop claiming
+        # before another worker takes the paragraphs over.
+        failures = 0
+        while not stop.wait(queue.lease_seconds / 3):
             try:
-                for i, p in enumerate(selected, start=1):
+                queue.renew(owner)
+            except Exception as e:
+                failures += 1
+                print(f"[{owner}] lease renewal failed: {e}", file=sys.stderr)
+                if failures >= _MAX_RENEW_FAILURES and not draining.is_set():
                     print(
-                        f"[{i}/{total}] generating prompt for paragraph {p.id}...",
+                        f"[{owner}] leases cannot be renewed; "
+                        "finishing running paragraphs, claiming no more",
                         file=sys.stderr,
                     )
-                    result = client.generate_prompt(
-                        paragraph_id=p.id, paragraph_text=p.text
-                    )
+                    draining.set()
+                continue
+            failures = 0
+
+    def run_task(task: Task) -> None:
+        nonlocal completed, failed
+        print(
+            f"[{owner}] generating prompt for paragraph {task.id} "
+            f"({task.document}, attempt {task.attempts})...",
+            file=sys.stderr,
+        )
+        try:
+            result = client.generate_prompt(
+                paragraph_id=task.id, paragraph_text=task.paragraph
+            )
+        except Exception as e:
+            print(f"[{owner}] paragraph {task.id} failed: {e}", file=sys.stderr)
+            queue.release(task, owner, str(e))
+            with count_lock:
+                failed += 1
+            return
+        row = {
+            "id": str(task.id),
+            "paragraph": task.paragraph,
+            "prompt": result.prompt,
+            "model": result.model,
+            "response_id": result.response_id,
+            "timestamp": result.timestamp,
+        }
+        if queue.complete(task, row):
+            with count_lock:
+                completed += 1
+
+    def loop() -> None:
+        # Runs until nothing is pending or leased; while other workers hold
+        # leases, waits so an abandoned lease can be taken over once it expires.
+        while not stop.is_set() and not draining.is_set():
+            task = queue.claim(owner)
+            if task is not None:
+                run_task(task)
+                continue
+            wake = queue.next_expiry()
+            if wake is None:
+                return
+            _ = stop.wait(min(max(wake - time.time(), 0.05), 1.0))
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    threads = [threading.Thread(target=loop) for _ in range(workers)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+        counts = queue.counts()
+        queue.close()
+
+    print(
+        f"[{owner}] completed {completed} paragraph(s), {failed} failed attempt(s)",
+        file=sys.stderr,
+    )
+    print(
+        f"queue: {counts.done} done, {counts.failed} failed, "
+        f"{counts.pending + counts.leased} remaining",
+        file=sys.stderr,
+    )
+    return 1 if counts.failed or draining.is_set() else 0
+
+
+class _JobArgumentParser(argparse.ArgumentParser):
+    # Reports a bad job spec to the client instead of exiting the server.
+    def error(self, message: str) -> NoReturn:
+        raise ValueError(message)
+
+    def exit(self, status: int = 0, message: str | None = None) -> NoReturn:
+        raise ValueError(message or "help and version are not job options")
+
+
+def _job_argv(spec: dict[str, object]) -> list[str]:
+    # {"input": "a.txt", "ids": "1,2", "include_meta": true} ->
+    # ["--input", "a.txt", "--ids", "1,2", "--include-meta"]
+    argv: list[str] = []
+    for key, value in spec.items():
+        flag = "--" + key.replace("_", "-")
+        values = value if isinstance(value, list) else [value]
+        for v in cast(list[object], values):
+            if v is True:
+                argv.append(flag)
+            elif v is not None and v is not False:
+                argv += [flag, str(v)]
+    return argv
+
+
+def _check_job_paths(args: Args, root: Path) -> None:
+    # Everything a job writes must stay under ``root``.
+    paths = {
+        "output": args.output,
+        "jsonl": args.jsonl,
+        "sqlite": args.sqlite,
+        "queue": args.queue,
+        "cache_dir": args.cache_dir,
+    }
+    for key, path in paths.items():
+        if path is not None and not path.resolve().is_relative_to(root):
+            raise ValueError(f"{key} must be inside {root}: {path}")
+
+
+def job_preparer(
+    defaults: dict[str, object],
+    *,
+    workers: int,
+    clients: OpenAIClientPool,
+    output_root: Path | None = None,
+) -> Callable[[dict[str, object]], JobFn]:
+    # Jobs take the same options as a normal run, as JSON keys. ``defaults``
+    # (the server's model flags) apply unless a job overrides them. Every job
+    # shares the pool of warm clients and at most ``workers`` model calls run
+    # at once across all jobs. The semaphore promises no wakeup order. Jobs
+    # only write under ``output_root`` (default: the working directory).
+    if workers < 1:
+        raise ValueError("--workers must be >= 1")
+    calls = threading.BoundedSemaphore(workers)
+    root = (output_root or Path.cwd()).resolve()
+
+    def prepare(spec: dict[str, object]) -> JobFn:
+        parser = build_arg_parser(_JobArgumentParser)
+        parser.set_defaults(workers=workers, **defaults)
+        args = parse_cli_args(_job_argv(spec), parser)
+        if args.print_instructions or args.ndjson:
+            raise ValueError("print_instructions and ndjson are not job options")
+        _check_job_paths(args, root)
+        client = clients.get(
+            build_client_config(
+                model=args.model,
+                base_url=args.base_url,
+                api_mode=args.api_mode,
+                store=args.store,
+                temperature=args.temperature,
+                max_output_tokens=args.max_output_tokens,
+            )
+        )
+
+        def fn(sink: JobSink) -> int:
+            return run(args, client=client, calls=calls, sinks=[sink])
+
+        return fn
+
+    return prepare
+
+
+def build_serve_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="generate_prompts serve",
+        description=(
+            "Run a local job server: POST /jobs with the same options as a "
+            "normal run (as JSON keys); poll GET /jobs/<id> and stream "
+            "GET /jobs/<id>/results."
+        ),
+    )
+    _ = parser.add_argument("--host", default="127.0.0.1")
+    _ = parser.add_argument("--port", type=int, default=8765)
+    _add_model_arguments(parser)
+    _ = parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Concurrent model calls shared by all jobs (default: 4).",
+    )
+    _ = parser.add_argument(
+        "--max-jobs",
+        type=int,
+        default=4,
+        help="Jobs that run at once; later ones queue (default: 4).",
+    )
+    _ = parser.add_argument(
+        "--token",
+        default=None,
+        help=(
+            "Require 'Authorization: Bearer <token>' on every request "
+            "(defaults to env PROMPTS_SERVE_TOKEN)."
+        ),
+    )
+    _ = parser.add_argument(
+        "--output-root",
+        type=Path,
+        default=None,
+        help=(
+            "Jobs may only write outputs, databases and caches under this "
+            "directory (default: the working directory)."
+        ),
+    )
+    _ = parser.add_argument(
+        "--allow-host",
+        dest="allow_hosts",
+        action="append",
+        default=[],
+        help=(
+            "Also accept requests for this Host name (the bound address, and "
+            "the loopback names on a loopback address, always are). Repeatable."
+        ),
+    )
+    _ = parser.add_argument(
+        "--verbose", action="store_true", help="Log every HTTP request."
+    )
+    return parser
+
+
+def serve_main(argv: list[str]) -> int:
+    ns = build_serve_parser().parse_args(argv)
+    _load_dotenv()
+    # The HTTP server is only imported by this command.
+    from src.server import JobManager, JobServer
+
+    defaults: dict[str, object] = {
+        name: getattr(ns, name)
+        for name in (
+            "model",
+            "base_url",
+            "api_mode",
+            "store",
+            "temperature",
+            "max_output_tokens",
+        )
+    }
+    clients = OpenAIClientPool()
+    try:
+        prepare = job_preparer(
+            defaults,
+            workers=cast(int, ns.workers),
+            clients=clients,
+            output_root=cast(Path | None, ns.output_root),
+        )
+        manager = JobManager(prepare, max_jobs=cast(int, ns.max_jobs))
+        server = JobServer(
+            (cast(str, ns.host), cast(int, ns.port)),
+            manager,
+            verbose=cast(bool, ns.verbose),
+            token=cast(str | None, ns.token) or os.environ.get("PROMPTS_SERVE_TOKEN"),
+            allowed_hosts=cast(list[str], ns.allow_hosts),
+        )
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    # Warm the client for the default settings before the first job arrives.
+    _ = clients.get(
+        build_client_config(
+            model=cast(str | None, ns.model),
+            base_url=cast(str | None, ns.base_url),
+            api_mode=cast(str | None, ns.api_mode),
+            store=cast(bool, ns.store),
+            temperature=cast(float, ns.temperature),
+            max_output_tokens=cast(int, ns.max_output_tokens),
+        )
+    )
+    host, port = server.server_address[:2]
+    print(f"serving on http://{host}:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("shutting down; waiting for running jobs", file=sys.stderr)
+    finally:
+        server.server_close()
+        manager.close()
+    return 0
+
+
+def _load_dotenv() -> None:
+    # Only commands that read OPENAI_* / PROMPTS_* settings pay for the import.
+    from dotenv import load_dotenv
+
+    _ = load_dotenv(dotenv_path=Path(".env"), override=False)
 
-                    row: dict[str, str] = {
-                        "id": str(p.id),
-                        "paragraph": p.text,
-                        "prompt": result.prompt,
-                    }
-                    if args.include_meta:
-                        row["model"] = result.model
-                        row["response_id"] = result.response_id
-                        row["timestamp"] = result.timestamp
-
-                    writer.writerow({k: row.get(k, "") for k in fieldnames})
-                    f.flush()
-                    wrote += 1
-
-                    if jsonl_f is not None:
-                        _ = jsonl_f.write(json.dumps(row, ensure_ascii=False) + "\n")
-                        jsonl_f.flush()
-            finally:
-                if jsonl_f is not None:
-                    jsonl_f.close()
-
-        print(f"generated {wrote} prompt(s)", file=sys.stderr)
-        print(f"wrote {args.output}", file=sys.stderr)
-        if args.jsonl is not None:
-            print(f"wrote {args.jsonl}", file=sys.stderr)
 
+def main() -> int:
+    if sys.argv[1:2] == ["export"]:
+        return export_main(sys.argv[2:])
+    if sys.argv[1:2] == ["worker"]:
+        return worker_main(sys.argv[2:])
+    if sys.argv[1:2] == ["merge"]:
+        return merge_main(sys.argv[2:])
+    if sys.argv[1:2] == ["serve"]:
+        return serve_main(sys.argv[2:])
+
+    args = parse_cli_args()
+    if args.print_instructions:
+        print(DEFAULT_INSTRUCTIONS)
         return 0
 
+    _load_dotenv()
+    try:
+        return run(args)
+    except HeaderMismatchError as e:
+        _print_header_mismatch(e)
+        return 1
     except Exception as e:
         print(f"error: {e}", file=sys.stderr)
         return 1
 
 
+def run(
+    args: Args,
+    *,
+    client: OpenAIClient | None = None,
+    calls: threading.Semaphore | None = None,
+    sinks: Sequence[Sink] = (),
+) -> int:
+    # One generation run. ``serve`` passes its warm ``client``, the semaphore
+    # that bounds model calls across all jobs, and a sink for the job's results.
+    if args.queue is not None:
+        if args.output is not None or args.sqlite is not None:
+            raise ValueError("--queue cannot be combined with --output or --sqlite")
+    elif args.output is None and args.sqlite is None and not sinks:
+        raise ValueError("--output, --sqlite or --queue is required")
+
+    # One connection pool for every Yandex call of the run; the HTTP stack
+    # is only imported when the run may reach Yandex Disk.
+    fetcher: HttpFetcher | None = None
+    if args.yandex_urls or args.yandex_folders or args.inputs_from is not None:
+        from src.yandex_docx import FetcherConfig, HttpFetcher
+
+        config = FetcherConfig()
+        if args.http_timeout is not None:
+            config = FetcherConfig(read_timeout=args.http_timeout)
+        fetcher = HttpFetcher(config)
+    sources = collect_sources(
+        input_path=args.input,
+        yandex_urls=args.yandex_urls,
+        yandex_folders=args.yandex_folders,
+        input_dir=args.input_dir,
+        inputs_from=args.inputs_from,
+        fetcher=fetcher,
+    )
+    batch = _is_batch(args, sources)
+    ext = args.format
+    delimiter = "\t" if args.format == "tsv" else ","
+    shard = Shard.from_cli(args.shard) if args.shard is not None else None
+    # Token counts are typed metadata; only Parquet carries them.
+    fieldnames = build_fieldnames(
+        include_meta=args.include_meta,
+        shard=shard is not None,
+        tokens=args.include_meta and args.format == "parquet",
+    )
+
+    cache_dir = args.cache_dir
+    if cache_dir is None and os.environ.get("PROMPTS_CACHE_DIR"):
+        cache_dir = Path(os.environ["PROMPTS_CACHE_DIR"])
+    max_bytes = args.cache_max_mb * 1024 * 1024
+    cache = (
+        DocumentCache(cache_dir, max_bytes=max_bytes) if cache_dir is not None else None
+    )
+    downloads = (
+        DownloadCache(cache_dir / "downloads", max_bytes=max_bytes)
+        if cache_dir is not None
+        else None
+    )
+
+    selection = Selection.from_cli(
+        ids_csv=args.ids, start=args.start, end=args.end, limit=args.limit
+    )
+
+    if args.download_workers < 1:
+        raise ValueError("--download-workers must be >= 1")
+
+    if args.flush_every < 1:
+        raise ValueError("--flush-every must be >= 1")
+    if args.flush_interval_ms < 0:
+        raise ValueError("--flush-interval-ms must be >= 0")
+    policy = FlushPolicy(
+        rows=args.flush_every,
+        interval=args.flush_interval_ms / 1000,
+        fsync=args.fsync,
+    )
+
+    outputs: dict[str, ResultWriter] = {}
+    for source in sources:
+        if args.output is None:
+            break
+        output = args.output / f"{source.name}.{ext}" if batch else args.output
+        jsonl = args.jsonl
+        if batch and jsonl is not None:
+            jsonl = jsonl / f"{source.name}.jsonl"
+        outputs[source.name] = ResultWriter(
+            output,
+            fieldnames=fieldnames,
+            delimiter=delimiter,
+            encoding=args.encoding,
+            append=args.append,
+            jsonl=jsonl,
+            journal=True,
+            parquet=args.format == "parquet",
+            policy=policy,
+        )
+
+    if client is None:
+        client = OpenAIClient(
+            build_client_config(
+                model=args.model,
+                base_url=args.base_url,
+                api_mode=args.api_mode,
+                store=args.store,
+                temperature=args.temperature,
+                max_output_tokens=args.max_output_tokens,
+            )
+        )
+    if not args.dry_run and args.queue is None:
+        # Checked before any download so a mismatch costs nothing.
+        for writer in outputs.values():
+            writer.check_header()
+            writer.check_journal()
+        threading.Thread(target=client.warm_up, daemon=True).start()
+
+    store: ResultStore | None = None
+    if args.sqlite is not None and not args.dry_run:
+        from src.result_store import DEFAULT_COMMIT_INTERVAL, ResultStore
+
+        interval = args.sqlite_commit_interval
+        store = ResultStore(
+            args.sqlite,
+            commit_interval=interval
+            if interval is not None
+            else DEFAULT_COMMIT_INTERVAL,
+        )
+    queue: WorkQueue | None = None
+    if args.queue is not None and not args.dry_run:
+        from src.work_queue import WorkQueue
+
+        queue = WorkQueue(args.queue)
+    output: BackgroundWriter | None = None
+    empty_shards = 0
+
+    # Paragraphs go straight from the parse into the model calls, unless
+    # something needs a document's whole selection first: sharding, the cache,
+    # the report of missing --ids, or a journal to resume from.
+    stream = (
+        shard is None
+        and cache is None
+        and args.ids is None
+        and not args.dry_run
+        and args.queue is None
+    )
+    parses: list[Prefetcher[Paragraph]] = []
+
+    def load(source: InputSource) -> list[Paragraph] | Prefetcher[Paragraph]:
+        writer = outputs.get(source.name)
+        journal = writer.journal if writer is not None else None
+        if not stream or (journal is not None and journal.exists()):
+            return read_source_paragraphs(
+                source, cache, selection, downloads=downloads, fetcher=fetcher
+            )
+        # The download and the parse up to the first selected paragraph run
+        # here; the rest is parsed on its own thread, at most a call window
+        # ahead of the model calls.
+        paragraphs = selection.iter_apply(
+            iter_source_paragraphs(
+                source, selection=selection, downloads=downloads, fetcher=fetcher
+            )
+        )
+        first = next(paragraphs, None)
+        if first is None:
+            return []
+
+        def rest() -> Iterator[Paragraph]:
+            yield first
+            yield from paragraphs
+
+        parse = Prefetcher(rest(), depth=2 * args.workers)
+        parses.append(parse)
+        return parse
+
+    def select(
+        loaded: Iterator[tuple[InputSource, list[Paragraph] | Prefetcher[Paragraph]]],
+    ) -> Iterator[_Document]:
+        nonlocal empty_shards
+        for source, paragraphs in loaded:
+            if isinstance(paragraphs, Prefetcher):
+                yield _Document(source, iter(paragraphs), outputs.get(source.name))
+                continue
+            selected = selection.apply(paragraphs)
+            if selected and shard is not None:
+                selected = shard.apply(selected)
+                if not selected:
+                    # Fewer paragraphs than shards: nothing is missing.
+                    where = f"{source.name}: " if batch else ""
+                    print(f"{where}shard {shard} is empty", file=sys.stderr)
+                    empty_shards += 1
+                    continue
+            if selected:
+                yield _Document(source, selected, outputs.get(source.name))
+                continue
+            where = f"{source.name}: " if batch else ""
+            print(f"{where}processing 0 paragraph(s)", file=sys.stderr)
+            if args.ids is not None:
+                # The pushed-down parse skipped every paragraph; re-read the
+                # document to list the ids it actually has.
+                paragraphs = read_source_paragraphs(
+                    source, cache, downloads=downloads, fetcher=fetcher
+                )
+            _warn_empty_selection(args, paragraphs)
+
+    # Pipeline: documents are fetched and parsed concurrently on a background
+    # stage that runs at most --download-workers documents ahead, while the
+    # model calls for the documents already loaded are in flight. A streamed
+    # document joins as soon as its first paragraph is parsed; the others once
+    # their whole selection is known.
+    loaded = Prefetcher(
+        select(map_ordered(load, sources, workers=args.download_workers)),
+        depth=args.download_workers,
+    )
+    documents: list[_Document] = []
+    generated = 0
+    streamed = 0
+    completed = False
+
+    def admit(doc: _Document) -> None:
+        documents.append(doc)
+        where = f"{doc.source.name}: " if batch else ""
+        if doc.count is None:
+            print(f"{where}processing paragraphs as they are parsed", file=sys.stderr)
+        else:
+            print(f"{where}processing {doc.count} paragraph(s)", file=sys.stderr)
+
+    try:
+        if args.dry_run:
+            for doc in loaded:
+                admit(doc)
+            if not documents:
+                return 0 if empty_shards else 1
+            print("dry-run: skipping model calls and output writes", file=sys.stderr)
+            return 0
+
+        if queue is not None:
+            added = 0
+            for doc in loaded:
+                admit(doc)
+                added += queue.enqueue(doc.source.name, list(doc.selected))
+            counts = queue.counts()
+            print(
+                f"queued {added} new paragraph(s) in {queue.path} "
+                f"({counts.pending} pending, {counts.done} done)",
+                file=sys.stderr,
+            )
+            return 0 if documents or empty_shards else 1
+
+        # Every output write runs on one background thread; --ndjson and
+        # --sqlite get each record as it completes.
+        extra: list[Sink] = [*sinks]
+        if args.ndjson:
+            extra.append(JsonlSink(sys.stdout, owned=False))
+        if store is not None:
+            extra.append(store)
+        output = BackgroundWriter(policy=policy, extra=extra)
+
+        def start(doc: _Document) -> Iterator[tuple[_Document, tuple[int, Paragraph]]]:
+            # An output is opened when its document joins the rotation.
+            # Paragraphs recovered from an interrupted run keep their place in
+            # the output and are not generated again. Listed first so the
+            # output is closed even if opening fails.
+            documents.append(doc)
+            writer = doc.writer
+            done: frozenset[int] = frozenset()
+            if writer is not None:
+                # A streamed document never has a journal to replay.
+                ids = [p.id for p in doc.selected] if doc.count is not None else []
+                writer.open(ids)
+                if writer.recovered:
+                    print(
+                        f"recovered {writer.recovered} row(s) of an interrupted "
+                        f"run into {writer.path}",
+                        file=sys.stderr,
+                    )
+                done = writer.recovered_ids
+            _ = documents.pop()
+            admit(doc)
+            return (
+                (doc, (i, p))
+                for i, p in enumerate(doc.selected, start=1)
+                if p.id not in done
+            )
+
+        def tasks() -> Iterator[tuple[_Document, tuple[int, Paragraph]]]:
+            # Round-robin across loaded documents so one slow document never
+            # idles the pool.
+            for _, task in interleave_ready(loaded, start):
+                yield task
+
+        def generate(task: tuple[_Document, tuple[int, Paragraph]]) -> PromptResult:
+            doc, (i, p) = task
+            where = f" ({doc.source.name})" if batch else ""
+            of = "" if doc.count is None else f"/{doc.count}"
+            print(
+                f"[{i}{of}] generating prompt for paragraph {p.id}{where}...",
+                file=sys.stderr,
+            )
+            if calls is None:
+                return client.generate_prompt(paragraph_id=p.id, paragraph_text=p.text)
+            with calls:
+                return client.generate_prompt(paragraph_id=p.id, paragraph_text=p.text)
+
+        # Results are journaled as they complete; each writer puts them back
+        # in paragraph order.
+        for (doc, (i, p)), result in map_completed(
+            generate, tasks(), workers=args.workers
+        ):
+            row: dict[str, str] = {
+                "id": str(p.id),
+                "paragraph": p.text,
+                "prompt": result.prompt,
+            }
+            if args.include_meta:
+                row["model"] = result.model
+                row["response_id"] = result.response_id
+                row["timestamp"] = result.timestamp
+            if "input_tokens" in fieldnames:
+                for name in ("input_tokens", "output_tokens"):
+                    count = getattr(result, name)
+                    row[name] = "" if count is None else str(count)
+            if shard is not None:
+                row["shard"] = str(shard)
+
+            generated += 1
+            if doc.count is None:
+                streamed += 1
+            record = {
+                "document": doc.source.name,
+                **row,
+                "model": result.model,
+                "response_id": result.response_id,
+                "timestamp": result.timestamp,
+            }
+            output.put(doc.writer, i, row, record=record)
+        completed = True
+    finally:
+        loaded.close()
+        for parse in parses:
+            parse.close()
+        if fetcher is not None:
+            fetcher.close()
+        if queue is not None:
+            queue.close()
+        try:
+            if output is not None:
+                output.close()
+            elif store is not None:
+                store.close()
+        except BaseException:
+            completed = False
+            raise
+        finally:
+            # A run that did not finish keeps its journals for an --append
+            # rerun to resume from.
+            for doc in documents:
+                if doc.writer is not None:
+                    doc.writer.close(complete=completed)
+
+    if not documents:
+        return 0 if empty_shards else 1
+
+    if batch:
+        total = streamed + sum(d.count or 0 for d in documents)
+        print(
+            f"processed {total} paragraph(s) from {len(documents)} document(s)",
+            file=sys.stderr,
+        )
+    print(f"generated {generated} prompt(s)", file=sys.stderr)
+    for doc in documents:
+        if doc.writer is None:
+            continue
+        print(f"wrote {doc.writer.path}", file=sys.stderr)
+        if doc.writer.jsonl is not None:
+            print(f"wrote {doc.writer.jsonl}", file=sys.stderr)
+    if store is not None:
+        print(f"upserted {store.upserted} row(s) into {store.path}", file=sys.stderr)
+
+    return 0
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Generic, TypeVar
+from urllib.parse import urlparse
+
+from src.text_input import strip_compression_suffix
+
+if TYPE_CHECKING:
+    from src.yandex_docx import HttpFetcher
+
+_T = TypeVar("_T")
+_G = TypeVar("_G")
+_R = TypeVar("_R")
+
+_INPUT_SUFFIXES = {".txt", ".docx"}
+
+
+@dataclass(frozen=True, slots=True)
+class InputSource:
+    name: str
+    path: Path | None = None
+    yandex_url: str | None = None
+    # Path of the file inside the public folder ``yandex_url`` points at.
+    yandex_path: str | None = None
+
+
+def _source_for_path(path: Path) -> InputSource:
+    # ``script.txt.gz`` is named ``script``, like ``script.txt``.
+    return InputSource(name=strip_compression_suffix(path).stem, path=path)
+
+
+def _is_input_file(path: Path) -> bool:
+    # Compressed inputs are picked up for text scripts only (``*.txt.gz``).
+    inner = strip_compression_suffix(path)
+    if inner != path:
+        return inner.suffix.lower() == ".txt"
+    return path.suffix.lower() in _INPUT_SUFFIXES
+
+
+def _is_url(value: str) -> bool:
+    return urlparse(value).scheme in {"http", "https"}
+
+
+def _name_for_url(url: str) -> str:
+    segments = [s for s in urlparse(url).path.split("/") if s]
+    return segments[-1] if segments else "yandex"
+
+
+def _dedupe_names(sources: list[InputSource]) -> list[InputSource]:
+    seen: dict[str, int] = {}
+    out: list[InputSource] = []
+    for src in sources:
+        count = seen.get(src.name, 0) + 1
+        seen[src.name] = count
+        name = src.name if count == 1 else f"{src.name}-{count}"
+        out.append(
+            InputSource(
+                name=name,
+                path=src.path,
+                yandex_url=src.yandex_url,
+                yandex_path=src.yandex_path,
+            )
+        )
+    return out
+
+
+def collect_sources(
+    *,
+    input_path: Path | None = None,
+    yandex_urls: Sequence[str] = (),
+    yandex_folders: Sequence[str] = (),
+    input_dir: Path | None = None,
+    inputs_from: Path | None = None,
+    fetcher: HttpFetcher | None = None,
+) -> list[InputSource]:
+    sources: list[InputSource] = []
+
+    if input_path is not None:
+        sources.append(_source_for_path(input_path))
+
+    for url in yandex_urls:
+        sources.append(InputSource(name=_name_for_url(url), yandex_url=url))
+
+    if yandex_folders:
+        # The HTTP stack is only imported for runs that reach Yandex Disk.
+        from src.yandex_docx import list_public_folder
+
+    for folder_url in yandex_folders:
+        for item in list_public_folder(folder_url, fetcher=fetcher):
+            sources.append(
+                InputSource(
+                    name=Path(item.name).stem,
+                    yandex_url=folder_url,
+                    yandex_path=item.path,
+                )
+            )
+
+    if input_dir is not None:
+        if not input_dir.is_dir():
+            raise ValueError(f"--input-dir is not a directory: {input_dir}")
+        for path in sorted(input_dir.iterdir()):
+            if path.is_file() and _is_input_file(path):
+                sources.append(_source_for_path(path))
+
+    if inputs_from is not None:
+        base = inputs_from.parent
+        for raw in inputs_from.read_text(encoding="utf-8").splitlines():
+            entry = raw.strip()
+            if not entry or entry.startswith("#"):
+                continue
+            if _is_url(entry):
+                sources.append(InputSource(name=_name_for_url(entry), yandex_url=entry))
+                continue
+            path = Path(entry)
+            if not path.is_absolute():
+                path = base / path
+            sources.append(_source_for_path(path))
+
+    if not sources:
+        raise ValueError("No input documents found")
+
+    return _dedupe_names(sources)
+
+
+def interleave_ready(
+    groups: Prefetcher[_G], items: Callable[[_G], Iterable[_T]]
+) -> Iterator[tuple[_G, _T]]:
+    # Round-robin over groups that are still arriving: a ready group joins the
+    # rotation immediately, and the stream only waits for the next group once
+    # every admitted one is drained.
+    active: deque[tuple[_G, Iterator[_T]]] = deque()
+    while True:
+        while (group := groups.get(block=not active)) is not None:
+            active.append((group, iter(items(group))))
+        if not active:
+            return
+        group, it = active.popleft()
+        try:
+            item = next(it)
+        except StopIteration:
+            continue
+        yield group, item
+        active.append((group, it))
+
+
+class Prefetcher(Generic[_T]):
+    # Drains ``items`` on a background thread, at most ``depth`` items ahead of
+    # the consumer. Items must not be None.
+    def __init__(self, items: Iterable[_T], *, depth: int) -> None:
+        self._items = items
+        self._depth = max(depth, 1)
+        self._buffer: deque[_T] = deque()
+        self._cond = threading.Condition()
+        self._finished = False
+        self._closed = False
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, name="prefetch")
+        self._thread.start()
+
+    def _run(self) -> None:
+        iterator = iter(self._items)
+        try:
+            for item in iterator:
+                with self._cond:
+                    while len(self._buffer) >= self._depth and not self._closed:
+                        _ = self._cond.wait()
+                    if self._closed:
+                        return
+                    self._buffer.append(item)
+                    self._cond.notify_all()
+        except BaseException as e:
+            self._error = e
+        finally:
+            # Closing a generator source runs its cleanup (e.g. cancels the
+            # pending downloads of ``map_ordered``) on this thread.
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            with self._cond:
+                self._finished = True
+                self._cond.notify_all()
+
+    def get(self, *, block: bool = True) -> _T | None:
+        # Returns None when nothing is ready yet (non-blocking) or the source is
+        # exhausted; a source error is re-raised once buffered items are consumed.
+        with self._cond:
+            while block and not self._buffer and not self._finished:
+                _ = self._cond.wait()
+            if self._buffer:
+                item = self._buffer.popleft()
+                self._cond.notify_all()
+                return item
+            if self._error is not None:
+                raise self._error
+            return None
+
+    def __iter__(self) -> Iterator[_T]:
+        while (item := self.get()) is not None:
+            yield item
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._buffer.clear()
+            self._cond.notify_all()
+        self._thread.join()
+
+
+def map_ordered(
+    fn: Callable[[_T], _R],
+    items: Iterable[_T],
+    *,
+    workers: int,
+) -> Iterator[tuple[_T, _R]]:
+    if workers < 1:
+        raise ValueError("--workers must be >= 1")
+
+    # Bounded look-ahead keeps long inputs lazy; a single worker stays strictly
+    # sequential so fail-fast never pays for a call after the failing one.
+    window = 1 if workers == 1 else 2 * workers
+    pending: deque[tuple[_T, Future[_R]]] = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for item in items:
+                pending.append((item, pool.submit(fn, item)))
+                if len(pending) >= window:
+                    head, fut = pending.popleft()
+                    yield head, fut.result()
+            while pending:
+                head, fut = pending.popleft()
+                yield head, fut.result()
+        finally:
+            for _, fut in pending:
+                _ = fut.cancel()
+
+
+def map_completed(
+    fn: Callable[[_T], _R],
+    items: Iterable[_T],
+    *,
+    workers: int,
+) -> Iterator[tuple[_T, _R]]:
+    # Like ``map_ordered``, but results are yielded as soon as they complete.
+    # The look-ahead counts from the oldest unfinished item, so a slow call
+    # holds back at most ``window`` finished results behind it. On the first
+    # failure (of a call or of ``items`` itself) nothing new is started; calls
+    # already running are still yielded before the error is raised.
+    if workers < 1:
+        raise ValueError("--workers must be >= 1")
+
+    window = 1 if workers == 1 else 2 * workers
+    source = iter(items)
+    exhausted = False
+    submitted = 0
+    order: deque[Future[_R]] = deque()
+    running: dict[Future[_R], tuple[int, _T]] = {}
+    failure: BaseException | None = None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            while True:
+                room = window - len(order)
+                if failure is None and not exhausted and room > 0:
+                    pulled = 0
+                    try:
+                        for item in islice(source, room):
+                            fut = pool.submit(fn, item)
+                            order.append(fut)
+                            running[fut] = (submitted, item)
+                            submitted += 1
+                            pulled += 1
+                    except Exception as e:
+                        failure = e
+                    exhausted = pulled < room
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in sorted(done, key=lambda f: running[f][0]):
+                    _, item = running.pop(fut)
+                    if fut.cancelled():
+                        continue
+                    error = fut.exception()
+                    if error is None:
+                        yield item, fut.result()
+                    elif failure is None:
+                        failure = error
+                        for other in running:
+                            _ = other.cancel()
+                while order and order[0] not in running:
+                    _ = order.popleft()
+            if failure is not None:
+                raise failure
+        finally:
+            for fut in running:
+                _ = fut.cancel()
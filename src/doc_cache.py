@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sys
+import tempfile
+import zlib
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO
+
+from src.parser import PARSER_VERSION, Paragraph
+
+_SUFFIX = ".bin.z"
+
+# Entry layout (zlib-compressed): magic, paragraph count (u64 LE), ids as
+# int64 LE, then the UTF-8 texts joined by newlines. Parsed paragraph text is
+# whitespace-normalized, so it never contains a newline itself.
+_MAGIC = b"STVP1"
+_COUNT_SIZE = 8
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def source_digest(f: IO[bytes]) -> str:
+    return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _encode(paragraphs: list[Paragraph]) -> bytes | None:
+    if any("\n" in p.text for p in paragraphs):
+        return None
+    ids = array("q", (p.id for p in paragraphs))
+    if sys.byteorder != "little":
+        ids.byteswap()
+    texts = "\n".join(p.text for p in paragraphs).encode("utf-8")
+    return b"".join(
+        [_MAGIC, len(paragraphs).to_bytes(_COUNT_SIZE, "little"), ids.tobytes(), texts]
+    )
+
+
+def _decode(raw: bytes) -> list[Paragraph]:
+    if not raw.startswith(_MAGIC):
+        raise ValueError("Unknown cache entry format")
+    offset = len(_MAGIC)
+    count = int.from_bytes(raw[offset : offset + _COUNT_SIZE], "little")
+    offset += _COUNT_SIZE
+
+    ids = array("q")
+    ids.frombytes(raw[offset : offset + ids.itemsize * count])
+    if sys.byteorder != "little":
+        ids.byteswap()
+    offset += ids.itemsize * count
+
+    texts = raw[offset:].decode("utf-8").split("\n") if count else []
+    if len(ids) != count or len(texts) != count:
+        raise ValueError("Truncated cache entry")
+    return list(map(Paragraph, ids, texts))
+
+
+@dataclass(frozen=True, slots=True)
+class DocumentCache:
+    root: Path
+    max_bytes: int = DEFAULT_MAX_BYTES
+
+    def key(self, digest: str, *, kind: str) -> str:
+        # ``kind`` separates sources whose bytes go through different readers
+        # (e.g. .txt vs .docx).
+        raw = f"{PARSER_VERSION}:{kind}:{digest}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}{_SUFFIX}"
+
+    def load(self, key: str) -> list[Paragraph] | None:
+        path = self._path(key)
+        try:
+            blob = path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+        try:
+            paragraphs = _decode(zlib.decompress(blob))
+        except (zlib.error, ValueError):
+            path.unlink(missing_ok=True)
+            return None
+
+        # mtime doubles as the LRU clock for eviction.
+        os.utime(path)
+        return paragraphs
+
+    def store(self, key: str, paragraphs: list[Paragraph]) -> None:
+        raw = _encode(paragraphs)
+        if raw is None:
+            return
+        blob = zlib.compress(raw)
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                _ = f.write(blob)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+        self.evict()
+
+    def evict(self) -> None:
+        entries: list[tuple[float, int, Path]] = []
+        for path in self.root.glob(f"*/*{_SUFFIX}"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
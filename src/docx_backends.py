@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import importlib
+import os
+import xml.etree.ElementTree as ET
+from collections.abc import Iterable, Iterator
+from typing import IO, Any, Protocol, TypeVar
+
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_NS = {"w": _W_NS}
+
+_BODY_TAG = f"{{{_W_NS}}}body"
+_P_TAG = f"{{{_W_NS}}}p"
+_PPR_TAG = f"{{{_W_NS}}}pPr"
+_NUMPR_TAG = f"{{{_W_NS}}}numPr"
+_NUMID_TAG = f"{{{_W_NS}}}numId"
+_ILVL_TAG = f"{{{_W_NS}}}ilvl"
+_VAL_ATTR = f"{{{_W_NS}}}val"
+_T_TAG = f"{{{_W_NS}}}t"
+_TAB_TAG = f"{{{_W_NS}}}tab"
+_BR_TAG = f"{{{_W_NS}}}br"
+_CR_TAG = f"{{{_W_NS}}}cr"
+_PTAB_TAG = f"{{{_W_NS}}}ptab"
+_NO_BREAK_HYPHEN_TAG = f"{{{_W_NS}}}noBreakHyphen"
+_R_TAG = f"{{{_W_NS}}}r"
+_HYPERLINK_TAG = f"{{{_W_NS}}}hyperlink"
+_TYPE_ATTR = f"{{{_W_NS}}}type"
+
+_READ_CHUNK_SIZE = 64 * 1024
+
+_P = TypeVar("_P")
+
+
+class DocxBackend(Protocol[_P]):
+    # A backend streams the direct w:p children of w:body. Each yielded
+    # paragraph is only valid until the iterator advances.
+    name: str
+
+    def iter_body_paragraphs(self, source: IO[bytes]) -> Iterator[_P]: ...
+
+    def numbering(self, p: _P) -> tuple[str, int] | None: ...
+
+    def numbered_text(self, p: _P) -> str: ...
+
+    # Whether ``numbered_text`` would be non-empty, without building it.
+    def has_text(self, p: _P) -> bool: ...
+
+    def plain_text(self, p: _P) -> str: ...
+
+
+def _plain_text_from_run_children(nodes: Iterable[Any]) -> str:
+    # Mirrors python-docx ``Paragraph.text``: runs and hyperlinked runs only,
+    # unstripped, with page/column breaks dropped.
+    out: list[str] = []
+    for node in nodes:
+        tag = node.tag
+        if tag == _T_TAG:
+            out.append(node.text or "")
+        elif tag == _TAB_TAG or tag == _PTAB_TAG:
+            out.append("\t")
+        elif tag == _BR_TAG:
+            if node.get(_TYPE_ATTR, "textWrapping") == "textWrapping":
+                out.append("\n")
+        elif tag == _CR_TAG:
+            out.append("\n")
+        elif tag == _NO_BREAK_HYPHEN_TAG:
+            out.append("-")
+    return "".join(out)
+
+
+class StdlibBackend:
+    name = "stdlib"
+
+    def iter_body_paragraphs(self, source: IO[bytes]) -> Iterator[ET.Element]:
+        # Incremental parse: each direct child of w:body is handed out (if it
+        # is a w:p) on its end event and then detached, so memory stays bounded
+        # by the largest single paragraph/table rather than the whole document.
+        parser = ET.XMLPullParser(events=("start", "end"))
+        depth = 0
+        body: ET.Element | None = None
+        body_depth = 0
+        while True:
+            chunk = source.read(_READ_CHUNK_SIZE)
+            if chunk:
+                parser.feed(chunk)
+            else:
+                parser.close()
+            for event, elem in parser.read_events():
+                if event == "start":
+                    depth += 1
+                    if body is None and elem.tag == _BODY_TAG:
+                        body = elem
+                        body_depth = depth
+                    continue
+
+                if body is not None and depth == body_depth + 1:
+                    if elem.tag == _P_TAG:
+                        yield elem
+                    body.remove(elem)
+                depth -= 1
+            if not chunk:
+                return
+
+    def numbering(self, p: ET.Element) -> tuple[str, int] | None:
+        ppr = p.find(_PPR_TAG)
+        num_pr = ppr.find(_NUMPR_TAG) if ppr is not None else None
+        if num_pr is None:
+            return None
+
+        num_id_el = num_pr.find(_NUMID_TAG)
+        if num_id_el is None:
+            return None
+        num_id = num_id_el.get(_VAL_ATTR)
+        if num_id is None:
+            return None
+
+        ilvl_el = num_pr.find(_ILVL_TAG)
+        ilvl_raw = ilvl_el.get(_VAL_ATTR) if ilvl_el is not None else None
+        return num_id, int(ilvl_raw) if ilvl_raw is not None else 0
+
+    def numbered_text(self, p: ET.Element) -> str:
+        out: list[str] = []
+        for node in p.iter():
+            tag = node.tag
+            if tag == _T_TAG:
+                out.append(node.text or "")
+            elif tag == _TAB_TAG:
+                out.append("\t")
+            elif tag == _BR_TAG:
+                out.append("\n")
+        return "".join(out).strip()
+
+    def has_text(self, p: ET.Element) -> bool:
+        return any(node.text and not node.text.isspace() for node in p.iter(_T_TAG))
+
+    def plain_text(self, p: ET.Element) -> str:
+        nodes: list[ET.Element] = []
+        for child in p:
+            if child.tag == _R_TAG:
+                nodes.extend(child)
+            elif child.tag == _HYPERLINK_TAG:
+                for r in child.iterfind(_R_TAG):
+                    nodes.extend(r)
+        return _plain_text_from_run_children(nodes)
+
+
+class LxmlBackend:
+    name = "lxml"
+
+    def __init__(self) -> None:
+        etree = importlib.import_module("lxml.etree")
+        self._etree: Any = etree
+        # Compiled XPath with first-child steps, mirroring the stdlib ``find``
+        # lookups exactly.
+        self._num_id: Any = etree.XPath(
+            "w:pPr[1]/w:numPr[1]/w:numId[1]/@w:val",
+            namespaces=_NS,
+            smart_strings=False,
+        )
+        self._ilvl: Any = etree.XPath(
+            "w:pPr[1]/w:numPr[1]/w:ilvl[1]/@w:val",
+            namespaces=_NS,
+            smart_strings=False,
+        )
+
+    def iter_body_paragraphs(self, source: IO[bytes]) -> Iterator[Any]:
+        # Tag-filtered iterparse: only w:p end events reach Python. Nested
+        # paragraphs (tables, text boxes) are skipped and freed together with
+        # their body-level container.
+        context = self._etree.iterparse(
+            source,
+            events=("end",),
+            tag=_P_TAG,
+            resolve_entities=False,
+            huge_tree=True,
+        )
+        for _, p in context:
+            parent = p.getparent()
+            if parent is None or parent.tag != _BODY_TAG:
+                continue
+            yield p
+            p.clear()
+            while p.getprevious() is not None:
+                del parent[0]
+
+    def numbering(self, p: Any) -> tuple[str, int] | None:
+        num_id: list[str] = self._num_id(p)
+        if not num_id:
+            return None
+        ilvl: list[str] = self._ilvl(p)
+        return num_id[0], int(ilvl[0]) if ilvl else 0
+
+    # Text lookups use lxml's tag-filtered iterators, which match in C.
+    def numbered_text(self, p: Any) -> str:
+        out: list[str] = []
+        for node in p.iter(_T_TAG, _TAB_TAG, _BR_TAG):
+            tag = node.tag
+            if tag == _T_TAG:
+                out.append(node.text or "")
+            elif tag == _TAB_TAG:
+                out.append("\t")
+            else:
+                out.append("\n")
+        return "".join(out).strip()
+
+    def has_text(self, p: Any) -> bool:
+        return any(node.text and not node.text.isspace() for node in p.iter(_T_TAG))
+
+    def plain_text(self, p: Any) -> str:
+        nodes: list[Any] = []
+        for child in p.iterchildren(_R_TAG, _HYPERLINK_TAG):
+            if child.tag == _R_TAG:
+                nodes.extend(child)
+            else:
+                for r in child.iterchildren(_R_TAG):
+                    nodes.extend(r)
+        return _plain_text_from_run_children(nodes)
+
+
+_BACKENDS: dict[str, type[StdlibBackend] | type[LxmlBackend]] = {
+    "stdlib": StdlibBackend,
+    "lxml": LxmlBackend,
+}
+
+
+def available_backends() -> list[str]:
+    names = ["stdlib"]
+    try:
+        _ = importlib.import_module("lxml.etree")
+    except ImportError:
+        return names
+    return [*names, "lxml"]
+
+
+def get_backend(name: str | None = None) -> DocxBackend[Any]:
+    # stdlib unless DOCX_BACKEND says otherwise. lxml stays opt-in while it
+    # is slower on documents without numbering (see the README benchmarks).
+    name = name or os.environ.get("DOCX_BACKEND") or "stdlib"
+
+    backend_cls = _BACKENDS.get(name)
+    if backend_cls is None:
+        raise ValueError(f"Unknown DOCX backend: {name}")
+    try:
+        return backend_cls()
+    except ImportError as e:
+        raise RuntimeError(f"DOCX backend '{name}' is not installed") from e
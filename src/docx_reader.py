@@ -1,14 +1,20 @@
 from __future__ import annotations
 
 import importlib
-import xml.etree.ElementTree as ET
+import io
+import itertools
+import os
+import re
 import zipfile
-from collections.abc import Iterable, Sequence
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Protocol, cast
+from typing import IO, Protocol, TypeVar, cast
 
-_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
-_NS = {"w": _W_NS}
+from src.docx_backends import DocxBackend, get_backend
+from src.parser import Paragraph, Selection, iter_numbered_paragraphs
+
+_P = TypeVar("_P")
 
 
 class _DocxParagraph(Protocol):
@@ -20,76 +26,390 @@ class _DocxDocument(Protocol):
 
 
 class _DocxModule(Protocol):
-    def Document(self, path: str) -> _DocxDocument: ...
+    def Document(self, docx: str | IO[bytes]) -> _DocxDocument: ...
 
 
-def _read_docx_document_xml(path: Path) -> ET.Element:
-    with zipfile.ZipFile(path) as zf:
-        xml_bytes = zf.read("word/document.xml")
-    return ET.fromstring(xml_bytes)
+DocxSource = Path | bytes | IO[bytes]
 
 
-def _extract_text_from_paragraph(p: ET.Element) -> str:
-    out: list[str] = []
-    for node in p.iter():
-        if node.tag == f"{{{_W_NS}}}t":
-            out.append(node.text or "")
-        elif node.tag == f"{{{_W_NS}}}tab":
-            out.append("\t")
-        elif node.tag == f"{{{_W_NS}}}br":
-            out.append("\n")
-    return "".join(out).strip()
+_DOCUMENT_XML = "word/document.xml"
 
+# Documents with at least this many body paragraphs are scanned in parallel
+# chunks when more than one CPU is available. Smaller parts are never read into
+# memory just to be counted.
+PARALLEL_MIN_PARAGRAPHS = 50_000
+_PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+_MAX_WORKERS = 8
 
-def _iter_numbered_paragraph_lines(root: ET.Element) -> Iterable[str]:
-    counters: dict[str, dict[int, int]] = {}
+_BODY_OPEN_RE = re.compile(rb"<w:body\b[^>]*>")
+_P_CLOSE = b"</w:p>"
 
-    for p in root.findall(".//w:body/w:p", _NS):
-        num_pr = p.find("./w:pPr/w:numPr", _NS)
-        if num_pr is None:
-            continue
 
-        num_id_el = num_pr.find("./w:numId", _NS)
-        if num_id_el is None:
-            continue
-        num_id = num_id_el.get(f"{{{_W_NS}}}val")
-        if num_id is None:
+# (numId, number, text) of one numbered paragraph; see ``_Scan``.
+_Item = tuple[str, int, str]
+
+
+@dataclass(slots=True)
+class _Scan:
+    # Numbered items as (numId, number within this scan or 0 for sub-levels,
+    # text). ``counts`` is the per-numId level-0 counter delta of the scan.
+    items: list[_Item] = field(default_factory=list)
+    counts: dict[str, int] = field(default_factory=dict)
+    # Plain text of every paragraph, kept only while no numbered item is seen.
+    plain_lines: list[str] = field(default_factory=list)
+
+
+def _scan_paragraphs(
+    backend: DocxBackend[_P],
+    paragraphs: Iterable[_P],
+    selection: Selection | None = None,
+) -> _Scan:
+    scan = _Scan()
+    scan.items.extend(_scan_items(backend, paragraphs, selection, scan))
+    return scan
+
+
+def _scan_items(
+    backend: DocxBackend[_P],
+    paragraphs: Iterable[_P],
+    selection: Selection | None,
+    scan: _Scan,
+) -> Iterator[_Item]:
+    # Yields the numbered items of ``scan`` as they are read; ``scan.counts``
+    # and ``scan.plain_lines`` are kept up to date as it goes.
+    # With a selection, unselected items keep their number (an empty item, so
+    # the parser still sees the id) but their text and sub-level lines are
+    # never built, and the walk stops once the selection is complete.
+    counts = scan.counts
+    numbered = False
+    selected = 0
+    skipping = False
+
+    for p in paragraphs:
+        if not numbered:
+            scan.plain_lines.append(backend.plain_text(p))
+
+        numbering = backend.numbering(p)
+        if numbering is None:
             continue
+        num_id, ilvl = numbering
 
-        ilvl_el = num_pr.find("./w:ilvl", _NS)
-        ilvl_raw = ilvl_el.get(f"{{{_W_NS}}}val") if ilvl_el is not None else None
-        ilvl = int(ilvl_raw) if ilvl_raw is not None else 0
+        if ilvl != 0 and skipping:
+            continue
+        if ilvl == 0 and selection is not None:
+            done = selection.done(selected)
+            if done or not selection.wants(counts.get(num_id, 0) + 1):
+                if not backend.has_text(p):
+                    continue
+                if not numbered:
+                    scan.plain_lines.clear()
+                    numbered = True
+                number = counts.get(num_id, 0) + 1
+                counts[num_id] = number
+                yield (num_id, number, "")
+                if done:
+                    break
+                skipping = True
+                continue
 
-        text = _extract_text_from_paragraph(p)
+        text = backend.numbered_text(p)
         if not text:
             continue
 
-        per_num = counters.setdefault(num_id, {})
+        if not numbered:
+            scan.plain_lines.clear()
+            numbered = True
         if ilvl == 0:
-            per_num[0] = per_num.get(0, 0) + 1
-            for lvl in list(per_num.keys()):
-                if lvl > 0:
-                    per_num[lvl] = 0
-            yield f"{per_num[0]}. {text}"
-            continue
+            number = counts.get(num_id, 0) + 1
+            counts[num_id] = number
+            yield (num_id, number, text)
+            selected += 1
+            skipping = False
+        else:
+            yield (num_id, 0, text)
+
 
-        yield text
+def _join_scans(scans: Iterable[_Scan]) -> str:
+    # Prefix sum over the per-chunk counter deltas turns chunk-local numbers
+    # into document-wide ones.
+    offsets: dict[str, int] = {}
+    numbered_lines: list[str] = []
+    plain_lines: list[str] = []
+    for scan in scans:
+        for num_id, number, text in scan.items:
+            if number:
+                number += offsets.get(num_id, 0)
+                numbered_lines.append(f"{number}. {text}" if text else f"{number}.")
+            else:
+                numbered_lines.append(text)
+        for num_id, delta in scan.counts.items():
+            offsets[num_id] = offsets.get(num_id, 0) + delta
+        if not numbered_lines:
+            plain_lines.extend(scan.plain_lines)
 
+    if numbered_lines:
+        return "\n".join(numbered_lines)
+    return "\n".join(plain_lines)
+
+
+def _split_body(data: bytes, parts: int) -> list[bytes] | None:
+    # Cut the body right after a ``</w:p>`` near each even split point and wrap
+    # every slice in the original document prolog and epilog. A cut that lands
+    # inside a table or text box leaves unbalanced tags, which the chunk parse
+    # rejects; the caller then falls back to a sequential scan.
+    m = _BODY_OPEN_RE.search(data)
+    body_close = data.rfind(b"</w:body>")
+    if m is None or body_close < m.end():
+        return None
+
+    head = data[: m.end()]
+    tail = data[body_close:]
+    start = m.end()
+    step = (body_close - start) // parts
+
+    cuts = [start]
+    for k in range(1, parts):
+        pos = data.find(_P_CLOSE, max(start + k * step, cuts[-1]), body_close)
+        if pos < 0:
+            break
+        cut = pos + len(_P_CLOSE)
+        if cut > cuts[-1]:
+            cuts.append(cut)
+    cuts.append(body_close)
+
+    return [head + data[a:b] + tail for a, b in zip(cuts, cuts[1:])]
 
-def _read_docx_text_fallback(path: Path) -> str:
+
+def _scan_fragment(backend_name: str, fragment: bytes) -> _Scan:
+    backend = get_backend(backend_name)
+    return _scan_paragraphs(backend, backend.iter_body_paragraphs(io.BytesIO(fragment)))
+
+
+def _scan_chunk(backend_name: str, fragment: bytes) -> _Scan | None:
+    # Runs in a worker process. A chunk that does not parse on its own comes
+    # back as None: lxml parse errors cannot be pickled to the parent.
+    try:
+        return _scan_fragment(backend_name, fragment)
+    except SyntaxError:
+        # ElementTree and lxml parse errors both derive from SyntaxError.
+        return None
+
+
+def _scan_document_bytes(backend_name: str, data: bytes, workers: int) -> list[_Scan]:
+    # Counts nested paragraphs too; good enough for a threshold.
+    if data.count(b"<w:p>") + data.count(b"<w:p ") < PARALLEL_MIN_PARAGRAPHS:
+        return [_scan_fragment(backend_name, data)]
+
+    fragments = _split_body(data, workers)
+    if fragments is None or len(fragments) < 2:
+        return [_scan_fragment(backend_name, data)]
+
+    # multiprocessing is only imported for documents large enough to split.
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # The caller may already run threads (prefetcher, output writer), which a
+    # forked child would inherit mid-operation; start clean processes instead.
+    method = (
+        "forkserver"
+        if "forkserver" in multiprocessing.get_all_start_methods()
+        else "spawn"
+    )
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context(method)
+    ) as pool:
+        scans = list(pool.map(_scan_chunk, [backend_name] * len(fragments), fragments))
+    if any(scan is None for scan in scans):
+        return [_scan_fragment(backend_name, data)]
+    return cast(list[_Scan], scans)
+
+
+def _read_docx_text_fallback(source: Path | IO[bytes]) -> str:
     try:
         docx_module = cast(_DocxModule, cast(object, importlib.import_module("docx")))
     except ImportError as e:
         raise RuntimeError("python-docx is required to read .docx inputs") from e
 
-    document = docx_module.Document(str(path))
+    if isinstance(source, Path):
+        document = docx_module.Document(str(source))
+    else:
+        _ = source.seek(0)
+        document = docx_module.Document(source)
     return "\n".join(p.text for p in document.paragraphs)
 
 
-def read_docx_text(path: Path) -> str:
-    root = _read_docx_document_xml(path)
-    numbered_lines = list(_iter_numbered_paragraph_lines(root))
-    if numbered_lines:
-        return "\n".join(numbered_lines)
+def _scans_in_parallel(
+    info: zipfile.ZipInfo, workers: int, selection: Selection | None
+) -> bool:
+    # A selection that can stop early streams instead: the parallel scan
+    # always reads every chunk.
+    stops_early = selection is not None and selection.stops_early()
+    return workers > 1 and info.file_size >= _PARALLEL_MIN_BYTES and not stops_early
+
+
+def _scan_docx(
+    source: DocxSource,
+    *,
+    backend: str | None,
+    workers: int | None,
+    selection: Selection | None,
+) -> list[_Scan]:
+    # Accepts a path, the raw package bytes, or a seekable binary buffer (e.g.
+    # a download that never touched the disk).
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    xml_backend = get_backend(backend)
+    if workers is None:
+        workers = min(os.cpu_count() or 1, _MAX_WORKERS)
+
+    with zipfile.ZipFile(source) as zf:
+        info = zf.NameToInfo.get(_DOCUMENT_XML)
+        if info is None:
+            # Main part stored under a non-default name: let python-docx resolve
+            # the package relationships.
+            text = _read_docx_text_fallback(source)
+            return [_Scan(plain_lines=text.split("\n"))]
+
+        if _scans_in_parallel(info, workers, selection):
+            data = zf.read(info)
+            return _scan_document_bytes(xml_backend.name, data, workers)
+
+        with zf.open(info) as xml_stream:
+            return [
+                _scan_paragraphs(
+                    xml_backend, xml_backend.iter_body_paragraphs(xml_stream), selection
+                )
+            ]
+
+
+def _iter_built(
+    scans: Iterable[tuple[Iterable[_Item], dict[str, int]]],
+    selection: Selection | None,
+) -> Iterator[Paragraph]:
+    # Same rules as parsing the ``read_docx_text`` output, minus the text round
+    # trip: sub-level items continue the current paragraph and whitespace is
+    # normalized, but item text is never mistaken for a header. Each scan is
+    # (items, counts); ``counts`` is only read once its items are exhausted.
+    offsets: dict[str, int] = {}
+    selected = 0
+    seen_ids: set[int] = set()
+    current_id: int | None = None
+    current_parts: list[str] | None = None
+
+    def flush() -> Paragraph | None:
+        if current_id is None or current_parts is None:
+            return None
+        return Paragraph(id=current_id, text=" ".join(" ".join(current_parts).split()))
+
+    for items, counts in scans:
+        for num_id, number, text in items:
+            if not number:
+                if current_id is None:
+                    raise ValueError(
+                        "Unexpected content before first paragraph header: "
+                        f"nested list item {text!r}"
+                    )
+                if current_parts is not None:
+                    current_parts.append(text)
+                continue
+
+            if (paragraph := flush()) is not None:
+                selected += 1
+                yield paragraph
+            if selection is not None and selection.done(selected):
+                return
+
+            paragraph_id = offsets.get(num_id, 0) + number
+            if paragraph_id in seen_ids:
+                raise ValueError(
+                    f"Duplicate paragraph id {paragraph_id} in numbered list {num_id}"
+                )
+            seen_ids.add(paragraph_id)
+
+            current_id = paragraph_id
+            wanted = selection is None or selection.wants(paragraph_id)
+            current_parts = [text] if wanted else None
+        for num_id, delta in counts.items():
+            offsets[num_id] = offsets.get(num_id, 0) + delta
+
+    if (paragraph := flush()) is not None:
+        yield paragraph
+
+
+def read_docx_text(
+    source: DocxSource,
+    *,
+    backend: str | None = None,
+    workers: int | None = None,
+    selection: Selection | None = None,
+) -> str:
+    # Renders the document as numbered text. ``selection`` only trims the
+    # output; pass the same selection to ``parse_numbered_paragraphs``.
+    scans = _scan_docx(source, backend=backend, workers=workers, selection=selection)
+    return _join_scans(scans)
+
+
+def read_docx_paragraphs(
+    source: DocxSource,
+    *,
+    backend: str | None = None,
+    workers: int | None = None,
+    selection: Selection | None = None,
+) -> list[Paragraph]:
+    return list(
+        iter_docx_paragraphs(
+            source, backend=backend, workers=workers, selection=selection
+        )
+    )
+
+
+def iter_docx_paragraphs(
+    source: DocxSource,
+    *,
+    backend: str | None = None,
+    workers: int | None = None,
+    selection: Selection | None = None,
+) -> Iterator[Paragraph]:
+    # Paragraphs come straight from the list numbering. Documents without any
+    # numbered list fall back to parsing their plain text, where the numbers
+    # are typed by hand. A document part read as one stream yields each
+    # paragraph while the rest is still being read, once its first numbered
+    # item shows it is not the fallback; parallel chunks are read in full.
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    xml_backend = get_backend(backend)
+    if workers is None:
+        workers = min(os.cpu_count() or 1, _MAX_WORKERS)
+
+    with zipfile.ZipFile(source) as zf:
+        info = zf.NameToInfo.get(_DOCUMENT_XML)
+        if info is None:
+            # Main part stored under a non-default name: let python-docx resolve
+            # the package relationships.
+            text = _read_docx_text_fallback(source)
+            yield from iter_numbered_paragraphs(text, selection)
+            return
+
+        if _scans_in_parallel(info, workers, selection):
+            scans = _scan_document_bytes(xml_backend.name, zf.read(info), workers)
+        else:
+            with zf.open(info) as xml_stream:
+                scan = _Scan()
+                items = _scan_items(
+                    xml_backend,
+                    xml_backend.iter_body_paragraphs(xml_stream),
+                    selection,
+                    scan,
+                )
+                first = next(items, None)
+                if first is not None:
+                    yield from _iter_built(
+                        [(itertools.chain([first], items), scan.counts)], selection
+                    )
+                    return
+            scans = [scan]
 
-    return _read_docx_text_fallback(path)
+    if any(scan.items for scan in scans):
+        yield from _iter_built(((s.items, s.counts) for s in scans), selection)
+    else:
+        yield from iter_numbered_paragraphs(_join_scans(scans), selection)
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.doc_cache import DEFAULT_MAX_BYTES
+
+# Resolved download hrefs are signed, short-lived URLs; reuse them only briefly.
+DEFAULT_HREF_TTL = 10 * 60
+
+_HREF_SUFFIX = ".href.json"
+_META_SUFFIX = ".meta.json"
+_BODY_SUFFIX = ".body"
+
+
+@dataclass(frozen=True, slots=True)
+class CachedFile:
+    path: Path
+    etag: str | None
+    last_modified: str | None
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            _ = f.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def _read_json(path: Path) -> dict[str, object] | None:
+    try:
+        payload = json.loads(path.read_bytes())
+    except (FileNotFoundError, ValueError):
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+@dataclass(frozen=True, slots=True)
+class DownloadCache:
+    # One entry per key (a public URL, or a public folder URL plus the file's
+    # path in it): the last resolved href (with an expiry) and the last
+    # downloaded body with the validators needed to revalidate it. Bodies are
+    # evicted least recently used first once they exceed ``max_bytes``.
+    root: Path
+    href_ttl: float = DEFAULT_HREF_TTL
+    max_bytes: int = DEFAULT_MAX_BYTES
+
+    def _stem(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.root / digest[:2] / digest
+
+    def _with_suffix(self, key: str, suffix: str) -> Path:
+        stem = self._stem(key)
+        return stem.with_name(stem.name + suffix)
+
+    def load_href(self, key: str) -> str | None:
+        payload = _read_json(self._with_suffix(key, _HREF_SUFFIX))
+        if payload is None:
+            return None
+        href = payload.get("href")
+        expires = payload.get("expires")
+        if not isinstance(href, str) or not isinstance(expires, (int, float)):
+            return None
+        return href if time.time() < expires else None
+
+    def store_href(self, key: str, href: str) -> None:
+        payload = {"href": href, "expires": time.time() + self.href_ttl}
+        _write_atomic(
+            self._with_suffix(key, _HREF_SUFFIX),
+            json.dumps(payload).encode("utf-8"),
+        )
+
+    def forget_href(self, key: str) -> None:
+        self._with_suffix(key, _HREF_SUFFIX).unlink(missing_ok=True)
+
+    def load_file(self, key: str) -> CachedFile | None:
+        body = self._with_suffix(key, _BODY_SUFFIX)
+        meta = _read_json(self._with_suffix(key, _META_SUFFIX))
+        if meta is None:
+            return None
+        try:
+            size = body.stat().st_size
+        except FileNotFoundError:
+            return None
+        if meta.get("size") != size:
+            return None
+
+        # mtime doubles as the LRU clock for eviction.
+        os.utime(body)
+        etag = meta.get("etag")
+        last_modified = meta.get("last_modified")
+        return CachedFile(
+            path=body,
+            etag=etag if isinstance(etag, str) else None,
+            last_modified=last_modified if isinstance(last_modified, str) else None,
+        )
+
+    def part_path(self, key: str) -> Path:
+        # A fresh file to stream a new body into before ``store_file`` moves it
+        # into place; unique, so concurrent downloads of one key never collide.
+        stem = self._stem(key)
+        stem.parent.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(dir=stem.parent, prefix=stem.name, suffix=".part")
+        os.close(fd)
+        return Path(name)
+
+    def store_file(
+        self,
+        key: str,
+        part: Path,
+        *,
+        etag: str | None,
+        last_modified: str | None,
+    ) -> CachedFile:
+        body = self._with_suffix(key, _BODY_SUFFIX)
+        os.replace(part, body)
+        # The body goes first; a meta file whose size disagrees is ignored.
+        meta = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "size": body.stat().st_size,
+        }
+        _write_atomic(
+            self._with_suffix(key, _META_SUFFIX),
+            json.dumps(meta).encode("utf-8"),
+        )
+        self.evict(keep=body)
+        return CachedFile(path=body, etag=etag, last_modified=last_modified)
+
+    def evict(self, *, keep: Path | None = None) -> None:
+        # ``keep`` (the body about to be read) survives even on its own over
+        # the cap.
+        entries: list[tuple[float, int, Path]] = []
+        for path in self.root.glob(f"*/*{_BODY_SUFFIX}"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            stem = path.with_name(path.name.removesuffix(_BODY_SUFFIX))
+            path.unlink(missing_ok=True)
+            for suffix in (_META_SUFFIX, _HREF_SUFFIX):
+                stem.with_name(stem.name + suffix).unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import csv
+import heapq
+import json
+import tempfile
+from collections.abc import Iterator
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from itertools import groupby
+from pathlib import Path
+from typing import IO, cast
+
+from src.text_input import open_text_input, strip_compression_suffix
+
+# Distinct ids held in memory before a sorted run is spilled to disk.
+DEFAULT_RUN_SIZE = 100_000
+
+# (id, newness, input index, row number, row); the newest row of an id is the
+# largest tuple.
+_Entry = tuple[int, float, int, int, dict[str, str]]
+
+
+def _inner_suffix(path: Path) -> str:
+    return strip_compression_suffix(path).suffix.lower()
+
+
+def read_result_header(path: Path, *, encoding: str) -> list[str]:
+    # CSV/TSV header, or the keys of the first JSONL object.
+    with open_text_input(path, encoding=encoding, newline="") as f:
+        if _inner_suffix(path) == ".jsonl":
+            for line in f:
+                if line.strip():
+                    return list(cast(dict[str, object], json.loads(line)))
+            return []
+        delimiter = "\t" if _inner_suffix(path) == ".tsv" else ","
+        return next(csv.reader(f, delimiter=delimiter), [])
+
+
+def iter_result_rows(
+    path: Path, *, fieldnames: list[str], encoding: str
+) -> Iterator[dict[str, str]]:
+    with open_text_input(path, encoding=encoding, newline="") as f:
+        if _inner_suffix(path) == ".jsonl":
+            for n, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                obj = cast(dict[str, object], json.loads(line))
+                if list(obj) != fieldnames:
+                    raise ValueError(f"{path}:{n}: keys differ from the first row")
+                yield {k: "" if v is None else str(v) for k, v in obj.items()}
+            return
+
+        delimiter = "\t" if _inner_suffix(path) == ".tsv" else ","
+        reader = csv.DictReader(f, delimiter=delimiter)
+        for row in reader:
+            if None in row or None in row.values():
+                raise ValueError(f"{path}:{reader.line_num}: wrong number of columns")
+            yield row
+
+
+def _newness(row: dict[str, str]) -> float:
+    # Rows without a parseable timestamp are older than any that have one.
+    try:
+        ts = datetime.fromisoformat(row.get("timestamp", ""))
+    except ValueError:
+        return float("-inf")
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def _read_run(f: IO[str]) -> Iterator[_Entry]:
+    for line in f:
+        id_, newness, index, n, row = json.loads(line)
+        yield id_, newness, index, n, row
+
+
+class ResultMerger:
+    # Keeps the newest row per id across ``paths`` and yields them sorted by
+    # id. Ties (no timestamps, or equal ones) go to the later input, then the
+    # later row, like appending the inputs in order would. Once more than
+    # ``run_size`` ids are buffered they are spilled as a sorted run to
+    # ``tmp_dir``; the runs are then merged k-way, one row per run in memory.
+    def __init__(
+        self,
+        paths: list[Path],
+        *,
+        fieldnames: list[str],
+        encoding: str,
+        run_size: int = DEFAULT_RUN_SIZE,
+        tmp_dir: Path | None = None,
+    ) -> None:
+        if run_size < 1:
+            raise ValueError("--run-size must be >= 1")
+        self.paths = paths
+        self.fieldnames = fieldnames
+        self.encoding = encoding
+        self.run_size = run_size
+        self.tmp_dir = tmp_dir
+        self.read = 0
+        self.runs = 0
+
+    def _entries(self) -> Iterator[_Entry]:
+        for index, path in enumerate(self.paths):
+            rows = iter_result_rows(
+                path, fieldnames=self.fieldnames, encoding=self.encoding
+            )
+            for n, row in enumerate(rows):
+                try:
+                    id_ = int(row["id"])
+                except ValueError as e:
+                    raise ValueError(f"{path}: non-integer id {row['id']!r}") from e
+                self.read += 1
+                yield id_, _newness(row), index, n, row
+
+    def rows(self) -> Iterator[dict[str, str]]:
+        with (
+            tempfile.TemporaryDirectory(prefix="merge-", dir=self.tmp_dir) as tmp,
+            ExitStack() as stack,
+        ):
+            newest: dict[int, _Entry] = {}
+            runs: list[Iterator[_Entry]] = []
+
+            def spill() -> None:
+                path = Path(tmp) / f"run-{len(runs)}.jsonl"
+                with path.open("w", encoding="utf-8") as f:
+                    for id_ in sorted(newest):
+                        _ = f.write(json.dumps(newest[id_]) + "\n")
+                newest.clear()
+                runs.append(_read_run(stack.enter_context(path.open(encoding="utf-8"))))
+
+            for entry in self._entries():
+                current = newest.get(entry[0])
+                if current is None or entry[:4] > current[:4]:
+                    newest[entry[0]] = entry
+                    if len(newest) > self.run_size:
+                        spill()
+
+            if not runs:
+                for id_ in sorted(newest):
+                    yield newest[id_][4]
+                return
+
+            spill()
+            self.runs = len(runs)
+            merged = heapq.merge(*runs, key=lambda e: e[0])
+            for _, group in groupby(merged, key=lambda e: e[0]):
+                yield max(group, key=lambda e: e[:4])[4]
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import threading
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
-
-from openai import OpenAI
+from typing import TYPE_CHECKING
 
 from src.normalize import normalize_prompt
 
+if TYPE_CHECKING:
+    from openai import OpenAI
+
 
 @dataclass(frozen=True, slots=True)
 class OpenAIClientConfig:
@@ -28,6 +31,14 @@ class PromptResult:
     model: str
     response_id: str
     timestamp: str
+    # Token usage as reported by the API; None when the provider omits it.
+    input_tokens: int | None = None
+    output_tokens: int | None = None
+
+
+def _usage_count(usage: object, name: str) -> int | None:
+    value = getattr(usage, name, None)
+    return value if isinstance(value, int) else None
 
 
 DEFAULT_INSTRUCTIONS = (
@@ -56,15 +67,30 @@ def build_input(*, paragraph_id: int, paragraph_text: str) -> str:
 class OpenAIClient:
     config: OpenAIClientConfig
     _client: OpenAI | None = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
 
     def _get_client(self) -> OpenAI:
-        if self._client is None:
-            self._client = OpenAI(
-                timeout=self.config.timeout_seconds,
-                max_retries=self.config.max_retries,
-                base_url=self.config.base_url,
-            )
-        return self._client
+        # Shared by worker threads in batch mode; build the SDK client only once.
+        # The SDK (with httpx and pydantic) takes about half a second to import,
+        # so it is only imported here, on first use.
+        with self._lock:
+            if self._client is None:
+                from openai import OpenAI
+
+                self._client = OpenAI(
+                    timeout=self.config.timeout_seconds,
+                    max_retries=self.config.max_retries,
+                    base_url=self.config.base_url,
+                )
+            return self._client
+
+    def warm_up(self) -> None:
+        # Imports the SDK and builds the client ahead of the first call so both
+        # overlap with input loading; a failure here resurfaces on that first call.
+        try:
+            _ = self._get_client()
+        except Exception:
+            return
 
     def generate_prompt(
         self, *, paragraph_id: int, paragraph_text: str
@@ -91,11 +117,14 @@ class OpenAIClient:
             )
             content = response.choices[0].message.content or ""
             response_id = response.id
+            usage = getattr(response, "usage", None)
             return PromptResult(
                 prompt=self._normalize(content),
                 model=model,
                 response_id=response_id,
                 timestamp=timestamp,
+                input_tokens=_usage_count(usage, "prompt_tokens"),
+                output_tokens=_usage_count(usage, "completion_tokens"),
             )
 
         client = self._get_client()
@@ -111,14 +140,34 @@ class OpenAIClient:
 
         output_text = getattr(response, "output_text", "")
         response_id = getattr(response, "id", "")
+        usage = getattr(response, "usage", None)
         return PromptResult(
             prompt=self._normalize(output_text),
             model=model,
             response_id=response_id,
             timestamp=timestamp,
+            input_tokens=_usage_count(usage, "input_tokens"),
+            output_tokens=_usage_count(usage, "output_tokens"),
         )
 
     def _normalize(self, text: str) -> str:
         if not text.strip():
             raise ValueError("Empty model output")
         return normalize_prompt(text)
+
+
+class OpenAIClientPool:
+    # One client per distinct config, kept warm for the life of the process
+    # (``serve``): the SDK import, connection pool and TLS sessions are shared
+    # by every job that uses the same settings.
+    def __init__(self) -> None:
+        self._clients: dict[OpenAIClientConfig, OpenAIClient] = {}
+        self._lock = threading.Lock()
+
+    def get(self, config: OpenAIClientConfig) -> OpenAIClient:
+        with self._lock:
+            client = self._clients.get(config)
+            if client is None:
+                client = self._clients[config] = OpenAIClient(config)
+                threading.Thread(target=client.warm_up, daemon=True).start()
+            return client
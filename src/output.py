@@ -1,12 +1,142 @@
 from __future__ import annotations
 
 import csv
+import gzip
+import importlib
+import io
 import json
+import os
+import queue
+import threading
+import time
+import zlib
+from collections.abc import Sequence
 from dataclasses import dataclass
 from pathlib import Path
+from typing import IO, Any, Protocol, cast
+
+from src.parquet_output import ParquetRowWriter, read_parquet_columns
 
 _BASE_FIELDNAMES = ["id", "paragraph", "prompt"]
 _META_FIELDNAMES = ["model", "response_id", "timestamp"]
+_TOKEN_FIELDNAMES = ["input_tokens", "output_tokens"]
+
+_JOURNAL_SUFFIX = ".journal"
+
+# Compressed outputs are written as a stream and sync-flushed per row, so a
+# crashed run still leaves every flushed row decodable. Appending starts a new
+# gzip member / zstd frame.
+COMPRESSED_OUTPUT_SUFFIXES: dict[str, str] = {".gz": "gzip", ".zst": "zstd"}
+
+_HEAD_SIZE = 64 * 1024
+
+
+def output_codec(path: Path) -> str | None:
+    return COMPRESSED_OUTPUT_SUFFIXES.get(path.suffix.lower())
+
+
+def _zstandard() -> Any:
+    try:
+        return importlib.import_module("zstandard")
+    except ImportError as e:
+        raise RuntimeError("zstandard is required to write .zst outputs") from e
+
+
+def open_text_output(
+    path: Path, *, append: bool, encoding: str, newline: str | None = None
+) -> IO[str]:
+    mode = "a" if append else "w"
+    codec = output_codec(path)
+    if codec is None:
+        return path.open(mode, newline=newline, encoding=encoding)
+
+    # ``flush()`` on the returned stream ends a deflate/zstd block: the data
+    # written so far decodes without the stream trailer.
+    if codec == "gzip":
+        binary = cast(IO[bytes], gzip.open(path, mode + "b"))
+    else:
+        raw = path.open(mode + "b")
+        try:
+            binary = _zstandard().ZstdCompressor().stream_writer(raw, closefd=True)
+        except BaseException:
+            raw.close()
+            raise
+    return io.TextIOWrapper(binary, encoding=encoding, newline=newline)
+
+
+def _read_head(path: Path) -> bytes:
+    # The start of the decoded content. Unlike a full reader this tolerates a
+    # stream without its trailer (a crashed run).
+    with path.open("rb") as f:
+        raw = f.read(_HEAD_SIZE)
+    codec = output_codec(path)
+    if codec == "gzip":
+        return zlib.decompressobj(wbits=31).decompress(raw)
+    if codec == "zstd":
+        return bytes(_zstandard().ZstdDecompressor().decompressobj().decompress(raw))
+    return raw
+
+
+@dataclass(frozen=True, slots=True)
+class FlushPolicy:
+    # Group commit: outputs are flushed after ``rows`` rows or ``interval``
+    # seconds, whichever comes first (0 disables the timer). ``fsync`` also
+    # forces flushed rows and the journal to disk.
+    rows: int = 1
+    interval: float = 0.0
+    fsync: bool = False
+
+
+def _flush(f: IO[str], *, fsync: bool) -> None:
+    f.flush()
+    if fsync:
+        os.fsync(f.fileno())
+
+
+class Sink(Protocol):
+    def write(self, row: dict[str, str]) -> None: ...
+
+    def flush(self, *, fsync: bool) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class CsvSink:
+    def __init__(self, f: IO[str], *, fieldnames: list[str], delimiter: str) -> None:
+        self._f = f
+        self._fieldnames = fieldnames
+        self._writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=delimiter)
+
+    def write_header(self) -> None:
+        self._writer.writeheader()
+
+    def write(self, row: dict[str, str]) -> None:
+        self._writer.writerow({k: row.get(k, "") for k in self._fieldnames})
+
+    def flush(self, *, fsync: bool) -> None:
+        _flush(self._f, fsync=fsync)
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class JsonlSink:
+    # ``owned=False`` leaves the stream open on close (e.g. stdout).
+    def __init__(self, f: IO[str], *, owned: bool = True) -> None:
+        self._f = f
+        self._owned = owned
+
+    def write(self, row: dict[str, str]) -> None:
+        _ = self._f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def flush(self, *, fsync: bool) -> None:
+        _flush(self._f, fsync=fsync and self._owned)
+
+    def close(self) -> None:
+        if self._owned:
+            self._f.close()
+        else:
+            self._f.flush()
 
 
 @dataclass(frozen=True, slots=True)
@@ -18,19 +148,20 @@ class CsvWriterConfig:
 
 
 def write_csv(rows: list[dict[str, str]], path: Path, config: CsvWriterConfig) -> None:
-    fieldnames = _BASE_FIELDNAMES + (_META_FIELDNAMES if config.include_meta else [])
+    fieldnames = build_fieldnames(include_meta=config.include_meta)
 
     path.parent.mkdir(parents=True, exist_ok=True)
 
-    mode = "a" if config.append else "w"
     file_exists = path.exists()
 
-    with path.open(mode, newline="", encoding=config.encoding) as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=config.delimiter)
+    with open_text_output(
+        path, append=config.append, encoding=config.encoding, newline=""
+    ) as f:
+        sink = CsvSink(f, fieldnames=fieldnames, delimiter=config.delimiter)
         if not config.append or not file_exists:
-            writer.writeheader()
+            sink.write_header()
         for row in rows:
-            writer.writerow({k: row.get(k, "") for k in fieldnames})
+            sink.write(row)
 
 
 def write_jsonl(
@@ -42,7 +173,407 @@ def write_jsonl(
 ) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
 
-    mode = "a" if append else "w"
-    with path.open(mode, encoding=encoding) as f:
+    with open_text_output(path, append=append, encoding=encoding) as f:
+        sink = JsonlSink(f)
         for row in rows:
-            _ = f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            sink.write(row)
+
+
+def build_fieldnames(
+    *, include_meta: bool, shard: bool = False, tokens: bool = False
+) -> list[str]:
+    fieldnames = _BASE_FIELDNAMES + (_META_FIELDNAMES if include_meta else [])
+    fieldnames += _TOKEN_FIELDNAMES if tokens else []
+    return fieldnames + (["shard"] if shard else [])
+
+
+class HeaderMismatchError(ValueError):
+    def __init__(self, path: Path, existing: list[str], expected: list[str]) -> None:
+        super().__init__(f"header mismatch in {path} during --append")
+        self.path = path
+        self.existing = existing
+        self.expected = expected
+
+
+def read_existing_header(path: Path, *, delimiter: str, encoding: str) -> list[str]:
+    head = _read_head(path).decode(encoding, errors="replace")
+    reader = csv.reader(io.StringIO(head, newline=""), delimiter=delimiter)
+    try:
+        return next(reader)
+    except StopIteration:
+        return []
+
+
+def journal_path(path: Path) -> Path:
+    return path.with_name(path.name + _JOURNAL_SUFFIX)
+
+
+def read_journal(path: Path) -> tuple[dict[str, object], dict[int, dict[str, str]]]:
+    # First line: where the run started appending; then one completed row per
+    # line. A torn last line (crash mid-write) is ignored.
+    meta: dict[str, object] = {}
+    rows: dict[int, dict[str, str]] = {}
+    with path.open("r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if i == 0:
+                meta = record
+            else:
+                rows[int(record["seq"])] = record["row"]
+    return meta, rows
+
+
+def _truncate(path: Path, offset: int) -> None:
+    with path.open("r+b") as f:
+        _ = f.truncate(offset)
+
+
+class ResultWriter:
+    def __init__(
+        self,
+        path: Path,
+        *,
+        fieldnames: list[str],
+        delimiter: str,
+        encoding: str,
+        append: bool,
+        jsonl: Path | None = None,
+        journal: bool = False,
+        parquet: bool = False,
+        policy: FlushPolicy | None = None,
+    ) -> None:
+        self.path = path
+        self.jsonl = jsonl
+        self.journal = journal_path(path) if journal else None
+        self.fieldnames = fieldnames
+        self.delimiter = delimiter
+        self.encoding = encoding
+        self.append = append
+        self.parquet = parquet
+        self.policy = policy or FlushPolicy()
+        self.wrote = 0
+        self.recovered = 0
+        # Ids of the recovered rows; a resumed run does not generate them again.
+        self.recovered_ids: frozenset[int] = frozenset()
+        self._sinks: list[Sink] = []
+        self._journal_f: IO[str] | None = None
+        # ``record`` may run on another thread than the writes and flushes.
+        self._journal_lock = threading.Lock()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        # Reorder buffer: completed rows waiting for a lower ``seq``.
+        self._pending: dict[int, dict[str, str]] = {}
+        self._next_seq = 1
+        # Seqs this run journals and places are shifted past the recovered
+        # rows that ``open`` put in front of its selection.
+        self._base = 0
+
+    def check_header(self) -> None:
+        if not self.append or not self.path.exists():
+            return
+        if self.parquet:
+            existing = read_parquet_columns(self.path)
+            if existing is None:
+                return
+        else:
+            if self.path.stat().st_size == 0:
+                return
+            existing = read_existing_header(
+                self.path, delimiter=self.delimiter, encoding=self.encoding
+            )
+        if existing != self.fieldnames:
+            raise HeaderMismatchError(self.path, existing, self.fieldnames)
+
+    def check_journal(self) -> None:
+        # A journal left behind by an interrupted run holds results that were
+        # already paid for; only --append recovers them.
+        if self.append or self.journal is None or not self.journal.exists():
+            return
+        _, rows = read_journal(self.journal)
+        if rows:
+            raise ValueError(
+                f"{self.journal} holds {len(rows)} result(s) of an interrupted "
+                "run; rerun with --append to recover them, or delete the journal"
+            )
+        self.journal.unlink()
+
+    def open(self, ids: Sequence[int] = ()) -> None:
+        # ``ids`` are the paragraph ids this run selected, in order. A row an
+        # interrupted run journaled for one of them takes that paragraph's
+        # ``seq`` (see ``recovered_ids``), so the caller generates only the
+        # others and the output stays in paragraph order. Journaled rows for
+        # ids outside the selection come first.
+        self.check_header()
+        self.check_journal()
+        meta: dict[str, object] = {}
+        rows: dict[int, dict[str, str]] = {}
+        if self.journal is not None and self.journal.exists():
+            meta, rows = self._recover(self.journal)
+        # A resumed Parquet run keeps replacing the older parts if the
+        # interrupted one was going to.
+        parquet_append = self.append and meta.get("append") is not False
+
+        # Where this run starts writing: the existing size when appending. For
+        # compressed outputs that is also where this run's member/frame starts.
+        # Parquet adds a part file that only appears on close.
+        meta = {
+            "offset": None,
+            "header": False,
+            "jsonl": None,
+            "jsonl_offset": None,
+            "append": parquet_append if self.parquet else self.append,
+        }
+        if self.parquet:
+            self._sinks.append(
+                ParquetRowWriter(
+                    self.path, fieldnames=self.fieldnames, append=parquet_append
+                )
+            )
+        else:
+            offset = self._start_offset(self.path)
+            write_header = offset == 0
+            meta["offset"] = offset
+            meta["header"] = write_header
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            csv_sink = CsvSink(
+                open_text_output(
+                    self.path, append=self.append, encoding=self.encoding, newline=""
+                ),
+                fieldnames=self.fieldnames,
+                delimiter=self.delimiter,
+            )
+            self._sinks.append(csv_sink)
+            if write_header:
+                csv_sink.write_header()
+                csv_sink.flush(fsync=False)
+
+        if self.jsonl is not None:
+            meta["jsonl"] = str(self.jsonl)
+            meta["jsonl_offset"] = self._start_offset(self.jsonl)
+            self.jsonl.parent.mkdir(parents=True, exist_ok=True)
+            self._sinks.append(
+                JsonlSink(
+                    open_text_output(
+                        self.jsonl, append=self.append, encoding=self.encoding
+                    )
+                )
+            )
+
+        if self.journal is not None:
+            self._journal_f = self.journal.open("w", encoding="utf-8")
+            _ = self._journal_f.write(json.dumps(meta) + "\n")
+        if rows:
+            self._replay([rows[seq] for seq in sorted(rows)], ids)
+        if self._journal_f is not None:
+            _flush(self._journal_f, fsync=True)
+
+    def _start_offset(self, path: Path) -> int:
+        return path.stat().st_size if self.append and path.exists() else 0
+
+    def _recover(
+        self, journal: Path
+    ) -> tuple[dict[str, object], dict[int, dict[str, str]]]:
+        # Cuts off whatever the interrupted run appended; its journaled rows
+        # are put back by ``_replay``. An unfinished Parquet part was never
+        # moved into place, so there is nothing to cut.
+        meta, rows = read_journal(journal)
+        offset = meta.get("offset")
+        if not self.parquet and isinstance(offset, int) and self.path.exists():
+            _truncate(self.path, offset)
+        jsonl = meta.get("jsonl")
+        jsonl_offset = meta.get("jsonl_offset")
+        if isinstance(jsonl, str) and isinstance(jsonl_offset, int):
+            jsonl_path = Path(jsonl)
+            if jsonl_path.exists():
+                _truncate(jsonl_path, jsonl_offset)
+        return meta, rows
+
+    def _replay(self, rows: list[dict[str, str]], ids: Sequence[int]) -> None:
+        # Journals the recovered rows again, so a second interruption keeps
+        # them, and places them: rows outside the selection at the front, the
+        # others at the ``seq`` of their id, where the reorder buffer holds
+        # them until the paragraphs before them are generated.
+        position: dict[int, int] = {}
+        for seq, paragraph_id in enumerate(ids, start=1):
+            _ = position.setdefault(paragraph_id, seq)
+        extra = [row for row in rows if int(row["id"]) not in position]
+        for seq, row in enumerate(extra, start=1):
+            self.put(seq, row)
+        self._base = len(extra)
+        for row in rows:
+            seq = position.get(int(row["id"]))
+            if seq is not None:
+                self.put(seq, row)
+        self.recovered = len(rows)
+        self.recovered_ids = frozenset(
+            int(row["id"]) for row in rows if int(row["id"]) in position
+        )
+
+    def put(self, seq: int, row: dict[str, str]) -> None:
+        # Rows may complete in any order (``seq`` counts from 1). Each one is
+        # journaled right away, then written once every lower ``seq`` is.
+        self.record(seq, row)
+        self.place(seq, row)
+
+    def record(self, seq: int, row: dict[str, str]) -> None:
+        # Journals a completed row, flushed per row, so it never lags behind
+        # the outputs.
+        with self._journal_lock:
+            if self._journal_f is None:
+                return
+            record = {"seq": self._base + seq, "row": row}
+            _ = self._journal_f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._journal_f.flush()
+
+    def place(self, seq: int, row: dict[str, str]) -> None:
+        # Writes a row that ``record`` already journaled, in ``seq`` order.
+        # The buffer stays small: ``map_completed`` starts nothing more than
+        # its window past the oldest unfinished call, so at most window - 1
+        # rows wait here (plus recovered rows past the gap of a resumed run).
+        self._pending[self._base + seq] = row
+        while self._next_seq in self._pending:
+            self.write(self._pending.pop(self._next_seq))
+            self._next_seq += 1
+
+    def write(self, row: dict[str, str]) -> None:
+        if not self._sinks:
+            raise RuntimeError("ResultWriter is not open")
+        for sink in self._sinks:
+            sink.write(row)
+        self.wrote += 1
+        self._unflushed += 1
+        if self._unflushed >= self.policy.rows:
+            self.flush()
+
+    def flush_due(self, now: float) -> bool:
+        interval = self.policy.interval
+        return bool(self._unflushed and interval and now - self._last_flush >= interval)
+
+    def flush(self) -> None:
+        fsync = self.policy.fsync
+        with self._journal_lock:
+            if self._journal_f is not None:
+                _flush(self._journal_f, fsync=fsync)
+        for sink in self._sinks:
+            sink.flush(fsync=fsync)
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self, *, complete: bool = True) -> None:
+        # The journal is removed only when the run finished with no gap. After
+        # a failure the outputs end at the first missing row, and the rows
+        # past it stay in the journal alone: an ``--append`` rerun resumes
+        # from there without writing any row twice. An unfinished Parquet part
+        # is dropped; the rerun replays all of its rows.
+        clean = complete and not self._pending
+        if self._sinks:
+            self.flush()
+
+        sinks, self._sinks = self._sinks, []
+        for sink in reversed(sinks):
+            if not clean and isinstance(sink, ParquetRowWriter):
+                sink.discard()
+            else:
+                sink.close()
+        with self._journal_lock:
+            if self._journal_f is not None:
+                self._journal_f.close()
+                self._journal_f = None
+                if clean and self.journal is not None:
+                    self.journal.unlink(missing_ok=True)
+
+
+# Queue item: (writer, seq, row, record for the extra sinks).
+_Item = tuple[ResultWriter | None, int, dict[str, str], dict[str, str]]
+
+
+class BackgroundWriter:
+    # Runs every output write on one background thread, so output I/O never
+    # holds up the model calls. A row is journaled by ``put`` itself, before
+    # it is queued: a crash cannot lose a row ``put`` returned for. ``extra``
+    # sinks (NDJSON on stdout, the SQLite store) receive every record in
+    # completion order.
+    def __init__(
+        self,
+        *,
+        policy: FlushPolicy,
+        extra: list[Sink] | None = None,
+        max_pending: int = 1024,
+    ) -> None:
+        self.policy = policy
+        self._extra = extra or []
+        self._extra_unflushed = 0
+        self._last_flush = time.monotonic()
+        self._writers: dict[int, ResultWriter] = {}
+        self._queue: queue.Queue[_Item | None] = queue.Queue(maxsize=max_pending)
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, name="output-writer")
+        self._thread.start()
+
+    def put(
+        self,
+        writer: ResultWriter | None,
+        seq: int,
+        row: dict[str, str],
+        *,
+        record: dict[str, str] | None = None,
+    ) -> None:
+        if self._error is not None:
+            raise self._error
+        if writer is not None:
+            writer.record(seq, row)
+        self._queue.put((writer, seq, row, record if record is not None else row))
+
+    def _run(self) -> None:
+        try:
+            while True:
+                # Wake up for timed flushes even when no rows arrive.
+                intervals = [self.policy.interval]
+                intervals += [w.policy.interval for w in self._writers.values()]
+                timeout = min((i for i in intervals if i > 0), default=None)
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    self._flush_due()
+                    continue
+                if item is None:
+                    break
+                writer, seq, row, record = item
+                if writer is not None:
+                    self._writers[id(writer)] = writer
+                    writer.place(seq, row)
+                for sink in self._extra:
+                    sink.write(record)
+                self._extra_unflushed += 1
+                self._flush_due()
+        except BaseException as e:
+            self._error = e
+            # Keep draining so a producer blocked on a full queue wakes up.
+            while self._queue.get() is not None:
+                pass
+
+    def _flush_due(self) -> None:
+        now = time.monotonic()
+        for writer in self._writers.values():
+            if writer.flush_due(now):
+                writer.flush()
+        if self._extra_unflushed and (
+            self._extra_unflushed >= self.policy.rows
+            or (self.policy.interval and now - self._last_flush >= self.policy.interval)
+        ):
+            for sink in self._extra:
+                sink.flush(fsync=self.policy.fsync)
+            self._extra_unflushed = 0
+            self._last_flush = now
+
+    def close(self) -> None:
+        # Drains the queue; the writers themselves are closed by their owner.
+        self._queue.put(None)
+        self._thread.join()
+        for sink in self._extra:
+            sink.close()
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import importlib
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+# Rows buffered per row group; bounds memory regardless of run size.
+DEFAULT_ROW_GROUP_SIZE = 1000
+
+# Written as nullable int64; an empty value is null.
+_INT_COLUMNS = {"id", "input_tokens", "output_tokens"}
+
+# A Parquet output is a dataset directory with one part file per run. Readers
+# (pyarrow, pandas, DuckDB, Spark) skip names starting with ".", so a part
+# that is still being written stays hidden.
+_PART_GLOB = "part-*.parquet"
+
+
+def _pyarrow() -> tuple[Any, Any]:
+    try:
+        pa = importlib.import_module("pyarrow")
+        pq = importlib.import_module("pyarrow.parquet")
+    except ImportError as e:
+        raise RuntimeError("pyarrow is required for --format parquet") from e
+    return pa, pq
+
+
+def build_schema(fieldnames: list[str]) -> Any:
+    pa, _ = _pyarrow()
+    types: dict[str, Any] = {name: pa.int64() for name in _INT_COLUMNS}
+    types |= {
+        "model": pa.dictionary(pa.int32(), pa.string()),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([pa.field(n, types.get(n, pa.string())) for n in fieldnames])
+
+
+def parquet_parts(path: Path) -> list[Path]:
+    return sorted(path.glob(_PART_GLOB)) if path.is_dir() else []
+
+
+def read_parquet_columns(path: Path) -> list[str] | None:
+    # None when ``path`` holds no rows yet.
+    parts = [path] if path.is_file() else parquet_parts(path)
+    if not parts:
+        return None
+    _, pq = _pyarrow()
+    return list(pq.read_schema(parts[0]).names)
+
+
+def _part_number(part: Path) -> int:
+    return int(part.name.removeprefix("part-").removesuffix(".parquet"))
+
+
+def _into_dataset(path: Path) -> None:
+    # A single-file output of an older run becomes the first part.
+    if not path.is_file():
+        return
+    moved = path.with_name(f".{path.name}.moving")
+    os.replace(path, moved)
+    path.mkdir()
+    os.replace(moved, path / "part-00000.parquet")
+
+
+def _convert(name: str, value: str) -> object:
+    if not value:
+        return None
+    if name in _INT_COLUMNS:
+        return int(value)
+    if name == "timestamp":
+        return datetime.fromisoformat(value)
+    return value
+
+
+class ParquetRowWriter:
+    # Streams rows into a new part file of the dataset directory ``path``, one
+    # row group at a time. The part is moved into place on close, so readers
+    # never see a half-written one. Without ``append`` the older parts are
+    # removed then; with it they are left alone, so appending costs only the
+    # new rows.
+    def __init__(
+        self,
+        path: Path,
+        *,
+        fieldnames: list[str],
+        append: bool,
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    ) -> None:
+        pa, pq = _pyarrow()
+        self._pa = pa
+        self.path = path
+        self.fieldnames = fieldnames
+        self.schema = build_schema(fieldnames)
+        self.row_group_size = row_group_size
+        self.append = append
+        self._rows: list[dict[str, str]] = []
+
+        _into_dataset(path)
+        path.mkdir(parents=True, exist_ok=True)
+        self._older = parquet_parts(path)
+        number = _part_number(self._older[-1]) + 1 if self._older else 0
+        self.part = path / f"part-{number:05d}.parquet"
+        self._tmp = path / f".{self.part.name}.tmp"
+        self._writer: Any = pq.ParquetWriter(
+            self._tmp, self.schema, compression="zstd", use_dictionary=["model"]
+        )
+
+    def write(self, row: dict[str, str]) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= self.row_group_size:
+            self._write_row_group()
+
+    def flush(self, *, fsync: bool) -> None:
+        # Row groups go out as they fill; the file is only readable once closed.
+        _ = fsync
+
+    def _write_row_group(self) -> None:
+        if not self._rows:
+            return
+        columns = {
+            name: [_convert(name, row.get(name, "")) for row in self._rows]
+            for name in self.fieldnames
+        }
+        table = self._pa.Table.from_pydict(columns, schema=self.schema)
+        self._writer.write_table(table, row_group_size=len(self._rows))
+        self._rows.clear()
+
+    def discard(self) -> None:
+        # Leaves the dataset as it was.
+        self._rows.clear()
+        self._writer.close()
+        self._tmp.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        self._write_row_group()
+        self._writer.close()
+        os.replace(self._tmp, self.part)
+        if not self.append:
+            for part in self._older:
+                part.unlink()
@@ -1,8 +1,13 @@
 from __future__ import annotations
 
 import re
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
 
+# Bump whenever parsing or DOCX extraction output changes; it is part of the
+# parsed-document cache key.
+PARSER_VERSION = 2
+
 
 @dataclass(frozen=True, slots=True)
 class Paragraph:
@@ -10,6 +15,120 @@ class Paragraph:
     text: str
 
 
+@dataclass(frozen=True, slots=True)
+class Selection:
+    # ``ids`` takes precedence over the range and ``limit``, matching
+    # ``select_paragraphs``.
+    ids: frozenset[int] | None = None
+    start: int | None = None
+    end: int | None = None
+    limit: int | None = None
+
+    @classmethod
+    def from_cli(
+        cls,
+        *,
+        ids_csv: str | None,
+        start: int | None,
+        end: int | None,
+        limit: int | None,
+    ) -> Selection:
+        if ids_csv is not None:
+            raw_parts = [p.strip() for p in ids_csv.split(",")]
+            parts = [p for p in raw_parts if p]
+            try:
+                wanted = frozenset(int(p) for p in parts)
+            except ValueError as e:
+                raise ValueError(
+                    "--ids must be a comma-separated list of integers"
+                ) from e
+            return cls(ids=wanted)
+
+        if start is not None and end is not None and start > end:
+            raise ValueError("--start must be <= --end")
+        if limit is not None and limit < 0:
+            raise ValueError("--limit must be >= 0")
+        return cls(start=start, end=end, limit=limit)
+
+    def wants(self, paragraph_id: int) -> bool:
+        if self.ids is not None:
+            return paragraph_id in self.ids
+        if self.start is not None and paragraph_id < self.start:
+            return False
+        return self.end is None or paragraph_id <= self.end
+
+    def done(self, selected: int) -> bool:
+        # True once nothing later in the document can be selected.
+        if self.ids is not None:
+            return selected >= len(self.ids)
+        return self.limit is not None and selected >= self.limit
+
+    def stops_early(self) -> bool:
+        # Whether ``done`` can end a scan before the end of the document.
+        return self.ids is not None or self.limit is not None
+
+    def apply(self, paragraphs: list[Paragraph]) -> list[Paragraph]:
+        return list(self.iter_apply(paragraphs))
+
+    def iter_apply(self, paragraphs: Iterable[Paragraph]) -> Iterator[Paragraph]:
+        # ``apply`` for a stream; stops reading once ``limit`` is reached.
+        limit = self.limit if self.ids is None else None
+        taken = 0
+        for p in paragraphs:
+            if limit is not None and taken >= limit:
+                return
+            if self.wants(p.id):
+                taken += 1
+                yield p
+
+
+# Tokens every call costs regardless of the paragraph: the instruction block
+# plus a typical generated prompt.
+_CALL_OVERHEAD_TOKENS = 300
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token; only the ratio between paragraphs matters here.
+    return len(text) // 4 + 1
+
+
+@dataclass(frozen=True, slots=True)
+class Shard:
+    # Shard ``index`` (1-based) of ``count``. Each shard takes one contiguous
+    # block of the selection, cut so the blocks carry about the same estimated
+    # token cost. The cut depends only on the selected paragraphs, so N runs
+    # over the same input and selection cover it exactly once.
+    index: int
+    count: int
+
+    @classmethod
+    def from_cli(cls, spec: str) -> Shard:
+        index, sep, count = spec.partition("/")
+        try:
+            shard = cls(index=int(index), count=int(count))
+        except ValueError as e:
+            raise ValueError("--shard must be K/N, e.g. 1/4") from e
+        if not sep or not 1 <= shard.index <= shard.count:
+            raise ValueError("--shard must be K/N with 1 <= K <= N")
+        return shard
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    def apply(self, paragraphs: list[Paragraph]) -> list[Paragraph]:
+        costs = [estimate_tokens(p.text) + _CALL_OVERHEAD_TOKENS for p in paragraphs]
+        total = sum(costs)
+        out: list[Paragraph] = []
+        before = 0
+        for p, cost in zip(paragraphs, costs, strict=True):
+            # A paragraph belongs to the shard its cost midpoint falls in.
+            # Integer arithmetic keeps the cut identical on every host.
+            if (2 * before + cost) * self.count // (2 * total) == self.index - 1:
+                out.append(p)
+            before += cost
+        return out
+
+
 _HEADER_PATTERNS: list[re.Pattern[str]] = [
     re.compile(r"^\s*(\d+)\.(?:\s+(.*))?$"),
     re.compile(r"^\s*(\d+)\)(?:\s+(.*))?$"),
@@ -17,24 +136,55 @@ _HEADER_PATTERNS: list[re.Pattern[str]] = [
 ]
 
 
-def parse_numbered_paragraphs(text: str) -> list[Paragraph]:
-    lines = text.splitlines()
+def _iter_lines(text: str | Iterable[str]) -> Iterator[str]:
+    # A text stream yields newline-terminated lines; splitting each one again
+    # keeps line numbering identical to ``str.splitlines`` on the whole text.
+    if isinstance(text, str):
+        yield from text.splitlines()
+        return
+    for chunk in text:
+        yield from chunk.splitlines() or [chunk]
 
-    out: list[Paragraph] = []
+
+def parse_numbered_paragraphs(
+    text: str | Iterable[str], selection: Selection | None = None
+) -> list[Paragraph]:
+    return list(iter_numbered_paragraphs(text, selection))
+
+
+def iter_numbered_paragraphs(
+    text: str | Iterable[str], selection: Selection | None = None
+) -> Iterator[Paragraph]:
+    # ``text`` may be a whole string or a stream of lines (e.g. an open text
+    # file), which is consumed lazily: each paragraph is yielded as soon as
+    # the next header (or the end of the text) completes it.
+    # With a selection, unselected paragraphs are validated but their text is
+    # never built, and scanning stops as soon as the selection is complete.
+    # Duplicate ids are then only detected within the scanned range.
+    lines = _iter_lines(text)
+
+    selected = 0
     seen_ids: set[int] = set()
+    stopped = False
 
     current_id: int | None = None
     current_parts: list[str] = []
+    current_wanted = True
 
-    def flush() -> None:
+    def flush() -> Paragraph | None:
+        # Completes the current paragraph; None when there is none to yield.
         nonlocal current_id, current_parts
         if current_id is None:
-            return
+            return None
+        if not current_wanted:
+            current_id = None
+            return None
         paragraph_text = " ".join(s.strip() for s in current_parts if s.strip())
         paragraph_text = re.sub(r"\s+", " ", paragraph_text).strip()
-        out.append(Paragraph(id=current_id, text=paragraph_text))
+        paragraph = Paragraph(id=current_id, text=paragraph_text)
         current_id = None
         current_parts = []
+        return paragraph
 
     for idx, line in enumerate(lines, start=1):
         matched = None
@@ -52,10 +202,16 @@ def parse_numbered_paragraphs(text: str) -> list[Paragraph]:
                         f"{idx}"
                     )
                 continue
-            current_parts.append(line)
+            if current_wanted:
+                current_parts.append(line)
             continue
 
-        flush()
+        if (paragraph := flush()) is not None:
+            selected += 1
+            yield paragraph
+        if selection is not None and selection.done(selected):
+            stopped = True
+            break
 
         paragraph_id = int(matched.group(1))
         if paragraph_id in seen_ids:
@@ -63,15 +219,17 @@ def parse_numbered_paragraphs(text: str) -> list[Paragraph]:
         seen_ids.add(paragraph_id)
 
         current_id = paragraph_id
+        current_wanted = selection is None or selection.wants(paragraph_id)
+        if not current_wanted:
+            continue
         header_text = (
             matched.group(2) if matched.lastindex and matched.lastindex >= 2 else ""
         )
         if header_text is not None:
             current_parts.append(header_text)
 
-    flush()
+    if (paragraph := flush()) is not None:
+        yield paragraph
 
-    if not out:
+    if not seen_ids and not stopped:
         raise ValueError("No numbered paragraphs found")
-
-    return out
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import sqlite3
+from collections.abc import Iterator
+from pathlib import Path
+
+# Rows per transaction. A crash loses at most this many rows.
+DEFAULT_COMMIT_INTERVAL = 100
+
+STORE_FIELDNAMES = ["id", "paragraph", "prompt", "model", "response_id", "timestamp"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    document TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    paragraph TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    response_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (document, id, model)
+) WITHOUT ROWID
+"""
+
+_UPSERT = """
+INSERT INTO results (document, id, model, paragraph, prompt, response_id, timestamp)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (document, id, model) DO UPDATE SET
+    paragraph = excluded.paragraph,
+    prompt = excluded.prompt,
+    response_id = excluded.response_id,
+    timestamp = excluded.timestamp
+"""
+
+
+def create_results_table(conn: sqlite3.Connection) -> None:
+    _ = conn.execute(_SCHEMA)
+
+
+def upsert_result(conn: sqlite3.Connection, document: str, row: dict[str, str]) -> None:
+    _ = conn.execute(
+        _UPSERT,
+        (
+            document,
+            int(row["id"]),
+            row.get("model", ""),
+            row.get("paragraph", ""),
+            row.get("prompt", ""),
+            row.get("response_id", ""),
+            row.get("timestamp", ""),
+        ),
+    )
+
+
+class ResultStore:
+    # One row per (document, paragraph id, model): a rerun over the same ids
+    # replaces the previous results in place. ``readonly`` opens an existing
+    # database (e.g. a --queue database) without touching its settings.
+    def __init__(
+        self,
+        path: Path,
+        *,
+        commit_interval: int = DEFAULT_COMMIT_INTERVAL,
+        readonly: bool = False,
+    ) -> None:
+        if commit_interval < 1:
+            raise ValueError("--sqlite-commit-interval must be >= 1")
+        self.path = path
+        self.commit_interval = commit_interval
+        self.upserted = 0
+        self._uncommitted = 0
+
+        if readonly:
+            self._conn = sqlite3.connect(
+                f"{path.resolve().as_uri()}?mode=ro",
+                uri=True,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            return
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Transactions are managed explicitly (BEGIN ... COMMIT). The connection
+        # may be handed to the output thread; it is only used by one at a time.
+        self._conn = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        _ = self._conn.execute("PRAGMA journal_mode=WAL")
+        _ = self._conn.execute("PRAGMA synchronous=NORMAL")
+        create_results_table(self._conn)
+
+    def upsert(self, document: str, row: dict[str, str]) -> None:
+        if self._uncommitted == 0:
+            _ = self._conn.execute("BEGIN")
+        upsert_result(self._conn, document, row)
+        self.upserted += 1
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_interval:
+            self.commit()
+
+    # Sink interface: records carry their ``document``.
+    def write(self, row: dict[str, str]) -> None:
+        self.upsert(row["document"], row)
+
+    def flush(self, *, fsync: bool) -> None:
+        # Transactions follow ``commit_interval``, not the output flush policy.
+        _ = fsync
+
+    def commit(self) -> None:
+        if self._uncommitted:
+            _ = self._conn.execute("COMMIT")
+            self._uncommitted = 0
+
+    def iter_rows(
+        self, *, document: str | None = None, model: str | None = None
+    ) -> Iterator[dict[str, str]]:
+        query = (
+            "SELECT document, id, model, paragraph, prompt, response_id, timestamp "
+            "FROM results WHERE (?1 IS NULL OR document = ?1) "
+            "AND (?2 IS NULL OR model = ?2) ORDER BY document, id, model"
+        )
+        for values in self._conn.execute(query, (document, model)):
+            doc, id_, model_, paragraph, prompt, response_id, timestamp = values
+            yield {
+                "document": doc,
+                "id": str(id_),
+                "paragraph": paragraph,
+                "prompt": prompt,
+                "model": model_,
+                "response_id": response_id,
+                "timestamp": timestamp,
+            }
+
+    def close(self) -> None:
+        self.commit()
+        self._conn.close()
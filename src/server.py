@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import hmac
+import json
+import queue
+import threading
+import time
+import uuid
+from collections.abc import Callable, Collection, Iterator
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Finished jobs (with their results) kept for status and result queries.
+DEFAULT_KEEP_FINISHED = 100
+# Results kept per job for /results; older ones are dropped (they are still in
+# the job's outputs).
+DEFAULT_MAX_RECORDS = 10_000
+
+# Host names a server bound to a loopback address answers to. Any other Host
+# header (e.g. a rebound DNS name) is refused.
+_LOOPBACK_HOSTS = {"127.0.0.1", "localhost", "::1"}
+
+# A job runs ``fn(sink)`` and returns an exit code; ``sink`` receives one
+# record per generated prompt.
+JobFn = Callable[["JobSink"], int]
+
+
+@dataclass(slots=True)
+class Job:
+    id: str
+    spec: dict[str, object]
+    state: str = "queued"
+    created: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+    exit_code: int | None = None
+    error: str | None = None
+    # The most recent results; ``dropped`` older ones are no longer kept.
+    records: list[dict[str, str]] = field(default_factory=list)
+    dropped: int = 0
+    changed: threading.Condition = field(default_factory=threading.Condition)
+
+    def status(self) -> dict[str, object]:
+        with self.changed:
+            return {
+                "id": self.id,
+                "state": self.state,
+                "spec": self.spec,
+                "results": self.dropped + len(self.records),
+                "exit_code": self.exit_code,
+                "error": self.error,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+            }
+
+    def follow(self, start: int = 0) -> Iterator[dict[str, str]]:
+        # Yields results from ``start`` on as they arrive, until the job ends.
+        # Results that were already dropped are skipped.
+        i = start
+        while True:
+            with self.changed:
+                i = max(i, self.dropped)
+                while i >= self.dropped + len(self.records) and self.finished is None:
+                    _ = self.changed.wait()
+                batch = self.records[i - self.dropped :]
+                done = self.finished is not None
+            yield from batch
+            i += len(batch)
+            if done and not batch:
+                return
+
+    def current(self, start: int = 0) -> list[dict[str, str]]:
+        with self.changed:
+            return self.records[max(start - self.dropped, 0) :]
+
+
+class JobSink:
+    # Output sink (see ``src.output.Sink``) that collects a job's records,
+    # keeping at most ``max_records`` of the most recent ones.
+    def __init__(self, job: Job, *, max_records: int = DEFAULT_MAX_RECORDS) -> None:
+        self.job = job
+        self.max_records = max_records
+
+    def write(self, row: dict[str, str]) -> None:
+        job = self.job
+        with job.changed:
+            job.records.append(row)
+            excess = len(job.records) - self.max_records
+            if excess > 0:
+                del job.records[:excess]
+                job.dropped += excess
+            job.changed.notify_all()
+
+    def flush(self, *, fsync: bool) -> None:
+        _ = fsync
+
+    def close(self) -> None:
+        return
+
+
+class JobManager:
+    # Runs up to ``max_jobs`` jobs at once; later ones wait in a FIFO queue
+    # and start in submission order. ``prepare`` turns a job spec into a
+    # runnable job and raises ValueError for a bad spec, before anything is
+    # queued.
+    def __init__(
+        self,
+        prepare: Callable[[dict[str, object]], JobFn],
+        *,
+        max_jobs: int,
+        keep_finished: int = DEFAULT_KEEP_FINISHED,
+        max_records: int = DEFAULT_MAX_RECORDS,
+    ) -> None:
+        if max_jobs < 1:
+            raise ValueError("--max-jobs must be >= 1")
+        self._prepare = prepare
+        self._keep_finished = keep_finished
+        self._max_records = max_records
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._queue: queue.Queue[tuple[Job, JobFn] | None] = queue.Queue()
+        self._runners = [
+            threading.Thread(target=self._dispatch, name=f"job-runner-{n}")
+            for n in range(max_jobs)
+        ]
+        for runner in self._runners:
+            runner.start()
+
+    def submit(self, spec: dict[str, object]) -> Job:
+        fn = self._prepare(spec)
+        job = Job(id=uuid.uuid4().hex[:12], spec=spec)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("the server is shutting down")
+            self._evict()
+            self._jobs[job.id] = job
+            self._queue.put((job, fn))
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _evict(self) -> None:
+        finished = [j for j in self._jobs.values() if j.finished is not None]
+        for job in finished[: max(len(finished) - self._keep_finished, 0)]:
+            del self._jobs[job.id]
+
+    def _dispatch(self) -> None:
+        while (item := self._queue.get()) is not None:
+            self._run(*item)
+
+    def _run(self, job: Job, fn: JobFn) -> None:
+        with job.changed:
+            job.state = "running"
+            job.started = time.time()
+        try:
+            code = fn(JobSink(job, max_records=self._max_records))
+            error = None
+        except Exception as e:
+            code, error = 1, str(e)
+        self._finish(job, "done" if code == 0 else "failed", code, error)
+
+    def _finish(self, job: Job, state: str, code: int, error: str | None) -> None:
+        with job.changed:
+            job.exit_code = code
+            job.error = error
+            job.state = state
+            job.finished = time.time()
+            job.changed.notify_all()
+        with self._lock:
+            self._evict()
+
+    def close(self) -> None:
+        # Queued jobs are cancelled (their followers see the end of the
+        # stream); running ones finish.
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self._finish(item[0], "cancelled", 1, "cancelled at shutdown")
+        for _ in self._runners:
+            self._queue.put(None)
+        for runner in self._runners:
+            runner.join()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # GET  /health                        {"ok": true, "jobs": N}
+    # POST /jobs                          submit a job spec (JSON object)
+    # GET  /jobs                          status of every job
+    # GET  /jobs/<id>                     status of one job
+    # GET  /jobs/<id>/results?from=N      NDJSON results, streamed until the
+    #                                     job ends (&follow=0: only current)
+    # Every request must name an allowed Host and, when the server has a
+    # token, carry it as a bearer token.
+    server: JobServer
+
+    def log_message(self, format: str, *args: object) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: object) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        _ = self.wfile.write(data)
+
+    def _allowed(self) -> bool:
+        # Sends the refusal itself when the request is not allowed.
+        host = urlsplit(f"//{self.headers.get('Host', '')}").hostname
+        if host not in self.server.allowed_hosts:
+            self._send_json(403, {"error": f"host not allowed: {host}"})
+            return False
+        token = self.server.token
+        if token is not None:
+            given = self.headers.get("Authorization", "")
+            if not hmac.compare_digest(given.encode(), f"Bearer {token}".encode()):
+                self.send_response(401)
+                self.send_header("WWW-Authenticate", "Bearer")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return False
+        return True
+
+    def _job(self, job_id: str) -> Job | None:
+        job = self.server.manager.get(job_id)
+        if job is None:
+            self._send_json(404, {"error": f"no such job: {job_id}"})
+        return job
+
+    def do_GET(self) -> None:
+        if not self._allowed():
+            return
+        url = urlsplit(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        if parts == ["health"]:
+            jobs = len(self.server.manager.jobs())
+            self._send_json(200, {"ok": True, "jobs": jobs})
+        elif parts == ["jobs"]:
+            jobs = [j.status() for j in self.server.manager.jobs()]
+            self._send_json(200, {"jobs": jobs})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self._job(parts[1])
+            if job is not None:
+                self._send_json(200, job.status())
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "results":
+            job = self._job(parts[1])
+            if job is not None:
+                query = parse_qs(url.query)
+                self._stream(job, query)
+        else:
+            self._send_json(404, {"error": f"not found: {url.path}"})
+
+    def _stream(self, job: Job, query: dict[str, list[str]]) -> None:
+        try:
+            start = int(query.get("from", ["0"])[0])
+        except ValueError:
+            self._send_json(400, {"error": "from must be an integer"})
+            return
+        follow = query.get("follow", ["1"])[0] != "0"
+        # HTTP/1.0 without Content-Length: the body ends when the job does.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        records = job.follow(start) if follow else iter(job.current(start))
+        for record in records:
+            _ = self.wfile.write(json.dumps(record).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+    def do_POST(self) -> None:
+        if not self._allowed():
+            return
+        if urlsplit(self.path).path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": f"not found: {self.path}"})
+            return
+        # A cross-site form or simple fetch cannot send this content type.
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+        if content_type.lower() != "application/json":
+            self._send_json(415, {"error": "job spec must be application/json"})
+            return
+        length = int(self.headers.get("Content-Length", "0"))
+        try:
+            spec = json.loads(self.rfile.read(length) or b"null")
+            if not isinstance(spec, dict):
+                raise ValueError("job spec must be a JSON object")
+            job = self.server.manager.submit(spec)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except RuntimeError as e:
+            self._send_json(503, {"error": str(e)})
+            return
+        self._send_json(202, job.status())
+
+
+class JobServer(ThreadingHTTPServer):
+    # ``allowed_hosts`` adds Host names to the bound address (and, on a
+    # loopback address, the loopback names).
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        manager: JobManager,
+        *,
+        verbose: bool,
+        token: str | None = None,
+        allowed_hosts: Collection[str] = (),
+    ) -> None:
+        super().__init__(address, _Handler)
+        self.manager = manager
+        self.verbose = verbose
+        self.token = token or None
+        host = address[0]
+        self.allowed_hosts = {host, *allowed_hosts}
+        if host in _LOOPBACK_HOSTS:
+            self.allowed_hosts |= _LOOPBACK_HOSTS
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import bz2
+import gzip
+import importlib
+import io
+import lzma
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, TextIO, cast
+
+# Compressed inputs are decoded as a stream: neither the compressed file nor
+# its decompressed text is ever held in memory as a whole.
+COMPRESSED_SUFFIXES: dict[str, str] = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+    ".zst": "zstd",
+}
+
+# Used when the file name does not say what the content is.
+_MAGIC: list[tuple[bytes, str]] = [
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+]
+_MAGIC_SIZE = max(len(magic) for magic, _ in _MAGIC)
+
+
+def detect_codec(path: Path) -> str | None:
+    codec = COMPRESSED_SUFFIXES.get(path.suffix.lower())
+    if codec is not None:
+        return codec
+    with path.open("rb") as f:
+        head = f.read(_MAGIC_SIZE)
+    for magic, name in _MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def strip_compression_suffix(path: Path) -> Path:
+    if path.suffix.lower() in COMPRESSED_SUFFIXES:
+        return path.with_suffix("")
+    return path
+
+
+def _open_zstd(path: Path) -> IO[bytes]:
+    try:
+        zstandard: Any = importlib.import_module("zstandard")
+    except ImportError as e:
+        raise RuntimeError("zstandard is required to read .zst inputs") from e
+    raw = path.open("rb")
+    try:
+        # Concatenated frames (e.g. appended output) read as one stream.
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            raw, read_across_frames=True, closefd=True
+        )
+    except BaseException:
+        raw.close()
+        raise
+    return cast(IO[bytes], reader)
+
+
+def _open_binary(path: Path, codec: str) -> IO[bytes]:
+    if codec == "gzip":
+        return cast(IO[bytes], gzip.open(path, "rb"))
+    if codec == "bz2":
+        return cast(IO[bytes], bz2.open(path, "rb"))
+    if codec == "xz":
+        return cast(IO[bytes], lzma.open(path, "rb"))
+    if codec == "zstd":
+        return _open_zstd(path)
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+
+@contextmanager
+def open_text_input(
+    path: Path, *, encoding: str = "utf-8", newline: str | None = None
+) -> Iterator[TextIO]:
+    codec = detect_codec(path)
+    if codec is None:
+        with path.open("r", encoding=encoding, newline=newline) as f:
+            yield f
+        return
+
+    with io.TextIOWrapper(
+        _open_binary(path, codec), encoding=encoding, newline=newline
+    ) as f:
+        yield f
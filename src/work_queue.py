@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.parser import Paragraph
+from src.result_store import create_results_table, upsert_result
+
+DEFAULT_LEASE_SECONDS = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    document TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    paragraph TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    PRIMARY KEY (document, id)
+) WITHOUT ROWID
+"""
+
+# Pending tasks, or leased ones whose worker stopped renewing the lease.
+_CLAIMABLE = "state = 'pending' OR (state = 'leased' AND lease_expires < ?)"
+
+
+@dataclass(frozen=True, slots=True)
+class Task:
+    document: str
+    id: int
+    paragraph: str
+    attempts: int
+
+
+@dataclass(frozen=True, slots=True)
+class QueueCounts:
+    pending: int = 0
+    leased: int = 0
+    done: int = 0
+    failed: int = 0
+
+
+class WorkQueue:
+    # Paragraphs to generate, shared by any number of worker processes. A
+    # worker leases one task at a time and must finish it (or renew the lease)
+    # before ``lease_seconds`` pass; an expired lease is handed to the next
+    # worker that asks. A task's result and its ``done`` state are committed
+    # in one transaction, next to the ``--sqlite`` results table.
+    def __init__(
+        self,
+        path: Path,
+        *,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ) -> None:
+        if lease_seconds <= 0:
+            raise ValueError("--lease-seconds must be > 0")
+        if max_attempts < 1:
+            raise ValueError("--max-attempts must be >= 1")
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, timeout=60.0, isolation_level=None, check_same_thread=False
+        )
+        # Rollback journal, not WAL: WAL needs shared memory, which hosts on a
+        # shared filesystem do not have.
+        _ = self._conn.execute("PRAGMA journal_mode=DELETE")
+        _ = self._conn.execute(_SCHEMA)
+        create_results_table(self._conn)
+
+    def enqueue(self, document: str, paragraphs: list[Paragraph]) -> int:
+        # Already queued paragraphs keep their state; returns the number added.
+        with self._lock:
+            before = self._conn.total_changes
+            _ = self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                _ = self._conn.executemany(
+                    "INSERT OR IGNORE INTO tasks (document, id, paragraph) "
+                    "VALUES (?, ?, ?)",
+                    [(document, p.id, p.text) for p in paragraphs],
+                )
+            except BaseException:
+                _ = self._conn.execute("ROLLBACK")
+                raise
+            _ = self._conn.execute("COMMIT")
+            return self._conn.total_changes - before
+
+    def claim(self, owner: str) -> Task | None:
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so two workers never
+            # read the same claimable row.
+            _ = self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Tasks that used up their attempts on an expired lease fail.
+                _ = self._conn.execute(
+                    "UPDATE tasks SET state = 'failed', owner = NULL, "
+                    "error = coalesce(error, 'lease expired') "
+                    f"WHERE ({_CLAIMABLE}) AND attempts >= ?",
+                    (now, self.max_attempts),
+                )
+                found = self._conn.execute(
+                    "SELECT document, id, paragraph, attempts FROM tasks "
+                    f"WHERE {_CLAIMABLE} ORDER BY document, id LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if found is not None:
+                    _ = self._conn.execute(
+                        "UPDATE tasks SET state = 'leased', owner = ?, "
+                        "lease_expires = ?, attempts = attempts + 1 "
+                        "WHERE document = ? AND id = ?",
+                        (owner, now + self.lease_seconds, found[0], found[1]),
+                    )
+            except BaseException:
+                _ = self._conn.execute("ROLLBACK")
+                raise
+            _ = self._conn.execute("COMMIT")
+        if found is None:
+            return None
+        document, id_, paragraph, attempts = found
+        return Task(document, id_, paragraph, attempts + 1)
+
+    def renew(self, owner: str) -> None:
+        with self._lock:
+            _ = self._conn.execute(
+                "UPDATE tasks SET lease_expires = ? "
+                "WHERE owner = ? AND state = 'leased'",
+                (time.time() + self.lease_seconds, owner),
+            )
+
+    def complete(self, task: Task, row: dict[str, str]) -> bool:
+        # Keeps the first result if a reclaimed task finished twice; returns
+        # whether this one was stored.
+        with self._lock:
+            _ = self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._conn.execute(
+                    "UPDATE tasks SET state = 'done', owner = NULL, error = NULL "
+                    "WHERE document = ? AND id = ? AND state != 'done'",
+                    (task.document, task.id),
+                )
+                stored = cur.rowcount == 1
+                if stored:
+                    upsert_result(self._conn, task.document, row)
+            except BaseException:
+                _ = self._conn.execute("ROLLBACK")
+                raise
+            _ = self._conn.execute("COMMIT")
+            return stored
+
+    def release(self, task: Task, owner: str, error: str) -> None:
+        # A failed attempt goes back to the queue until it runs out of attempts.
+        state = "failed" if task.attempts >= self.max_attempts else "pending"
+        with self._lock:
+            _ = self._conn.execute(
+                "UPDATE tasks SET state = ?, owner = NULL, error = ? "
+                "WHERE document = ? AND id = ? AND owner = ? AND state = 'leased'",
+                (state, error, task.document, task.id, owner),
+            )
+
+    def next_expiry(self) -> float | None:
+        # When a task may next be claimable: now if one is pending, else when
+        # the earliest lease runs out. None once every task is done or failed.
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT min(CASE state WHEN 'pending' THEN 0 ELSE lease_expires END) "
+                "FROM tasks WHERE state IN ('pending', 'leased')"
+            ).fetchone()
+        return None if found[0] is None else float(found[0])
+
+    def counts(self) -> QueueCounts:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, count(*) FROM tasks GROUP BY state"
+            ).fetchall()
+        return QueueCounts(**{state: int(n) for state, n in rows})
+
+    def close(self) -> None:
+        self._conn.close()
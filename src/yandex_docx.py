@@ -1,37 +1,528 @@
 from __future__ import annotations
 
+import email.utils
+import http.client
 import json
+import random
+import re
+import tempfile
+import threading
+import time
+import urllib.error
 import urllib.request
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
 from typing import IO, cast
-from urllib.parse import urlencode
+from urllib.parse import SplitResult, urlencode, urljoin, urlsplit
 
-_YANDEX_PUBLIC_DOWNLOAD_ENDPOINT = (
-    "https://cloud-api.yandex.net/v1/disk/public/resources/download"
+from src.download_cache import DownloadCache
+
+_YANDEX_PUBLIC_RESOURCES_ENDPOINT = (
+    "https://cloud-api.yandex.net/v1/disk/public/resources"
 )
+_YANDEX_PUBLIC_DOWNLOAD_ENDPOINT = f"{_YANDEX_PUBLIC_RESOURCES_ENDPOINT}/download"
+_LIST_PAGE_SIZE = 100
+_COPY_CHUNK_SIZE = 1024 * 1024
+_CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-\d+/(\d+|\*)")
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+_MAX_REDIRECTS = 10
+# Answers to a stale signed href; the public URL is resolved again.
+_STALE_HREF_CODES = {403, 404, 410}
+
+DEFAULT_SPILL_THRESHOLD = 64 * 1024 * 1024
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_TIMEOUT = 60.0
+# Extra attempts per request (429/5xx) and per download (resumes).
+DEFAULT_RETRIES = 3
+
+
+@dataclass(frozen=True, slots=True)
+class FetcherConfig:
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT
+    read_timeout: float = DEFAULT_TIMEOUT
+    # Extra attempts for 429/5xx answers and failed connections, per request.
+    retries: int = DEFAULT_RETRIES
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    max_idle_per_host: int = 8
+
+
+_PoolKey = tuple[str, str, int]
+
+
+class HttpFetcher:
+    # Keeps idle keep-alive connections per (scheme, host, port) so repeated
+    # calls to the same host skip the TCP/TLS handshake. Safe to share between
+    # threads: a connection is only ever used by the thread that checked it out.
+    def __init__(self, config: FetcherConfig | None = None) -> None:
+        self.config: FetcherConfig = config or FetcherConfig()
+        self.connections_opened: int = 0
+        self._idle: dict[_PoolKey, list[http.client.HTTPConnection]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, min(max, base * 2**(attempt - 1))].
+        cfg = self.config
+        ceiling = min(cfg.backoff_max, cfg.backoff_base * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def _retry_after(self, resp: http.client.HTTPResponse) -> float | None:
+        value = resp.getheader("Retry-After")
+        if value is None:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            delay = float(value)
+        else:
+            try:
+                when = email.utils.parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            delay = when.timestamp() - time.time()
+        return min(max(delay, 0.0), self.config.backoff_max)
+
+    def _connect(self, key: _PoolKey) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        timeout = self.config.connect_timeout
+        proxy = _proxy_for(scheme, host)
+        conn: http.client.HTTPConnection
+        if scheme == "https":
+            if proxy is not None:
+                conn = http.client.HTTPSConnection(
+                    proxy.hostname or "", proxy.port, timeout=timeout
+                )
+                conn.set_tunnel(host, port)
+            else:
+                conn = http.client.HTTPSConnection(host, port, timeout=timeout)
+        elif proxy is not None:
+            conn = http.client.HTTPConnection(
+                proxy.hostname or "", proxy.port, timeout=timeout
+            )
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+
+        conn.connect()
+        if conn.sock is not None:
+            conn.sock.settimeout(self.config.read_timeout)
+        with self._lock:
+            self.connections_opened += 1
+        return conn
+
+    def _checkout(
+        self, key: _PoolKey, *, fresh: bool = False
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        if not fresh:
+            with self._lock:
+                idle = self._idle.get(key)
+                if idle:
+                    return idle.pop(), True
+        return self._connect(key), False
+
+    def _release(
+        self,
+        key: _PoolKey,
+        conn: http.client.HTTPConnection,
+        resp: http.client.HTTPResponse,
+    ) -> None:
+        # Only a response read to its end leaves the connection reusable.
+        if resp.isclosed() and not resp.will_close and not resp.length:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.config.max_idle_per_host:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+    @contextmanager
+    def open(
+        self, url: str, headers: dict[str, str] | None = None
+    ) -> Iterator[http.client.HTTPResponse]:
+        # GET with redirects followed. Non-2xx answers raise
+        # ``urllib.error.HTTPError`` once retries (for 429/5xx) are exhausted.
+        attempt = 0
+        redirects = 0
+        stale = False
+        while True:
+            parts = urlsplit(url)
+            scheme = parts.scheme.lower()
+            if scheme not in _DEFAULT_PORTS:
+                raise ValueError(f"Unsupported URL scheme: {url}")
+            host = parts.hostname or ""
+            key = (scheme, host, parts.port or _DEFAULT_PORTS[scheme])
+            target = parts.path or "/"
+            if parts.query:
+                target = f"{target}?{parts.query}"
+            if scheme == "http" and _proxy_for(scheme, host) is not None:
+                target = url
+
+            reused = False
+            try:
+                conn, reused = self._checkout(key, fresh=stale)
+                try:
+                    conn.request("GET", target, headers=headers or {})
+                    resp = conn.getresponse()
+                except BaseException:
+                    conn.close()
+                    raise
+            except (OSError, http.client.HTTPException):
+                if reused and not stale:
+                    # The server dropped an idle keep-alive connection. Retried
+                    # once per request, on a new connection, outside the
+                    # backoff budget.
+                    stale = True
+                    continue
+                attempt += 1
+                if attempt > self.config.retries:
+                    raise
+                time.sleep(self.backoff(attempt))
+                continue
+
+            status = resp.status
+            if status in _REDIRECT_STATUSES and redirects < _MAX_REDIRECTS:
+                location = resp.getheader("Location")
+                _ = resp.read()
+                self._release(key, conn, resp)
+                if not location:
+                    # Released once; the error path below would release again.
+                    raise urllib.error.HTTPError(
+                        url, status, resp.reason, resp.msg, None
+                    )
+                url = urljoin(url, location)
+                redirects += 1
+                continue
+            elif status in _RETRY_STATUSES and attempt < self.config.retries:
+                attempt += 1
+                delay = self._retry_after(resp)
+                _ = resp.read()
+                self._release(key, conn, resp)
+                time.sleep(delay if delay is not None else self.backoff(attempt))
+                continue
+
+            if not 200 <= status < 300:
+                _ = resp.read()
+                self._release(key, conn, resp)
+                raise urllib.error.HTTPError(url, status, resp.reason, resp.msg, None)
+
+            try:
+                yield resp
+            finally:
+                self._release(key, conn, resp)
+            return
+
+    def close(self) -> None:
+        with self._lock:
+            idle = [conn for conns in self._idle.values() for conn in conns]
+            self._idle.clear()
+        for conn in idle:
+            conn.close()
+
+
+def _proxy_for(scheme: str, host: str) -> SplitResult | None:
+    # Honours the same *_proxy/no_proxy environment variables as urllib.
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return None
+    return urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+
+
+_default_fetcher = HttpFetcher()
 
 
-def resolve_public_download_href(public_url: str) -> str:
-    url = f"{_YANDEX_PUBLIC_DOWNLOAD_ENDPOINT}?{urlencode({'public_key': public_url})}"
-    with cast(IO[bytes], urllib.request.urlopen(url, timeout=60)) as resp:
+def _get_json(
+    endpoint: str, params: dict[str, str], fetcher: HttpFetcher | None
+) -> dict[str, object]:
+    url = f"{endpoint}?{urlencode(params)}"
+    with (fetcher or _default_fetcher).open(url) as resp:
         raw_bytes = resp.read()
 
     raw = raw_bytes.decode("utf-8")
     payload_obj = cast(object, json.loads(raw))
     if not isinstance(payload_obj, dict):
         raise ValueError("Yandex response must be a JSON object")
+    return cast(dict[str, object], payload_obj)
 
-    payload = cast(dict[str, object], payload_obj)
+
+def resolve_public_download_href(
+    public_url: str, *, path: str | None = None, fetcher: HttpFetcher | None = None
+) -> str:
+    # ``path`` selects a file inside a public folder.
+    params = {"public_key": public_url}
+    if path is not None:
+        params["path"] = path
+    payload = _get_json(_YANDEX_PUBLIC_DOWNLOAD_ENDPOINT, params, fetcher)
     href_obj = payload.get("href")
     if not isinstance(href_obj, str) or not href_obj:
         raise ValueError("Yandex response missing 'href'")
     return href_obj
 
 
-def download_public_file(public_url: str, dest: Path) -> None:
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    href = resolve_public_download_href(public_url)
-    with cast(IO[bytes], urllib.request.urlopen(href, timeout=60)) as resp:
-        data = resp.read()
+@dataclass(frozen=True, slots=True)
+class PublicFolderItem:
+    name: str
+    path: str
+
+
+def list_public_folder(
+    public_url: str,
+    *,
+    suffix: str = ".docx",
+    page_size: int = _LIST_PAGE_SIZE,
+    fetcher: HttpFetcher | None = None,
+) -> list[PublicFolderItem]:
+    # Top-level files of a public folder whose name ends with ``suffix``, in
+    # name order. The listing is paged; nested folders are not descended into.
+    items: list[PublicFolderItem] = []
+    offset = 0
+    while True:
+        payload = _get_json(
+            _YANDEX_PUBLIC_RESOURCES_ENDPOINT,
+            {
+                "public_key": public_url,
+                "limit": str(page_size),
+                "offset": str(offset),
+            },
+            fetcher,
+        )
+        if payload.get("type") != "dir":
+            raise ValueError(f"Yandex public URL is not a folder: {public_url}")
+        embedded = payload.get("_embedded")
+        if not isinstance(embedded, dict):
+            raise ValueError("Yandex folder response missing '_embedded'")
+        page = cast(dict[str, object], embedded).get("items")
+        if not isinstance(page, list):
+            raise ValueError("Yandex folder response missing '_embedded.items'")
+
+        for entry in cast(list[object], page):
+            if not isinstance(entry, dict):
+                continue
+            item = cast(dict[str, object], entry)
+            name = item.get("name")
+            path = item.get("path")
+            if (
+                item.get("type") == "file"
+                and isinstance(name, str)
+                and isinstance(path, str)
+                and name.lower().endswith(suffix)
+            ):
+                items.append(PublicFolderItem(name=name, path=path))
+
+        offset += len(page)
+        total = cast(dict[str, object], embedded).get("total")
+        if not page or (isinstance(total, int) and offset >= total):
+            break
+
+    items.sort(key=lambda it: it.name)
+    return items
+
+
+@dataclass(frozen=True, slots=True)
+class DownloadStats:
+    size: int
+    seconds: float
+    attempts: int
+    etag: str | None = None
+    last_modified: str | None = None
+    # The server answered 304 to a conditional request; nothing was copied.
+    not_modified: bool = False
+
+    @property
+    def throughput(self) -> float:
+        # Bytes per second over the whole transfer, retries included.
+        return self.size / self.seconds if self.seconds > 0 else float("inf")
+
+
+def _parse_content_range(value: str | None) -> tuple[int, int | None] | None:
+    # ``bytes START-END/TOTAL``; TOTAL may be ``*`` when unknown.
+    m = _CONTENT_RANGE_RE.fullmatch((value or "").strip())
+    if m is None:
+        return None
+    total = m.group(2)
+    return int(m.group(1)), int(total) if total != "*" else None
+
+
+def _stream_download(
+    href: str,
+    out: IO[bytes],
+    *,
+    fetcher: HttpFetcher,
+    retries: int,
+    validators: dict[str, str] | None = None,
+) -> DownloadStats:
+    # Copies the body in bounded chunks. A dropped connection or a body shorter
+    # than Content-Length is resumed with a Range request from the last byte
+    # received; a server that ignores Range restarts the copy from scratch.
+    # ``validators`` (If-None-Match/If-Modified-Since) make the first request
+    # conditional; a 304 returns without touching ``out``.
+    received = 0
+    total: int | None = None
+    etag: str | None = None
+    last_modified: str | None = None
+    attempts = 0
+    started = time.perf_counter()
+
+    while True:
+        attempts += 1
+        if received:
+            # If-Range turns a resume of a file that changed meanwhile into a
+            # full 200 response instead of a spliced body.
+            headers = {"Range": f"bytes={received}-"}
+            if etag or last_modified:
+                headers["If-Range"] = cast(str, etag or last_modified)
+        else:
+            headers = dict(validators or {})
+        try:
+            with fetcher.open(href, headers) as resp:
+                if received and resp.status == 206:
+                    content_range = _parse_content_range(
+                        resp.getheader("Content-Range")
+                    )
+                    if content_range is None or content_range[0] != received:
+                        raise ValueError(
+                            "Unexpected Content-Range in resumed download: "
+                            f"{resp.getheader('Content-Range')}"
+                        )
+                    total = content_range[1] if content_range[1] is not None else total
+                else:
+                    if received:
+                        _ = out.seek(0)
+                        _ = out.truncate()
+                        received = 0
+                    length = resp.getheader("Content-Length")
+                    total = int(length) if length is not None else None
+                    etag = resp.getheader("ETag")
+                    last_modified = resp.getheader("Last-Modified")
+
+                while chunk := resp.read(_COPY_CHUNK_SIZE):
+                    _ = out.write(chunk)
+                    received += len(chunk)
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and not received and validators:
+                return DownloadStats(
+                    size=0,
+                    seconds=time.perf_counter() - started,
+                    attempts=attempts,
+                    not_modified=True,
+                )
+            raise
+        except (OSError, http.client.HTTPException) as e:
+            if attempts > retries:
+                raise RuntimeError(
+                    f"Download failed after {attempts} attempt(s): {e}"
+                ) from e
+            time.sleep(fetcher.backoff(attempts))
+            continue
+
+        if total is None or received == total:
+            break
+        if received > total:
+            raise ValueError(
+                f"Download is larger than expected: {received} > {total} bytes"
+            )
+        if attempts > retries:
+            raise RuntimeError(
+                f"Download incomplete after {attempts} attempt(s): "
+                f"{received} of {total} bytes"
+            )
+        time.sleep(fetcher.backoff(attempts))
+
+    return DownloadStats(
+        size=received,
+        seconds=time.perf_counter() - started,
+        attempts=attempts,
+        etag=etag,
+        last_modified=last_modified,
+    )
+
+
+def _download_cached(
+    public_url: str,
+    path: str | None,
+    cache: DownloadCache,
+    *,
+    fetcher: HttpFetcher,
+    retries: int,
+) -> tuple[Path, DownloadStats]:
+    key = public_url if path is None else f"{public_url}#{path}"
+    cached = cache.load_file(key)
+    validators: dict[str, str] = {}
+    if cached is not None and cached.etag:
+        validators["If-None-Match"] = cached.etag
+    if cached is not None and cached.last_modified:
+        validators["If-Modified-Since"] = cached.last_modified
+
+    href = cache.load_href(key)
+    href_is_cached = href is not None
+    part = cache.part_path(key)
+    try:
+        while True:
+            if href is None:
+                href = resolve_public_download_href(
+                    public_url, path=path, fetcher=fetcher
+                )
+                cache.store_href(key, href)
+            try:
+                with part.open("wb") as f:
+                    stats = _stream_download(
+                        href, f, fetcher=fetcher, retries=retries, validators=validators
+                    )
+                break
+            except urllib.error.HTTPError as e:
+                # A cached href may have expired on the server before its TTL.
+                if not href_is_cached or e.code not in _STALE_HREF_CODES:
+                    raise
+                cache.forget_href(key)
+                href = None
+                href_is_cached = False
+
+        if stats.not_modified and cached is not None:
+            part.unlink()
+            return cached.path, stats
+        stored = cache.store_file(
+            key, part, etag=stats.etag, last_modified=stats.last_modified
+        )
+        return stored.path, stats
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+
+
+def download_public_buffer(
+    public_url: str,
+    *,
+    path: str | None = None,
+    spill_threshold: int = DEFAULT_SPILL_THRESHOLD,
+    retries: int = DEFAULT_RETRIES,
+    fetcher: HttpFetcher | None = None,
+    report: Callable[[DownloadStats], None] | None = None,
+    cache: DownloadCache | None = None,
+) -> IO[bytes]:
+    # Kept in memory unless the file is larger than ``spill_threshold`` bytes,
+    # in which case it rolls over to an anonymous temporary file. With a
+    # ``cache`` the body is kept on disk instead and revalidated on later runs,
+    # so an unchanged document costs a single 304.
+    fetcher = fetcher or _default_fetcher
+    if cache is not None:
+        body, stats = _download_cached(
+            public_url, path, cache, fetcher=fetcher, retries=retries
+        )
+        if report is not None:
+            report(stats)
+        return body.open("rb")
 
-    _ = dest.write_bytes(data)
+    href = resolve_public_download_href(public_url, path=path, fetcher=fetcher)
+    buf = tempfile.SpooledTemporaryFile(max_size=spill_threshold)
+    try:
+        stats = _stream_download(
+            href, cast(IO[bytes], buf), fetcher=fetcher, retries=retries
+        )
+        _ = buf.seek(0)
+    except BaseException:
+        buf.close()
+        raise
+    if report is not None:
+        report(stats)
+    return cast(IO[bytes], buf)
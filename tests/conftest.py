@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import io
+import threading
+import zipfile
+from collections.abc import Callable, Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TypeVar
+
+import pytest
+
+from src.openai_client import OpenAIClient, PromptResult
+
+_S = TypeVar("_S", bound=ThreadingHTTPServer)
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def numbered_paragraph(text: str, *, num_id: str = "1", ilvl: str | None = "0") -> str:
+    # ``ilvl=None`` leaves the level out, which Word reads as level 0.
+    ilvl_xml = f"<w:ilvl w:val='{ilvl}'/>" if ilvl is not None else ""
+    return (
+        f"<w:p><w:pPr><w:numPr>{ilvl_xml}<w:numId w:val='{num_id}'/></w:numPr>"
+        f"</w:pPr><w:r><w:t>{text}</w:t></w:r></w:p>"
+    )
+
+
+def docx_package(body: str) -> bytes:
+    xml = (
+        "<?xml version='1.0' encoding='UTF-8' standalone='yes'?>"
+        f"<w:document xmlns:w='{W_NS}'><w:body>{body}<w:sectPr/></w:body>"
+        "</w:document>"
+    )
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("word/document.xml", xml)
+    return buf.getvalue()
+
+
+def _quiet(handler: BaseHTTPRequestHandler, format: str, *args: object) -> None:
+    return None
+
+
+@pytest.fixture
+def serve() -> Iterator[Callable[[type[_S], type[BaseHTTPRequestHandler]], _S]]:
+    # Starts a local stand-in server on a free port; every server is shut down
+    # when the test ends. Request logging is silenced.
+    started: list[ThreadingHTTPServer] = []
+
+    def start(server_cls: type[_S], handler_cls: type[BaseHTTPRequestHandler]) -> _S:
+        handler = type(handler_cls.__name__, (handler_cls,), {"log_message": _quiet})
+        srv = server_cls(("127.0.0.1", 0), handler)
+        started.append(srv)
+        thread = threading.Thread(target=srv.serve_forever, daemon=True)
+        thread.start()
+        return srv
+
+    yield start
+    for srv in started:
+        srv.shutdown()
+        srv.server_close()
+
+
+def _fake_prompt(
+    self: OpenAIClient, *, paragraph_id: int, paragraph_text: str
+) -> PromptResult:
+    return PromptResult(
+        prompt=f"prompt for {paragraph_text}",
+        model="test-model",
+        response_id=f"resp-{paragraph_id}",
+        timestamp="2025-01-01T00:00:00+00:00",
+        input_tokens=100 + paragraph_id,
+        output_tokens=None if paragraph_id == 2 else 40,
+    )
+
+
+@pytest.fixture
+def fake_generate_prompt(monkeypatch) -> Callable[..., PromptResult]:
+    # Replaces the API call with a canned "prompt for <text>" result. Returned
+    # so a test can wrap it with its own patch. Paragraph 2 reports no output
+    # token count.
+    monkeypatch.setattr(OpenAIClient, "generate_prompt", _fake_prompt)
+    return _fake_prompt
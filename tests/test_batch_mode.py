@@ -0,0 +1,398 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO
+
+import pytest
+
+from generate_prompts import main
+from src.batch import (
+    Prefetcher,
+    collect_sources,
+    interleave_ready,
+    map_completed,
+    map_ordered,
+)
+from src.openai_client import PromptResult
+from src.parser import Paragraph
+from src.yandex_docx import PublicFolderItem
+
+
+def test_map_ordered_preserves_input_order() -> None:
+    results = list(map_ordered(lambda x: x * 2, range(20), workers=4))
+    assert results == [(i, i * 2) for i in range(20)]
+
+
+def test_map_completed_does_not_wait_for_a_slow_head() -> None:
+    release = threading.Event()
+
+    def work(x: int) -> int:
+        if x == 0:
+            assert release.wait(timeout=5)
+        return x
+
+    results: list[int] = []
+    for x, _ in map_completed(work, range(6), workers=2):
+        results.append(x)
+        if len(results) == 3:
+            release.set()
+
+    assert results[:3] == [1, 2, 3]
+    assert sorted(results) == list(range(6))
+
+
+def test_map_completed_yields_running_results_before_failing() -> None:
+    def work(x: int) -> int:
+        if x == 0:
+            time.sleep(0.05)
+            raise RuntimeError("boom")
+        return x
+
+    results: list[int] = []
+    with pytest.raises(RuntimeError, match="boom"):
+        for x, _ in map_completed(work, range(100), workers=2):
+            results.append(x)
+
+    # The window stays bounded behind the failing head: nothing past it ran.
+    assert results and max(results) < 4
+
+
+def test_map_completed_yields_running_results_when_the_source_fails() -> None:
+    def items() -> Iterator[int]:
+        yield from range(3)
+        raise ValueError("bad input")
+
+    def work(x: int) -> int:
+        time.sleep(0.05)
+        return x
+
+    results: list[int] = []
+    with pytest.raises(ValueError, match="bad input"):
+        for x, _ in map_completed(work, items(), workers=4):
+            results.append(x)
+    assert sorted(results) == [0, 1, 2]
+
+
+def test_prefetcher_stays_bounded_and_reraises_source_errors() -> None:
+    produced: list[int] = []
+
+    def source() -> Iterator[int]:
+        for i in range(10):
+            produced.append(i)
+            yield i
+        raise RuntimeError("source failed")
+
+    loaded = Prefetcher(source(), depth=2)
+    try:
+        assert loaded.get() == 0
+        time.sleep(0.05)
+        # One item handed out, two buffered, one waiting to be buffered.
+        assert len(produced) <= 4
+        assert [loaded.get() for _ in range(9)] == list(range(1, 10))
+        with pytest.raises(RuntimeError, match="source failed"):
+            _ = loaded.get()
+    finally:
+        loaded.close()
+
+
+def test_interleave_ready_admits_groups_as_they_arrive() -> None:
+    loaded = Prefetcher(iter([["a1", "a2"], ["b1"]]), depth=1)
+    try:
+        items = list(interleave_ready(loaded, lambda g: g))
+    finally:
+        loaded.close()
+    assert sorted(items) == [(["a1", "a2"], "a1"), (["a1", "a2"], "a2"), (["b1"], "b1")]
+    assert items[0] == (["a1", "a2"], "a1")
+
+
+def test_collect_sources_reads_inputs_from_and_dedupes_names(tmp_path: Path) -> None:
+    listing = tmp_path / "inputs.txt"
+    listing.write_text(
+        "# scripts\na.txt\n\nhttps://disk.yandex.ru/i/abc\nsub/a.txt\n",
+        encoding="utf-8",
+    )
+
+    sources = collect_sources(inputs_from=listing)
+
+    assert [s.name for s in sources] == ["a", "abc", "a-2"]
+    assert sources[0].path == tmp_path / "a.txt"
+    assert sources[1].yandex_url == "https://disk.yandex.ru/i/abc"
+    assert sources[2].path == tmp_path / "sub" / "a.txt"
+
+
+def test_input_dir_writes_one_output_per_document(
+    tmp_path: Path, monkeypatch, fake_generate_prompt
+) -> None:
+    in_dir = tmp_path / "scripts"
+    in_dir.mkdir()
+    (in_dir / "one.txt").write_text("1. Alpha\n2. Beta\n", encoding="utf-8")
+    (in_dir / "two.txt").write_text("1. Gamma\n", encoding="utf-8")
+    (in_dir / "notes.md").write_text("ignored", encoding="utf-8")
+    out_dir = tmp_path / "out"
+
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "generate_prompts",
+            "--input-dir",
+            str(in_dir),
+            "--output",
+            str(out_dir),
+            "--jsonl",
+            str(out_dir),
+            "--workers",
+            "3",
+        ],
+    )
+
+    code = main()
+    assert code == 0
+
+    with (out_dir / "one.csv").open(encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [(r["id"], r["prompt"]) for r in rows] == [
+        ("1", "prompt for Alpha"),
+        ("2", "prompt for Beta"),
+    ]
+
+    with (out_dir / "two.csv").open(encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [(r["id"], r["prompt"]) for r in rows] == [("1", "prompt for Gamma")]
+
+    assert len((out_dir / "two.jsonl").read_text(encoding="utf-8").splitlines()) == 1
+    assert not (out_dir / "notes.csv").exists()
+
+
+def test_multiple_yandex_urls_run_in_one_batch(
+    tmp_path: Path, monkeypatch, fake_generate_prompt
+) -> None:
+    out_dir = tmp_path / "out"
+
+    def fake_download(public_url: str, **kwargs: object) -> IO[bytes]:
+        return io.BytesIO(public_url.encode("utf-8"))
+
+    def fake_iter_docx_paragraphs(
+        source: IO[bytes], *, selection: object = None
+    ) -> list[Paragraph]:
+        name = source.read().decode("utf-8").rsplit("/", 1)[-1]
+        return [Paragraph(id=1, text=name)]
+
+    monkeypatch.setattr("src.yandex_docx.download_public_buffer", fake_download)
+    monkeypatch.setattr(
+        "generate_prompts.iter_docx_paragraphs", fake_iter_docx_paragraphs
+    )
+
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "generate_prompts",
+            "--yandex-url",
+            "https://disk.yandex.ru/i/first",
+            "--yandex-url",
+            "https://disk.yandex.ru/i/second",
+            "--output",
+            str(out_dir),
+        ],
+    )
+
+    code = main()
+    assert code == 0
+    assert "prompt for first" in (out_dir / "first.csv").read_text(encoding="utf-8")
+    assert "prompt for second" in (out_dir / "second.csv").read_text(encoding="utf-8")
+
+
+def test_generation_starts_before_later_documents_load(
+    tmp_path: Path, monkeypatch, fake_generate_prompt
+) -> None:
+    out_dir = tmp_path / "out"
+    first_call = threading.Event()
+
+    def fake_download(public_url: str, **kwargs: object) -> IO[bytes]:
+        # The second document only finishes loading once the first one is
+        # already being generated.
+        if public_url.endswith("second"):
+            assert first_call.wait(timeout=5)
+        return io.BytesIO(public_url.encode("utf-8"))
+
+    def fake_iter_docx_paragraphs(
+        source: IO[bytes], *, selection: object = None
+    ) -> list[Paragraph]:
+        name = source.read().decode("utf-8").rsplit("/", 1)[-1]
+        return [Paragraph(id=1, text=name)]
+
+    def generate_after_signal(
+        self, *, paragraph_id: int, paragraph_text: str
+    ) -> PromptResult:
+        first_call.set()
+        return fake_generate_prompt(
+            self, paragraph_id=paragraph_id, paragraph_text=paragraph_text
+        )
+
+    monkeypatch.setattr("src.yandex_docx.download_public_buffer", fake_download)
+    monkeypatch.setattr(
+        "generate_prompts.iter_docx_paragraphs", fake_iter_docx_paragraphs
+    )
+
+    from src.openai_client import OpenAIClient
+
+    monkeypatch.setattr(OpenAIClient, "generate_prompt", generate_after_signal)
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "generate_prompts",
+            "--yandex-url",
+            "https://disk.yandex.ru/i/first",
+            "--yandex-url",
+            "https://disk.yandex.ru/i/second",
+            "--output",
+            str(out_dir),
+            "--download-workers",
+            "1",
+        ],
+    )
+
+    assert main() == 0
+    assert "prompt for second" in (out_dir / "second.csv").read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize(
+    ("extra", "streams"),
+    [([], True), (["--shard", "1/1"], False), (["--ids", "1,2,3"], False)],
+)
+def test_generation_starts_before_the_document_is_parsed(
+    tmp_path: Path,
+    monkeypatch,
+    fake_generate_prompt,
+    extra: list[str],
+    streams: bool,
+) -> None:
+    inp = tmp_path / "script.txt"
+    inp.write_text("", encoding="utf-8")
+    out = tmp_path / "out.csv"
+    first_call = threading.Event()
+    # Whether the first call had started by the time the parse finished.
+    called_before_end: list[bool] = []
+
+    def lines() -> Iterator[str]:
+        yield "1. One\n"
+        yield "2. Two\n"
+        # Paragraph 1 is complete; the rest of the script is held back until
+        # its call starts. Sharding and --ids need the whole document first.
+        _ = first_call.wait(timeout=5 if streams else 0.3)
+        yield "3. Three\n"
+        called_before_end.append(first_call.is_set())
+
+    @contextmanager
+    def fake_open_text_input(path: Path) -> Iterator[Iterator[str]]:
+        assert path == inp
+        yield lines()
+
+    def generate_and_signal(
+        self, *, paragraph_id: int, paragraph_text: str
+    ) -> PromptResult:
+        first_call.set()
+        return fake_generate_prompt(
+            self, paragraph_id=paragraph_id, paragraph_text=paragraph_text
+        )
+
+    from src.openai_client import OpenAIClient
+
+    monkeypatch.setattr("generate_prompts.open_text_input", fake_open_text_input)
+    monkeypatch.setattr(OpenAIClient, "generate_prompt", generate_and_signal)
+    argv = ["generate_prompts", "--input", str(inp), "--output", str(out), *extra]
+    monkeypatch.setattr("sys.argv", argv)
+
+    assert main() == 0
+    assert called_before_end == [streams]
+    with out.open(encoding="utf-8", newline="") as f:
+        assert [row["id"] for row in csv.DictReader(f)] == ["1", "2", "3"]
+
+
+def test_yandex_folder_downloads_documents_concurrently(
+    tmp_path: Path, monkeypatch, fake_generate_prompt
+) -> None:
+    out_dir = tmp_path / "out"
+    names = ["a.docx", "b.docx", "c.docx"]
+
+    def fake_list(public_url: str, **kwargs: object) -> list[PublicFolderItem]:
+        assert public_url == "https://disk.yandex.ru/d/folder"
+        return [PublicFolderItem(name=n, path=f"/{n}") for n in names]
+
+    # Every download waits for all of them to start: this only completes when
+    # the documents are fetched concurrently.
+    barrier = threading.Barrier(len(names), timeout=5)
+
+    def fake_download(
+        public_url: str, *, path: str | None = None, **kwargs: object
+    ) -> IO[bytes]:
+        _ = barrier.wait()
+        return io.BytesIO(str(path).encode("utf-8"))
+
+    def fake_iter_docx_paragraphs(
+        source: IO[bytes], *, selection: object = None
+    ) -> list[Paragraph]:
+        return [Paragraph(id=1, text=source.read().decode("utf-8").strip("/"))]
+
+    monkeypatch.setattr("src.yandex_docx.list_public_folder", fake_list)
+    monkeypatch.setattr("src.yandex_docx.download_public_buffer", fake_download)
+    monkeypatch.setattr(
+        "generate_prompts.iter_docx_paragraphs", fake_iter_docx_paragraphs
+    )
+
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "generate_prompts",
+            "--yandex-folder",
+            "https://disk.yandex.ru/d/folder",
+            "--output",
+            str(out_dir),
+            "--download-workers",
+            "3",
+        ],
+    )
+
+    assert main() == 0
+    for name in names:
+        text = (out_dir / f"{Path(name).stem}.csv").read_text(encoding="utf-8")
+        assert f"prompt for {name}" in text
+
+
+def test_ndjson_streams_every_result_to_stdout(
+    tmp_path: Path, monkeypatch, capsys, fake_generate_prompt
+) -> None:
+    in_dir = tmp_path / "scripts"
+    in_dir.mkdir()
+    (in_dir / "one.txt").write_text("1. Alpha\n2. Beta\n", encoding="utf-8")
+    (in_dir / "two.txt").write_text("1. Gamma\n", encoding="utf-8")
+
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "generate_prompts",
+            "--input-dir",
+            str(in_dir),
+            "--output",
+            str(tmp_path / "out"),
+            "--ndjson",
+            "--flush-every",
+            "10",
+        ],
+    )
+
+    assert main() == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert sorted((r["document"], r["id"], r["prompt"]) for r in records) == [
+        ("one", "1", "prompt for Alpha"),
+        ("one", "2", "prompt for Beta"),
+        ("two", "1", "prompt for Gamma"),
+    ]
+    assert records[0]["model"] == "test-model"
+    assert len((tmp_path / "out" / "one.csv").read_text().splitlines()) == 3
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from generate_prompts import main
+from src.doc_cache import DocumentCache
+from src.parser import Paragraph
+
+
+def test_store_and_load_round_trip(tmp_path: Path) -> None:
+    cache = DocumentCache(tmp_path / "cache")
+    key = cache.key("abc", kind="docx")
+    paragraphs = [Paragraph(id=1, text="Привет"), Paragraph(id=7, text="b")]
+
+    assert cache.load(key) is None
+    cache.store(key, paragraphs)
+    assert cache.load(key) == paragraphs
+
+
+def test_key_depends_on_kind(tmp_path: Path) -> None:
+    cache = DocumentCache(tmp_path)
+    assert cache.key("abc", kind="docx") != cache.key("abc", kind="txt")
+
+
+def test_evicts_least_recently_used_entries(tmp_path: Path) -> None:
+    cache = DocumentCache(tmp_path, max_bytes=10**9)
+    keys = [cache.key(str(i), kind="txt") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.store(key, [Paragraph(id=i, text="x" * 2000)])
+        path = next(tmp_path.glob(f"*/{key}*"))
+        os.utime(path, (1000 + i, 1000 + i))
+
+    # Touch the oldest entry so the second one becomes least recently used.
+    assert cache.load(keys[0]) is not None
+
+    kept = sum(next(tmp_path.glob(f"*/{keys[i]}*")).stat().st_size for i in (0, 2))
+    small = DocumentCache(tmp_path, max_bytes=kept)
+    small.evict()
+
+    assert small.load(keys[0]) is not None
+    assert small.load(keys[1]) is None
+    assert small.load(keys[2]) is not None
+
+
+def test_cli_reuses_cached_paragraphs(tmp_path: Path, monkeypatch) -> None:
+    inp = tmp_path / "script.txt"
+    inp.write_text("1. Hello\n2. World\n", encoding="utf-8")
+    cache_dir = tmp_path / "cache"
+
+    argv = [
+        "generate_prompts",
+        "--input",
+        str(inp),
+        "--output",
+        str(tmp_path / "out.csv"),
+        "--cache-dir",
+        str(cache_dir),
+        "--dry-run",
+    ]
+    monkeypatch.setattr("sys.argv", argv)
+    assert main() == 0
+    assert list(cache_dir.glob("*/*"))
+
+    def should_not_parse(text: str) -> list[Paragraph]:
+        raise AssertionError("cached document should not be re-parsed")
+
+    monkeypatch.setattr("generate_prompts.iter_numbered_paragraphs", should_not_parse)
+    assert main() == 0
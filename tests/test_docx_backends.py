@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import pytest
+
+from src.docx_backends import available_backends, get_backend
+from src.docx_reader import iter_docx_paragraphs, read_docx_paragraphs, read_docx_text
+from src.parser import Paragraph, Selection, parse_numbered_paragraphs
+from tests.conftest import docx_package, numbered_paragraph
+
+# Each case: (body xml, expected read_docx_text output). Every backend must
+# produce exactly this output.
+_CASES: dict[str, tuple[str, str]] = {
+    "numbered_skips_headings": (
+        "<w:p><w:r><w:t>Heading</w:t></w:r></w:p>"
+        + numbered_paragraph("First")
+        + numbered_paragraph("Second"),
+        "1. First\n2. Second",
+    ),
+    "separate_counters_per_num_id": (
+        numbered_paragraph("A", num_id="1")
+        + numbered_paragraph("B", num_id="2")
+        + numbered_paragraph("C"),
+        "1. A\n1. B\n2. C",
+    ),
+    "nested_levels_and_missing_ilvl": (
+        numbered_paragraph("Top")
+        + numbered_paragraph("Child", ilvl="1")
+        + numbered_paragraph("Next", ilvl=None),
+        "1. Top\nChild\n2. Next",
+    ),
+    "empty_numbered_items_are_skipped": (
+        numbered_paragraph("") + numbered_paragraph("Only"),
+        "1. Only",
+    ),
+    "numpr_without_num_id_is_unnumbered": (
+        "<w:p><w:pPr><w:numPr><w:ilvl w:val='0'/></w:numPr></w:pPr>"
+        "<w:r><w:t>Loose</w:t></w:r></w:p>" + numbered_paragraph("Real"),
+        "1. Real",
+    ),
+    "tables_and_text_boxes_are_not_body_paragraphs": (
+        numbered_paragraph("One")
+        + "<w:tbl><w:tr><w:tc>"
+        + numbered_paragraph("In table")
+        + "</w:tc></w:tr></w:tbl>"
+        + "<w:p><w:pPr><w:numPr><w:ilvl w:val='0'/><w:numId w:val='1'/></w:numPr>"
+        "</w:pPr><w:r><w:t>Two</w:t></w:r><w:r><w:txbxContent>"
+        + numbered_paragraph("Boxed")
+        + "</w:txbxContent></w:r></w:p>",
+        "1. One\n2. TwoBoxed",
+    ),
+    "tabs_and_breaks_in_numbered_text": (
+        "<w:p><w:pPr><w:numPr><w:numId w:val='3'/></w:numPr></w:pPr>"
+        "<w:r><w:t xml:space='preserve'> a </w:t><w:tab/><w:t>b</w:t>"
+        "<w:br/><w:t>c</w:t></w:r></w:p>",
+        "1. a \tb\nc",
+    ),
+    "plain_text_when_nothing_is_numbered": (
+        "<w:p><w:r><w:t xml:space='preserve'>Hello </w:t></w:r>"
+        "<w:hyperlink><w:r><w:t>link</w:t></w:r></w:hyperlink></w:p>"
+        "<w:p/>"
+        "<w:p><w:r><w:t>a</w:t><w:ptab/><w:t>b</w:t><w:br w:type='page'/>"
+        "<w:noBreakHyphen/><w:cr/><w:br/></w:r>"
+        "<w:ins><w:r><w:t>skipped</w:t></w:r></w:ins></w:p>",
+        "Hello link\n\na\tb-\n\n",
+    ),
+}
+
+
+@pytest.fixture(params=available_backends())
+def backend(request: pytest.FixtureRequest) -> str:
+    return str(request.param)
+
+
+@pytest.mark.parametrize("case", sorted(_CASES))
+def test_backend_conformance(backend: str, case: str) -> None:
+    body, expected = _CASES[case]
+    assert read_docx_text(docx_package(body), backend=backend) == expected
+
+
+def test_backends_agree_on_large_document() -> None:
+    body = "".join(
+        numbered_paragraph(f"Item {i}", num_id=str(i % 3), ilvl=str(i % 2))
+        for i in range(500)
+    )
+    data = docx_package(body)
+    outputs = {
+        name: read_docx_text(data, backend=name) for name in available_backends()
+    }
+    assert len(set(outputs.values())) == 1
+
+
+def test_get_backend_default_and_env(monkeypatch) -> None:
+    monkeypatch.delenv("DOCX_BACKEND", raising=False)
+    assert get_backend().name == "stdlib"
+
+    monkeypatch.setenv("DOCX_BACKEND", available_backends()[-1])
+    assert get_backend().name == available_backends()[-1]
+
+    with pytest.raises(ValueError, match="Unknown DOCX backend"):
+        get_backend("nope")
+
+
+def test_selection_skips_unselected_items(backend: str) -> None:
+    body = (
+        numbered_paragraph("One")
+        + numbered_paragraph("One child", ilvl="1")
+        + numbered_paragraph("Two")
+        + numbered_paragraph("Two child", ilvl="1")
+        + numbered_paragraph("")
+        + numbered_paragraph("Three")
+        + numbered_paragraph("Four")
+    )
+    data = docx_package(body)
+
+    by_range = read_docx_text(data, backend=backend, selection=Selection(start=2))
+    assert by_range == "1.\n2. Two\nTwo child\n3. Three\n4. Four"
+
+    by_limit = read_docx_text(data, backend=backend, selection=Selection(limit=2))
+    assert by_limit == "1. One\nOne child\n2. Two\nTwo child\n3."
+
+    by_ids = read_docx_text(
+        data, backend=backend, selection=Selection(ids=frozenset({3}))
+    )
+    assert by_ids == "1.\n2.\n3. Three\n4."
+
+
+def test_selection_round_trips_through_parser(backend: str) -> None:
+    body = "<w:p><w:r><w:t>Heading</w:t></w:r></w:p>" + "".join(
+        numbered_paragraph(f"Item {i}", ilvl=str(i % 3 // 2)) for i in range(40)
+    )
+    data = docx_package(body)
+    full = parse_numbered_paragraphs(read_docx_text(data, backend=backend))
+    for selection in [Selection(start=3, end=7), Selection(limit=4)]:
+        text = read_docx_text(data, backend=backend, selection=selection)
+        assert parse_numbered_paragraphs(text, selection) == selection.apply(full)
+
+
+# Cases whose text output is not a valid numbered script on its own.
+_NOT_PARSEABLE = {"plain_text_when_nothing_is_numbered", "separate_counters_per_num_id"}
+
+
+@pytest.mark.parametrize("case", sorted(set(_CASES) - _NOT_PARSEABLE))
+def test_paragraphs_match_parsed_text(backend: str, case: str) -> None:
+    data = docx_package(_CASES[case][0])
+    expected = parse_numbered_paragraphs(read_docx_text(data, backend=backend))
+    assert read_docx_paragraphs(data, backend=backend) == expected
+
+
+def test_paragraphs_do_not_reparse_item_text(backend: str) -> None:
+    body = (
+        "<w:p><w:pPr><w:numPr><w:numId w:val='1'/></w:numPr></w:pPr>"
+        "<w:r><w:t>Intro</w:t><w:br/><w:t>5. not a header</w:t></w:r></w:p>"
+        + numbered_paragraph("2) nested", ilvl="1")
+        + numbered_paragraph("Next")
+    )
+    assert read_docx_paragraphs(docx_package(body), backend=backend) == [
+        Paragraph(id=1, text="Intro 5. not a header 2) nested"),
+        Paragraph(id=2, text="Next"),
+    ]
+
+
+def test_paragraphs_reject_duplicates_and_leading_nested_items(backend: str) -> None:
+    duplicate = docx_package(
+        numbered_paragraph("A", num_id="1") + numbered_paragraph("B", num_id="2")
+    )
+    with pytest.raises(ValueError, match=r"Duplicate paragraph id 1"):
+        read_docx_paragraphs(duplicate, backend=backend)
+
+    leading = docx_package(
+        numbered_paragraph("Child", ilvl="1") + numbered_paragraph("Top")
+    )
+    with pytest.raises(ValueError, match=r"before first paragraph header"):
+        read_docx_paragraphs(leading, backend=backend)
+
+
+def test_paragraphs_fall_back_to_text_numbering(backend: str) -> None:
+    body = "".join(
+        f"<w:p><w:r><w:t>{line}</w:t></w:r></w:p>" for line in ["1. One", "2) Two"]
+    )
+    assert read_docx_paragraphs(docx_package(body), backend=backend) == [
+        Paragraph(id=1, text="One"),
+        Paragraph(id=2, text="Two"),
+    ]
+
+
+def test_paragraphs_apply_selection(backend: str) -> None:
+    body = "".join(numbered_paragraph(f"Item {i}") for i in range(1, 11))
+    data = docx_package(body)
+    full = read_docx_paragraphs(data, backend=backend)
+    for selection in [
+        Selection(start=3, end=5),
+        Selection(limit=2),
+        Selection(ids=frozenset({9, 4})),
+        Selection(limit=0),
+    ]:
+        paragraphs = read_docx_paragraphs(data, backend=backend, selection=selection)
+        assert paragraphs == selection.apply(full)
+
+
+def test_paragraphs_stream_while_the_part_is_read(backend: str) -> None:
+    # The first paragraphs come out long before the parser reaches the broken
+    # end of the document part.
+    body = "".join(numbered_paragraph(f"Item {i}") for i in range(1, 2001))
+    paragraphs = iter_docx_paragraphs(
+        docx_package(body + "<w:p><w:r>"), backend=backend
+    )
+    assert next(paragraphs) == Paragraph(id=1, text="Item 1")
+    with pytest.raises(SyntaxError):
+        _ = list(paragraphs)
@@ -4,6 +4,7 @@ from pathlib import Path
 
 from generate_prompts import main
 from src.openai_client import PromptResult
+from src.parser import Paragraph
 
 
 def test_docx_input_uses_docx_reader(tmp_path: Path, monkeypatch) -> None:
@@ -12,13 +13,15 @@ def test_docx_input_uses_docx_reader(tmp_path: Path, monkeypatch) -> None:
 
     inp.write_bytes(b"fake-docx")
 
-    def fake_read_docx_text(path: Path) -> str:
+    def fake_iter_docx_paragraphs(
+        path: Path, *, selection: object = None
+    ) -> list[Paragraph]:
         assert path == inp
-        return "1. Hello\n"
+        return [Paragraph(id=1, text="Hello")]
 
     monkeypatch.setattr(
-        "generate_prompts.read_docx_text",
-        fake_read_docx_text,
+        "generate_prompts.iter_docx_paragraphs",
+        fake_iter_docx_paragraphs,
     )
 
     from src.openai_client import OpenAIClient
@@ -4,6 +4,7 @@ import zipfile
 from pathlib import Path
 
 from src.docx_reader import read_docx_text
+from tests.conftest import numbered_paragraph
 
 
 def _build_minimal_numbered_docx(path: Path) -> None:
@@ -52,3 +53,74 @@ def test_read_docx_text_extracts_numbered_list_and_skips_headings(
         "1. First item",
         "2. Second item",
     ]
+
+
+def test_read_docx_text_only_counts_body_level_paragraphs(tmp_path: Path) -> None:
+    body = "".join(
+        [
+            numbered_paragraph("One", num_id="1"),
+            "<w:tbl><w:tr><w:tc>",
+            numbered_paragraph("Inside table", num_id="1"),
+            "</w:tc></w:tr></w:tbl>",
+            numbered_paragraph("Nested", num_id="1", ilvl="1"),
+            numbered_paragraph("Other list", num_id="2"),
+            numbered_paragraph("", num_id="1"),
+            numbered_paragraph("Two", num_id="1"),
+        ]
+    )
+    xml = (
+        "<w:document xmlns:w='http://schemas.openxmlformats.org/"
+        f"wordprocessingml/2006/main'><w:body>{body}<w:sectPr/></w:body>"
+        "</w:document>"
+    )
+    docx_path = tmp_path / "input.docx"
+    with zipfile.ZipFile(docx_path, "w") as zf:
+        zf.writestr("word/document.xml", xml)
+
+    assert read_docx_text(docx_path).splitlines() == [
+        "1. One",
+        "Nested",
+        "1. Other list",
+        "2. Two",
+    ]
+
+
+def test_read_docx_text_without_numbering_matches_python_docx(
+    tmp_path: Path, monkeypatch
+) -> None:
+    import docx
+    from docx.enum.text import WD_BREAK
+
+    document = docx.Document()
+    document.add_heading("Title", 0)
+    p = document.add_paragraph("Hello\tworld ")
+    p.add_run("line").add_break()
+    p.add_run("after break")
+    p.add_run("x").add_break(WD_BREAK.PAGE)
+    p.add_run("  trailing  ")
+    document.add_table(rows=1, cols=1).cell(0, 0).text = "in table"
+    document.add_paragraph("")
+    document.add_paragraph("last")
+    docx_path = tmp_path / "plain.docx"
+    document.save(str(docx_path))
+
+    expected = "\n".join(p.text for p in docx.Document(str(docx_path)).paragraphs)
+
+    def no_fallback(path: Path) -> str:
+        raise AssertionError("python-docx fallback should not be used")
+
+    monkeypatch.setattr("src.docx_reader._read_docx_text_fallback", no_fallback)
+
+    assert read_docx_text(docx_path) == expected
+
+
+def test_read_docx_text_accepts_bytes_and_buffers(tmp_path: Path) -> None:
+    import io
+
+    docx_path = tmp_path / "input.docx"
+    _build_minimal_numbered_docx(docx_path)
+    data = docx_path.read_bytes()
+
+    expected = ["1. First item", "2. Second item"]
+    assert read_docx_text(data).splitlines() == expected
+    assert read_docx_text(io.BytesIO(data)).splitlines() == expected
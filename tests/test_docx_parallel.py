@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import pytest
+
+from src import docx_reader
+from src.docx_backends import available_backends
+from src.docx_reader import read_docx_paragraphs, read_docx_text
+from src.parser import Selection
+from tests.conftest import W_NS, docx_package, numbered_paragraph
+
+
+@pytest.fixture
+def force_parallel(monkeypatch) -> None:
+    monkeypatch.setattr(docx_reader, "PARALLEL_MIN_PARAGRAPHS", 0)
+    monkeypatch.setattr(docx_reader, "_PARALLEL_MIN_BYTES", 0)
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_parallel_output_is_identical_to_sequential(
+    backend: str, force_parallel: None
+) -> None:
+    parts = []
+    for i in range(300):
+        parts.append(
+            numbered_paragraph(f"Item {i}", num_id=str(i % 4), ilvl=str(i % 3 // 2))
+        )
+        if i % 50 == 0:
+            parts.append("<w:p><w:r><w:t>Heading</w:t></w:r></w:p>")
+    data = docx_package("".join(parts))
+
+    sequential = read_docx_text(data, backend=backend, workers=1)
+    parallel = read_docx_text(data, backend=backend, workers=4)
+
+    assert parallel == sequential
+    assert sequential.splitlines()[:3] == ["1. Item 0", "1. Item 1", "Item 2"]
+
+
+def test_parallel_paragraphs_are_identical_to_sequential(force_parallel: None) -> None:
+    data = docx_package(
+        "".join(
+            numbered_paragraph(f"Item {i}", num_id="1", ilvl=str(i % 3 // 2))
+            for i in range(300)
+        )
+    )
+
+    sequential = read_docx_paragraphs(data, workers=1)
+    assert read_docx_paragraphs(data, workers=4) == sequential
+    assert [p.id for p in sequential[:3]] == [1, 2, 3]
+
+
+@pytest.mark.parametrize(
+    "selection", [Selection(limit=3), Selection(ids=frozenset({2, 5}))]
+)
+def test_selection_that_stops_early_streams(
+    selection: Selection, monkeypatch, force_parallel: None
+) -> None:
+    data = docx_package(
+        "".join(numbered_paragraph(f"Item {i}", num_id="1") for i in range(300))
+    )
+
+    def whole_part(*args: object) -> list[docx_reader._Scan]:
+        raise AssertionError("read the whole part")
+
+    monkeypatch.setattr(docx_reader, "_scan_document_bytes", whole_part)
+
+    paragraphs = read_docx_paragraphs(data, workers=4, selection=selection)
+    assert paragraphs == selection.apply(read_docx_paragraphs(data, workers=1))
+
+
+def test_split_body_produces_standalone_fragments() -> None:
+    xml = (
+        f"<w:document xmlns:w='{W_NS}'><w:body>"
+        + "".join(numbered_paragraph(f"P{i}", num_id="1") for i in range(10))
+        + "<w:sectPr/></w:body></w:document>"
+    ).encode()
+
+    fragments = docx_reader._split_body(xml, 3)
+
+    assert fragments is not None
+    assert len(fragments) == 3
+    for fragment in fragments:
+        assert fragment.startswith(f"<w:document xmlns:w='{W_NS}'><w:body>".encode())
+        assert fragment.endswith(b"</w:body></w:document>")
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_cut_inside_table_falls_back_to_sequential(
+    backend: str, monkeypatch, force_parallel: None
+) -> None:
+    cell = "".join(numbered_paragraph(f"Cell {i}", num_id="9") for i in range(50))
+    body = (
+        numbered_paragraph("Before", num_id="1")
+        + f"<w:tbl><w:tr><w:tc>{cell}</w:tc></w:tr></w:tbl>"
+        + numbered_paragraph("After", num_id="1")
+    )
+    data = docx_package(body)
+
+    # Chunks are scanned in real worker processes; only the sequential
+    # fallback runs here.
+    fallbacks: list[str] = []
+    original = docx_reader._scan_fragment
+
+    def counting_scan(backend_name: str, fragment: bytes) -> docx_reader._Scan:
+        fallbacks.append(backend_name)
+        return original(backend_name, fragment)
+
+    monkeypatch.setattr(docx_reader, "_scan_fragment", counting_scan)
+
+    assert read_docx_text(data, backend=backend, workers=4) == "1. Before\n2. After"
+    assert fallbacks == [backend]
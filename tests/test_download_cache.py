@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from src import yandex_docx
+from src.download_cache import DownloadCache
+
+
+class _YandexStandIn(ThreadingHTTPServer):
+    # ``/resolve`` hands out ``/file/<generation>`` hrefs; hrefs from older
+    # generations answer 410 like an expired signed link.
+    payload: bytes = b""
+    etag: str = '"v1"'
+    generation: int = 1
+    requests: list[tuple[str, str | None]]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: _YandexStandIn
+
+    def do_GET(self) -> None:
+        srv = self.server
+        srv.requests.append((self.path, self.headers.get("If-None-Match")))
+
+        if self.path.startswith("/resolve?"):
+            host, port = srv.server_address[:2]
+            href = f"http://{host}:{port}/file/{srv.generation}"
+            self._send(200, json.dumps({"href": href}).encode("utf-8"))
+            return
+
+        if self.path != f"/file/{srv.generation}":
+            self._send(410, b"")
+            return
+        if self.headers.get("If-None-Match") == srv.etag:
+            self.send_response(304)
+            self.send_header("ETag", srv.etag)
+            self.end_headers()
+            return
+        self._send(200, srv.payload, etag=srv.etag)
+
+    def _send(self, code: int, body: bytes, *, etag: str | None = None) -> None:
+        self.send_response(code)
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        _ = self.wfile.write(body)
+
+
+@pytest.fixture
+def stand_in(serve, monkeypatch) -> _YandexStandIn:
+    srv = serve(_YandexStandIn, _Handler)
+    srv.requests = []
+    monkeypatch.setattr(
+        yandex_docx,
+        "_YANDEX_PUBLIC_DOWNLOAD_ENDPOINT",
+        f"http://127.0.0.1:{srv.server_address[1]}/resolve",
+    )
+    return srv
+
+
+def _fetch(cache: DownloadCache) -> tuple[bytes, yandex_docx.DownloadStats]:
+    seen: list[yandex_docx.DownloadStats] = []
+    with yandex_docx.download_public_buffer(
+        "https://disk/public", cache=cache, report=seen.append
+    ) as buf:
+        return buf.read(), seen[0]
+
+
+def _paths(srv: _YandexStandIn) -> list[str]:
+    return [path.split("?")[0] for path, _ in srv.requests]
+
+
+def test_unchanged_document_costs_a_single_304(
+    stand_in: _YandexStandIn, tmp_path: Path
+) -> None:
+    stand_in.payload = b"docx-bytes" * 100
+    cache = DownloadCache(tmp_path)
+
+    body, stats = _fetch(cache)
+    assert body == stand_in.payload
+    assert not stats.not_modified
+
+    stand_in.requests.clear()
+    body, stats = _fetch(cache)
+    assert body == stand_in.payload
+    assert stats.not_modified
+    assert stand_in.requests == [("/file/1", '"v1"')]
+
+
+def test_changed_document_is_downloaded_again(
+    stand_in: _YandexStandIn, tmp_path: Path
+) -> None:
+    cache = DownloadCache(tmp_path)
+    stand_in.payload = b"old"
+    _ = _fetch(cache)
+
+    stand_in.payload = b"new contents"
+    stand_in.etag = '"v2"'
+    body, stats = _fetch(cache)
+
+    assert body == b"new contents"
+    assert stats.etag == '"v2"'
+    assert cache.load_file("https://disk/public") is not None
+
+
+def test_expired_href_is_resolved_again(
+    stand_in: _YandexStandIn, tmp_path: Path
+) -> None:
+    stand_in.payload = b"x"
+    cache = DownloadCache(tmp_path, href_ttl=0)
+    _ = _fetch(cache)
+
+    stand_in.requests.clear()
+    _ = _fetch(cache)
+    assert _paths(stand_in) == ["/resolve", "/file/1"]
+
+
+def test_stale_cached_href_falls_back_to_resolving(
+    stand_in: _YandexStandIn, tmp_path: Path
+) -> None:
+    stand_in.payload = b"x"
+    cache = DownloadCache(tmp_path)
+    _ = _fetch(cache)
+
+    stand_in.generation = 2
+    stand_in.requests.clear()
+    body, stats = _fetch(cache)
+
+    assert body == b"x"
+    assert stats.not_modified
+    assert _paths(stand_in) == ["/file/1", "/resolve", "/file/2"]
+
+
+def test_bodies_are_evicted_least_recently_used_first(tmp_path: Path) -> None:
+    cache = DownloadCache(tmp_path, max_bytes=12)
+
+    def store(key: str) -> Path:
+        part = cache.part_path(key)
+        _ = part.write_bytes(b"x" * 6)
+        return cache.store_file(key, part, etag=None, last_modified=None).path
+
+    a, b = store("a"), store("b")
+    os.utime(a, (1, 1))
+    os.utime(b, (2, 2))
+    assert cache.load_file("a") is not None
+
+    # "b" is now the least recently used body.
+    _ = store("c")
+    assert cache.load_file("b") is None
+    assert cache.load_file("a") is not None
+    assert cache.load_file("c") is not None
+
+    # A body larger than the cap is still kept for the caller to read.
+    cache = DownloadCache(tmp_path, max_bytes=1)
+    assert store("d").exists()
+    assert [cache.load_file(k) is None for k in "acd"] == [True, True, False]
@@ -29,3 +29,28 @@ def test_empty_selection_exits_one_and_writes_no_output(
     code = main()
     assert code == 1
     assert not out.exists()
+
+
+def test_empty_ids_selection_lists_all_available_ids(
+    tmp_path: Path, monkeypatch, capsys
+) -> None:
+    inp = tmp_path / "script.txt"
+    inp.write_text("1. a\n2. b\n3. c\n", encoding="utf-8")
+
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "generate_prompts",
+            "--input",
+            str(inp),
+            "--output",
+            str(tmp_path / "out.csv"),
+            "--ids",
+            "9999",
+        ],
+    )
+
+    assert main() == 1
+    err = capsys.readouterr().err
+    assert "processing 0 paragraph(s)\nwarning: no paragraphs selected" in err
+    assert "available ids: 1,2,3" in err
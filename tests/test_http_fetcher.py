@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import http.client
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import yandex_docx
+from src.yandex_docx import FetcherConfig, HttpFetcher
+
+
+class _Server(ThreadingHTTPServer):
+    # ``script`` is consumed one entry per request: (status, headers). Once it
+    # runs out every request gets 200 "ok". With ``hang_up`` every request is
+    # answered by closing the connection.
+    script: list[tuple[int, dict[str, str]]]
+    connections: int
+    requests: int
+    drop_idle: bool
+    hang_up: bool
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _Server
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self) -> None:
+        self.server.requests += 1
+        if self.server.hang_up:
+            self.close_connection = True
+            return
+        status, headers = (200, {})
+        if self.server.script:
+            status, headers = self.server.script.pop(0)
+        body = b"ok" if status == 200 else b"err"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        _ = self.wfile.write(body)
+        if self.server.drop_idle:
+            # Close without announcing it, like a server timing out idle sockets.
+            self.close_connection = True
+
+
+@pytest.fixture
+def server(serve) -> _Server:
+    srv = serve(_Server, _Handler)
+    srv.script = []
+    srv.connections = 0
+    srv.requests = 0
+    srv.drop_idle = False
+    srv.hang_up = False
+    return srv
+
+
+@pytest.fixture
+def sleeps(monkeypatch) -> list[float]:
+    recorded: list[float] = []
+    monkeypatch.setattr(yandex_docx.time, "sleep", recorded.append)
+    return recorded
+
+
+def _url(srv: _Server, path: str = "/") -> str:
+    return f"http://127.0.0.1:{srv.server_address[1]}{path}"
+
+
+def _get(fetcher: HttpFetcher, url: str) -> bytes:
+    with fetcher.open(url) as resp:
+        return resp.read()
+
+
+def test_connections_are_reused_per_host(server: _Server) -> None:
+    fetcher = HttpFetcher()
+    for _ in range(5):
+        assert _get(fetcher, _url(server)) == b"ok"
+    fetcher.close()
+
+    assert fetcher.connections_opened == 1
+    assert server.connections == 1
+
+
+def test_stale_idle_connection_is_replaced(server: _Server, sleeps) -> None:
+    server.drop_idle = True
+    fetcher = HttpFetcher()
+
+    assert _get(fetcher, _url(server)) == b"ok"
+    assert _get(fetcher, _url(server)) == b"ok"
+
+    assert fetcher.connections_opened == 2
+    assert sleeps == []
+
+
+def test_retry_after_is_honoured(server: _Server, sleeps) -> None:
+    server.script = [(503, {"Retry-After": "7"}), (429, {"Retry-After": "2"})]
+    fetcher = HttpFetcher()
+
+    assert _get(fetcher, _url(server)) == b"ok"
+    assert sleeps == [7.0, 2.0]
+    assert fetcher.connections_opened == 1
+
+
+def test_backoff_is_jittered_and_capped(server: _Server, sleeps) -> None:
+    server.script = [(500, {}), (502, {}), (504, {})]
+    fetcher = HttpFetcher(FetcherConfig(backoff_base=1.0, backoff_max=1.5))
+
+    assert _get(fetcher, _url(server)) == b"ok"
+    assert len(sleeps) == 3
+    assert 0 <= sleeps[0] <= 1.0
+    assert all(0 <= s <= 1.5 for s in sleeps[1:])
+
+
+def test_gives_up_after_retries(server: _Server, sleeps) -> None:
+    server.script = [(503, {})] * 3
+    fetcher = HttpFetcher(FetcherConfig(retries=2))
+
+    with pytest.raises(urllib.error.HTTPError) as exc_info:
+        _ = _get(fetcher, _url(server))
+    assert exc_info.value.code == 503
+    assert len(sleeps) == 2
+
+
+def test_client_errors_are_not_retried(server: _Server, sleeps) -> None:
+    server.script = [(404, {})]
+
+    with pytest.raises(urllib.error.HTTPError) as exc_info:
+        _ = _get(HttpFetcher(), _url(server))
+    assert exc_info.value.code == 404
+    assert sleeps == []
+
+
+def test_redirects_are_followed(server: _Server) -> None:
+    server.script = [(302, {"Location": "/elsewhere"})]
+    fetcher = HttpFetcher()
+
+    assert _get(fetcher, _url(server, "/start")) == b"ok"
+    assert fetcher.connections_opened == 1
+
+
+def test_redirect_without_location_releases_the_connection_once(
+    server: _Server,
+) -> None:
+    server.script = [(302, {})]
+    fetcher = HttpFetcher()
+
+    with pytest.raises(urllib.error.HTTPError) as exc_info:
+        _ = _get(fetcher, _url(server))
+    assert exc_info.value.code == 302
+    assert [len(idle) for idle in fetcher._idle.values()] == [1]
+
+
+def test_dropped_pooled_connections_count_against_the_retry_budget(
+    server: _Server, sleeps
+) -> None:
+    fetcher = HttpFetcher(FetcherConfig(retries=2))
+    # Three idle connections in the pool.
+    with fetcher.open(_url(server)) as a, fetcher.open(_url(server)) as b:
+        with fetcher.open(_url(server)) as c:
+            assert (a.read(), b.read(), c.read()) == (b"ok", b"ok", b"ok")
+    server.requests = 0
+    server.hang_up = True
+
+    with pytest.raises((OSError, http.client.HTTPException)):
+        _ = _get(fetcher, _url(server))
+
+    # One free retry on a new connection, then the usual attempts.
+    assert server.requests == 4
+    assert len(sleeps) == 2
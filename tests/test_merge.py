@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+
+from generate_prompts import main
+from src.merge import ResultMerger
+
+FIELDNAMES = ["id", "paragraph", "prompt", "model", "response_id", "timestamp"]
+
+
+def _row(i: int, prompt: str, ts: str) -> dict[str, str]:
+    return {
+        "id": str(i),
+        "paragraph": f"p{i}",
+        "prompt": prompt,
+        "model": "m",
+        "response_id": "r",
+        "timestamp": ts,
+    }
+
+
+def _write_csv(path: Path, rows: list[dict[str, str]], delimiter: str = ",") -> None:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES, delimiter=delimiter)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+@pytest.mark.parametrize("run_size", [1, 2, 100])
+def test_merge_keeps_newest_row_per_id_sorted(tmp_path: Path, run_size: int) -> None:
+    first = tmp_path / "a.csv"
+    _write_csv(
+        first,
+        [
+            _row(3, "a3", "2025-01-01T00:00:00+00:00"),
+            _row(1, "a1", "2025-01-03T00:00:00+00:00"),
+            _row(10, "a10", "2025-01-01T00:00:00+00:00"),
+        ],
+    )
+    second = tmp_path / "b.tsv"
+    _write_csv(
+        second,
+        [
+            _row(1, "b1", "2025-01-02T00:00:00+00:00"),
+            _row(2, "b2", "2025-01-02T00:00:00+00:00"),
+        ],
+        delimiter="\t",
+    )
+    third = tmp_path / "c.jsonl.gz"
+    with gzip.open(third, "wt", encoding="utf-8") as f:
+        # Same timestamp as a.csv: the later input wins.
+        _ = f.write(json.dumps(_row(3, "c3", "2025-01-01T00:00:00Z")) + "\n")
+        _ = f.write(json.dumps(_row(2, "c2", "2025-01-01T00:00:00Z")) + "\n")
+
+    merger = ResultMerger(
+        [first, second, third],
+        fieldnames=FIELDNAMES,
+        encoding="utf-8",
+        run_size=run_size,
+        tmp_dir=tmp_path,
+    )
+    rows = list(merger.rows())
+
+    assert [(r["id"], r["prompt"]) for r in rows] == [
+        ("1", "a1"),
+        ("2", "b2"),
+        ("3", "c3"),
+        ("10", "a10"),
+    ]
+    assert merger.read == 7
+    assert (merger.runs > 0) == (run_size < 4)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "a.csv",
+        "b.tsv",
+        "c.jsonl.gz",
+    ]
+
+
+def test_merge_command_writes_output_and_checks_headers(
+    tmp_path: Path, monkeypatch
+) -> None:
+    first = tmp_path / "shard-1.csv"
+    second = tmp_path / "shard-2.csv"
+    _write_csv(first, [_row(2, "x", "t"), _row(1, "y", "t")])
+    _write_csv(second, [_row(2, "z", "t")])
+    out = tmp_path / "merged.tsv"
+
+    argv = ["generate_prompts", "merge", str(first), str(second), "--output", str(out)]
+    monkeypatch.setattr("sys.argv", [*argv, "--format", "tsv"])
+    assert main() == 0
+    lines = out.read_text(encoding="utf-8").splitlines()
+    assert lines[0] == "\t".join(FIELDNAMES)
+    assert [line.split("\t")[:3] for line in lines[1:]] == [
+        ["1", "p1", "y"],
+        ["2", "p2", "z"],
+    ]
+
+    second.write_text("id,paragraph,prompt\n3,p3,q3\n", encoding="utf-8")
+    monkeypatch.setattr("sys.argv", argv)
+    assert main() == 1
+
+    monkeypatch.setattr(
+        "sys.argv", ["generate_prompts", "merge", str(first), "--output", str(first)]
+    )
+    assert main() == 1
+    assert first.read_text(encoding="utf-8").startswith("id,")
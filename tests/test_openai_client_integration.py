@@ -12,9 +12,14 @@ class _FakeResponses:
     def create(self, **kwargs: object) -> object:
         _ = kwargs
 
+        class _Usage:
+            input_tokens = 12
+            output_tokens = 34
+
         class _Resp:
             id = "resp_1"
             output_text = self._output_text
+            usage = _Usage()
 
         return _Resp()
 
@@ -74,6 +79,7 @@ def test_generate_prompt_responses_mode_normalizes_and_sets_metadata(
     assert result.prompt == "hello world"
     assert result.model == client.config.model
     assert result.response_id == "resp_1"
+    assert (result.input_tokens, result.output_tokens) == (12, 34)
     _ = datetime.fromisoformat(result.timestamp)
 
 
@@ -92,6 +98,8 @@ def test_generate_prompt_chat_mode_normalizes_and_sets_metadata(monkeypatch) ->
     assert result.prompt == "hello world"
     assert result.model == client.config.model
     assert result.response_id == "chat_1"
+    # No usage reported.
+    assert result.input_tokens is None
     _ = datetime.fromisoformat(result.timestamp)
 
 
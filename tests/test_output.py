@@ -1,7 +1,28 @@
+import gzip
+import io
 import json
+import threading
+import time
+import zlib
+from collections.abc import Callable
 from pathlib import Path
 
-from src.output import CsvWriterConfig, write_csv, write_jsonl
+import pytest
+
+from src.output import (
+    BackgroundWriter,
+    CsvWriterConfig,
+    FlushPolicy,
+    HeaderMismatchError,
+    JsonlSink,
+    ResultWriter,
+    build_fieldnames,
+    journal_path,
+    read_existing_header,
+    write_csv,
+    write_jsonl,
+)
+from src.text_input import open_text_input
 
 
 def test_write_csv_smoke(tmp_path: Path) -> None:
@@ -102,3 +123,426 @@ def test_write_jsonl_appends(tmp_path: Path) -> None:
     assert len(lines) == 2
     assert json.loads(lines[0])["id"] == "1"
     assert json.loads(lines[1])["id"] == "2"
+
+
+def _row(i: int) -> dict[str, str]:
+    return {"id": str(i), "paragraph": f"p{i}", "prompt": f"q{i}"}
+
+
+def _writer(out: Path, *, append: bool = False) -> ResultWriter:
+    return ResultWriter(
+        out,
+        fieldnames=build_fieldnames(include_meta=False),
+        delimiter=",",
+        encoding="utf-8",
+        append=append,
+        jsonl=out.with_suffix(".jsonl"),
+        journal=True,
+    )
+
+
+def test_result_writer_reorders_and_journals_completions(tmp_path: Path) -> None:
+    out = tmp_path / "out.csv"
+    writer = _writer(out)
+    writer.open()
+    writer.put(2, _row(2))
+    writer.put(3, _row(3))
+
+    # Held back behind seq 1, but already durable in the journal.
+    assert out.read_text(encoding="utf-8").splitlines() == ["id,paragraph,prompt"]
+    journal = journal_path(out).read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line).get("seq") for line in journal[1:]] == [2, 3]
+
+    writer.put(1, _row(1))
+    writer.put(4, _row(4))
+    assert writer.wrote == 4
+    writer.close()
+
+    lines = out.read_text(encoding="utf-8").splitlines()
+    assert lines[1:] == ["1,p1,q1", "2,p2,q2", "3,p3,q3", "4,p4,q4"]
+    jsonl = out.with_suffix(".jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["id"] for line in jsonl] == ["1", "2", "3", "4"]
+    assert not journal_path(out).exists()
+
+
+def test_result_writer_keeps_the_journal_when_closed_with_a_gap(
+    tmp_path: Path,
+) -> None:
+    out = tmp_path / "out.csv"
+    writer = _writer(out)
+    writer.open([1, 2, 3, 4])
+    writer.put(1, _row(1))
+    writer.put(3, _row(3))
+    writer.close()
+
+    # Nothing is written past the missing row; row 3 is only journaled.
+    assert _lines(out)[1:] == ["1,p1,q1"]
+    assert journal_path(out).exists()
+
+    resumed = _writer(out, append=True)
+    resumed.open([1, 2, 3, 4])
+    assert resumed.recovered_ids == {1, 3}
+    resumed.put(4, _row(4))
+    resumed.put(2, _row(2))
+    resumed.close()
+
+    assert _lines(out)[1:] == ["1,p1,q1", "2,p2,q2", "3,p3,q3", "4,p4,q4"]
+    jsonl = _lines(out.with_suffix(".jsonl"))
+    assert [json.loads(line)["id"] for line in jsonl] == ["1", "2", "3", "4"]
+    assert not journal_path(out).exists()
+
+    # A failed run keeps its journal even when it stopped without a gap.
+    failed = _writer(out, append=True)
+    failed.open([5])
+    failed.close(complete=False)
+    assert journal_path(out).exists()
+
+
+def test_result_writer_rebuilds_output_from_journal(tmp_path: Path) -> None:
+    out = tmp_path / "out.csv"
+    out.write_text("id,paragraph,prompt\n0,p0,q0\n", encoding="utf-8")
+    jsonl = out.with_suffix(".jsonl")
+    jsonl.write_text("", encoding="utf-8")
+
+    # An interrupted run: it appended seq 1 (and a torn row) before dying.
+    offset = out.stat().st_size
+    with out.open("a", encoding="utf-8") as f:
+        _ = f.write("1,p1,q1\n2,p")
+    meta = {"offset": offset, "jsonl": str(jsonl), "jsonl_offset": 0}
+    records = [json.dumps(meta)]
+    records += [json.dumps({"seq": i, "row": _row(i)}) for i in (1, 3, 2)]
+    journal_path(out).write_text(
+        "\n".join(records) + '\n{"seq": 4, "ro', encoding="utf-8"
+    )
+
+    writer = _writer(out, append=True)
+    writer.open()
+    writer.close()
+
+    assert writer.recovered == 3
+    lines = out.read_text(encoding="utf-8").splitlines()
+    assert lines == ["id,paragraph,prompt", "0,p0,q0", "1,p1,q1", "2,p2,q2", "3,p3,q3"]
+    assert len(jsonl.read_text(encoding="utf-8").splitlines()) == 3
+    assert not journal_path(out).exists()
+
+
+def test_compressed_outputs_append_new_members(tmp_path: Path) -> None:
+    out = tmp_path / "out.csv.gz"
+    jsonl = tmp_path / "out.jsonl.gz"
+    for i in (1, 2):
+        writer = ResultWriter(
+            out,
+            fieldnames=build_fieldnames(include_meta=False),
+            delimiter=",",
+            encoding="utf-8",
+            append=True,
+            jsonl=jsonl,
+            journal=True,
+        )
+        writer.check_header()
+        writer.open()
+        writer.put(1, _row(i))
+        writer.close()
+
+    with gzip.open(out, "rt", encoding="utf-8", newline="") as f:
+        assert f.read().splitlines() == ["id,paragraph,prompt", "1,p1,q1", "2,p2,q2"]
+    with gzip.open(jsonl, "rt", encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 2
+
+    mismatch = ResultWriter(
+        out,
+        fieldnames=build_fieldnames(include_meta=True),
+        delimiter=",",
+        encoding="utf-8",
+        append=True,
+    )
+    with pytest.raises(HeaderMismatchError):
+        mismatch.check_header()
+
+
+def test_compressed_rows_are_readable_before_close(tmp_path: Path) -> None:
+    pytest.importorskip("zstandard")
+    for name in ("out.csv.gz", "out.csv.zst"):
+        out = tmp_path / name
+        writer = _writer(out)
+        writer.open()
+        writer.put(1, _row(1))
+
+        # Nothing has been closed: the stream has no trailer yet.
+        head = read_existing_header(out, delimiter=",", encoding="utf-8")
+        assert head == ["id", "paragraph", "prompt"]
+        if name.endswith(".gz"):
+            text = zlib.decompressobj(wbits=31).decompress(out.read_bytes())
+            assert text.decode("utf-8").splitlines() == [
+                "id,paragraph,prompt",
+                "1,p1,q1",
+            ]
+        writer.close()
+
+        with open_text_input(out) as f:
+            assert f.read().splitlines() == ["id,paragraph,prompt", "1,p1,q1"]
+
+
+def test_compressed_output_is_rebuilt_after_a_crash(tmp_path: Path) -> None:
+    out = tmp_path / "out.csv.gz"
+    first = _writer(out)
+    first.open()
+    first.put(1, _row(1))
+    first.close()
+
+    # Snapshot a second run mid-way: its member has no trailer yet.
+    second = _writer(out, append=True)
+    second.open()
+    second.put(2, _row(3))
+    second.put(1, _row(2))
+    crashed = {p: p.read_bytes() for p in (out, journal_path(out))}
+    second.close()
+    for path, data in crashed.items():
+        _ = path.write_bytes(data)
+
+    third = _writer(out, append=True)
+    third.open()
+    third.close()
+
+    assert third.recovered == 2
+    with gzip.open(out, "rt", encoding="utf-8", newline="") as f:
+        lines = f.read().splitlines()
+    assert lines == ["id,paragraph,prompt", "1,p1,q1", "2,p2,q2", "3,p3,q3"]
+
+
+def _wait_for(predicate: Callable[[], bool]) -> None:
+    deadline = time.monotonic() + 5
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _lines(path: Path) -> list[str]:
+    return path.read_text(encoding="utf-8").splitlines()
+
+
+def test_background_writer_group_commits_by_rows_and_time(tmp_path: Path) -> None:
+    by_rows = ResultWriter(
+        tmp_path / "rows.csv",
+        fieldnames=build_fieldnames(include_meta=False),
+        delimiter=",",
+        encoding="utf-8",
+        append=False,
+        policy=FlushPolicy(rows=3),
+    )
+    by_time = ResultWriter(
+        tmp_path / "time.csv",
+        fieldnames=build_fieldnames(include_meta=False),
+        delimiter=",",
+        encoding="utf-8",
+        append=False,
+        policy=FlushPolicy(rows=100, interval=0.05),
+    )
+    stream = io.StringIO()
+    output = BackgroundWriter(
+        policy=FlushPolicy(rows=2), extra=[JsonlSink(stream, owned=False)]
+    )
+    by_rows.open()
+    by_time.open()
+    try:
+        output.put(by_rows, 1, _row(1))
+        output.put(by_rows, 2, _row(2))
+        _wait_for(lambda: by_rows.wrote == 2)
+        # Written but not yet committed.
+        assert _lines(tmp_path / "rows.csv") == ["id,paragraph,prompt"]
+        output.put(by_rows, 3, _row(3))
+        _wait_for(lambda: len(_lines(tmp_path / "rows.csv")) == 4)
+
+        output.put(by_time, 1, _row(1), record={"document": "t", **_row(1)})
+        _wait_for(lambda: len(_lines(tmp_path / "time.csv")) == 2)
+    finally:
+        output.close()
+        by_rows.close()
+        by_time.close()
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [r["id"] for r in records] == ["1", "2", "3", "1"]
+    assert records[-1]["document"] == "t"
+
+
+def test_background_writer_reports_sink_errors(tmp_path: Path) -> None:
+    class Broken:
+        def write(self, row: dict[str, str]) -> None:
+            raise OSError("disk full")
+
+        def flush(self, *, fsync: bool) -> None: ...
+
+        def close(self) -> None: ...
+
+    output = BackgroundWriter(policy=FlushPolicy(), extra=[Broken()])
+    output.put(None, 1, _row(1))
+    with pytest.raises(OSError, match="disk full"):
+        output.close()
+
+
+def test_background_writer_journals_rows_before_queueing(tmp_path: Path) -> None:
+    release = threading.Event()
+
+    class Stalled:
+        def write(self, row: dict[str, str]) -> None:
+            assert release.wait(timeout=5)
+
+        def flush(self, *, fsync: bool) -> None: ...
+
+        def close(self) -> None: ...
+
+    out = tmp_path / "out.csv"
+    writer = _writer(out)
+    writer.open()
+    output = BackgroundWriter(policy=FlushPolicy(), extra=[Stalled()])
+    try:
+        for seq in (1, 2, 3):
+            output.put(writer, seq, _row(seq))
+        # The output thread is stuck on the first row; all three are durable.
+        journal = _lines(journal_path(out))
+        assert [json.loads(line)["seq"] for line in journal[1:]] == [1, 2, 3]
+    finally:
+        release.set()
+        output.close()
+        writer.close()
+    assert _lines(out)[1:] == ["1,p1,q1", "2,p2,q2", "3,p3,q3"]
+
+
+def test_rerun_after_a_crash_resumes_without_duplicates(
+    tmp_path: Path, monkeypatch
+) -> None:
+    from generate_prompts import main
+    from src.openai_client import OpenAIClient, PromptResult
+
+    inp = tmp_path / "script.txt"
+    inp.write_text("".join(f"{i}. p{i}\n" for i in range(1, 6)), encoding="utf-8")
+    out = tmp_path / "out.csv"
+
+    # A run that journaled ids 1, 2 and 4 and died before closing its output;
+    # 4 was still waiting for 3.
+    crashed = _writer(out)
+    crashed.open()
+    crashed.put(2, _row(2))
+    crashed.put(1, _row(1))
+    crashed.put(4, _row(4))
+    snapshot = {p: p.read_bytes() for p in (out, journal_path(out))}
+    crashed.close()
+    for path, data in snapshot.items():
+        _ = path.write_bytes(data)
+
+    calls: list[int] = []
+
+    def generate(self, *, paragraph_id: int, paragraph_text: str) -> PromptResult:
+        calls.append(paragraph_id)
+        return PromptResult(
+            prompt=f"q{paragraph_id}", model="m", response_id="r", timestamp="t"
+        )
+
+    monkeypatch.setattr(OpenAIClient, "generate_prompt", generate)
+    argv = ["generate_prompts", "--input", str(inp), "--output", str(out)]
+
+    # Overwriting would discard results that were already paid for.
+    monkeypatch.setattr("sys.argv", argv)
+    assert main() == 1
+    assert journal_path(out).exists()
+    assert calls == []
+
+    monkeypatch.setattr("sys.argv", [*argv, "--append"])
+    assert main() == 0
+
+    assert sorted(calls) == [3, 5]
+    ids = [line.split(",")[0] for line in _lines(out)[1:]]
+    assert ids == ["1", "2", "3", "4", "5"]
+    assert not journal_path(out).exists()
+
+
+def test_rerun_after_a_failure_resumes_without_duplicates(
+    tmp_path: Path, monkeypatch
+) -> None:
+    from generate_prompts import main
+    from src.openai_client import OpenAIClient, PromptResult
+
+    inp = tmp_path / "script.txt"
+    inp.write_text("".join(f"{i}. p{i}\n" for i in range(1, 7)), encoding="utf-8")
+    out = tmp_path / "out.csv"
+    calls: list[int] = []
+    failing = {3}
+    later_done = threading.Event()
+
+    def generate(self, *, paragraph_id: int, paragraph_text: str) -> PromptResult:
+        calls.append(paragraph_id)
+        if paragraph_id in failing:
+            # Fails once the call after it has completed, leaving a gap.
+            _ = later_done.wait(5)
+            raise RuntimeError("boom")
+        if paragraph_id == 4:
+            later_done.set()
+        return PromptResult(
+            prompt=f"q{paragraph_id}", model="m", response_id="r", timestamp="t"
+        )
+
+    monkeypatch.setattr(OpenAIClient, "generate_prompt", generate)
+    argv = ["generate_prompts", "--input", str(inp), "--output", str(out)]
+    monkeypatch.setattr("sys.argv", [*argv, "--workers", "2"])
+    assert main() == 1
+
+    # The output stops at the failed paragraph; 4 (and whatever else ran
+    # alongside 3) is only in the journal.
+    assert [line.split(",")[0] for line in _lines(out)[1:]] == ["1", "2"]
+    journaled = {
+        int(json.loads(line)["row"]["id"]) for line in _lines(journal_path(out))[1:]
+    }
+    assert {1, 2, 4} <= journaled
+    assert 3 not in journaled
+
+    failing.clear()
+    calls.clear()
+    monkeypatch.setattr("sys.argv", [*argv, "--workers", "2", "--append"])
+    assert main() == 0
+
+    assert sorted(calls) == sorted({1, 2, 3, 4, 5, 6} - journaled)
+    ids = [line.split(",")[0] for line in _lines(out)[1:]]
+    assert ids == ["1", "2", "3", "4", "5", "6"]
+    assert not journal_path(out).exists()
+
+
+def test_reorder_buffer_is_bounded_by_the_call_window(
+    tmp_path: Path, monkeypatch
+) -> None:
+    from generate_prompts import main
+    from src.openai_client import OpenAIClient, PromptResult
+
+    inp = tmp_path / "script.txt"
+    inp.write_text("".join(f"{i}. p{i}\n" for i in range(1, 41)), encoding="utf-8")
+    out = tmp_path / "out.csv"
+    workers = 3
+    started = threading.Semaphore(0)
+
+    def generate(self, *, paragraph_id: int, paragraph_text: str) -> PromptResult:
+        if paragraph_id == 1:
+            # Stalls until every other call the window allows has started.
+            for _ in range(2 * workers - 1):
+                assert started.acquire(timeout=5)
+        else:
+            started.release()
+        return PromptResult(
+            prompt=f"q{paragraph_id}", model="m", response_id="r", timestamp="t"
+        )
+
+    peak = 0
+    place = ResultWriter.place
+
+    def tracking_place(self: ResultWriter, seq: int, row: dict[str, str]) -> None:
+        nonlocal peak
+        place(self, seq, row)
+        peak = max(peak, len(self._pending))
+
+    monkeypatch.setattr(OpenAIClient, "generate_prompt", generate)
+    monkeypatch.setattr(ResultWriter, "place", tracking_place)
+    argv = ["generate_prompts", "--input", str(inp), "--output", str(out)]
+    monkeypatch.setattr("sys.argv", [*argv, "--workers", str(workers)])
+    assert main() == 0
+
+    assert 0 < peak <= 2 * workers - 1
+    ids = [line.split(",")[0] for line in _lines(out)[1:]]
+    assert ids == [str(i) for i in range(1, 41)]
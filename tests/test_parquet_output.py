@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from generate_prompts import main
+from src.output import ResultWriter, build_fieldnames, journal_path
+from src.parquet_output import ParquetRowWriter, build_schema
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def _run(monkeypatch, inp: Path, out: Path, *extra: str) -> int:
+    argv = ["generate_prompts", "--input", str(inp), "--output", str(out)]
+    argv += ["--format", "parquet", *extra]
+    monkeypatch.setattr("sys.argv", argv)
+    return main()
+
+
+def test_parquet_output_has_typed_columns(
+    tmp_path: Path, monkeypatch, fake_generate_prompt
+) -> None:
+    inp = tmp_path / "script.txt"
+    inp.write_text("1. Hello\n2. World\n", encoding="utf-8")
+    out = tmp_path / "out.parquet"
+
+    assert _run(monkeypatch, inp, out, "--include-meta") == 0
+
+    table = pq.read_table(out)
+    assert table.schema.field("id").type == pa.int64()
+    assert pa.types.is_dictionary(table.schema.field("model").type)
+    assert table.schema.field("timestamp").type == pa.timestamp("us", tz="UTC")
+    assert table.column("id").to_pylist() == [1, 2]
+    assert table.schema.field("input_tokens").type == pa.int64()
+    assert table.column("input_tokens").to_pylist() == [101, 102]
+    assert table.column("output_tokens").to_pylist() == [40, None]
+    assert table.column("prompt").to_pylist() == [
+        "prompt for Hello",
+        "prompt for World",
+    ]
+    assert table.column("timestamp").to_pylist()[0] == datetime(
+        2025, 1, 1, tzinfo=timezone.utc
+    )
+    # One visible part file, and nothing left of the hidden temporary one.
+    assert [p.name for p in out.iterdir()] == ["part-00000.parquet"]
+
+
+def test_parquet_append_adds_a_part_and_checks_columns(
+    tmp_path: Path, monkeypatch, fake_generate_prompt
+) -> None:
+    inp = tmp_path / "script.txt"
+    inp.write_text("1. Hello\n", encoding="utf-8")
+    more = tmp_path / "more.txt"
+    more.write_text("2. World\n", encoding="utf-8")
+    out = tmp_path / "out.parquet"
+
+    assert _run(monkeypatch, inp, out) == 0
+    first = out / "part-00000.parquet"
+    written = first.stat().st_mtime_ns
+    assert _run(monkeypatch, more, out, "--append") == 0
+
+    # The first run's part is not rewritten.
+    assert [p.name for p in sorted(out.iterdir())] == [
+        "part-00000.parquet",
+        "part-00001.parquet",
+    ]
+    assert first.stat().st_mtime_ns == written
+    assert pq.read_table(out).column("id").to_pylist() == [1, 2]
+
+    assert _run(monkeypatch, inp, out, "--append", "--include-meta") == 1
+    assert pq.read_table(out).num_rows == 2
+
+    # Without --append the new part replaces the older ones.
+    assert _run(monkeypatch, more, out) == 0
+    assert [p.name for p in out.iterdir()] == ["part-00002.parquet"]
+    assert pq.read_table(out).column("id").to_pylist() == [2]
+
+
+def test_parquet_single_file_output_becomes_the_first_part(
+    tmp_path: Path, monkeypatch, fake_generate_prompt
+) -> None:
+    inp = tmp_path / "script.txt"
+    inp.write_text("2. World\n", encoding="utf-8")
+    out = tmp_path / "out.parquet"
+    fieldnames = build_fieldnames(include_meta=False)
+    pq.write_table(
+        pa.table(
+            {"id": [1], "paragraph": ["Hello"], "prompt": ["prompt for Hello"]},
+            schema=build_schema(fieldnames),
+        ),
+        out,
+    )
+
+    assert _run(monkeypatch, inp, out, "--append") == 0
+
+    assert [p.name for p in sorted(out.iterdir())] == [
+        "part-00000.parquet",
+        "part-00001.parquet",
+    ]
+    assert pq.read_table(out).column("id").to_pylist() == [1, 2]
+
+
+def test_row_writer_streams_bounded_row_groups(tmp_path: Path) -> None:
+    out = tmp_path / "out.parquet"
+    writer = ParquetRowWriter(
+        out,
+        fieldnames=build_fieldnames(include_meta=False),
+        append=False,
+        row_group_size=2,
+    )
+    for i in range(1, 6):
+        writer.write({"id": str(i), "paragraph": f"p{i}", "prompt": f"q{i}"})
+    writer.close()
+
+    parquet = pq.ParquetFile(writer.part)
+    assert [parquet.metadata.row_group(i).num_rows for i in range(3)] == [2, 2, 1]
+
+
+def test_parquet_output_is_rebuilt_from_journal(tmp_path: Path) -> None:
+    out = tmp_path / "out.parquet"
+    fieldnames = build_fieldnames(include_meta=False)
+    first = ParquetRowWriter(out, fieldnames=fieldnames, append=False)
+    first.write({"id": "1", "paragraph": "p1", "prompt": "q1"})
+    first.close()
+
+    rows = [{"id": str(i), "paragraph": f"p{i}", "prompt": f"q{i}"} for i in (3, 2)]
+    journal_path(out).write_text(
+        json.dumps({"offset": None, "jsonl": None, "jsonl_offset": None})
+        + "\n"
+        + "".join(json.dumps({"seq": i, "row": r}) + "\n" for i, r in enumerate(rows)),
+        encoding="utf-8",
+    )
+
+    writer = ResultWriter(
+        out,
+        fieldnames=fieldnames,
+        delimiter=",",
+        encoding="utf-8",
+        append=True,
+        journal=True,
+        parquet=True,
+    )
+    writer.open()
+    writer.close()
+
+    assert writer.recovered == 2
+    assert pq.read_table(out).column("id").to_pylist() == [1, 3, 2]
+
+
+def test_failed_parquet_run_publishes_nothing_and_resumes(
+    tmp_path: Path, monkeypatch, fake_generate_prompt
+) -> None:
+    from src.openai_client import OpenAIClient
+
+    inp = tmp_path / "script.txt"
+    inp.write_text("1. Hello\n2. World\n3. Again\n", encoding="utf-8")
+    out = tmp_path / "out.parquet"
+
+    def fail_on_2(self, *, paragraph_id: int, paragraph_text: str):
+        if paragraph_id == 2:
+            raise RuntimeError("boom")
+        return fake_generate_prompt(
+            self, paragraph_id=paragraph_id, paragraph_text=paragraph_text
+        )
+
+    monkeypatch.setattr(OpenAIClient, "generate_prompt", fail_on_2)
+    assert _run(monkeypatch, inp, out) == 1
+    assert list(out.iterdir()) == []
+    assert journal_path(out).exists()
+
+    monkeypatch.setattr(OpenAIClient, "generate_prompt", fake_generate_prompt)
+    assert _run(monkeypatch, inp, out, "--append") == 0
+    assert [p.name for p in out.iterdir()] == ["part-00000.parquet"]
+    assert pq.read_table(out).column("id").to_pylist() == [1, 2, 3]
+    assert not journal_path(out).exists()
@@ -1,6 +1,6 @@
 import pytest
 
-from src.parser import parse_numbered_paragraphs
+from src.parser import Selection, parse_numbered_paragraphs
 
 
 def test_parse_accepts_multiple_header_styles() -> None:
@@ -65,3 +65,31 @@ def test_parse_rejects_empty_input() -> None:
     with pytest.raises(ValueError, match=r"No numbered paragraphs found") as exc_info:
         parse_numbered_paragraphs("")
     assert str(exc_info.value)
+
+
+def test_parse_with_selection_matches_select_after_parse() -> None:
+    text = "1. a\nmore\n2) b\n3 - c\n\n4. d\n5. e\n"
+    full = parse_numbered_paragraphs(text)
+    for selection in [
+        Selection(start=2, end=4),
+        Selection(limit=2),
+        Selection(start=3, limit=1),
+        Selection(ids=frozenset({5, 1})),
+        Selection(limit=0),
+        Selection(ids=frozenset()),
+    ]:
+        assert parse_numbered_paragraphs(text, selection) == selection.apply(full)
+
+
+def test_parse_with_limit_stops_before_later_duplicates() -> None:
+    text = "1. One\n2. Two\n1. Duplicate\n"
+    paragraphs = parse_numbered_paragraphs(text, Selection(limit=2))
+    assert [p.id for p in paragraphs] == [1, 2]
+
+    with pytest.raises(ValueError, match=r"Duplicate paragraph id 1"):
+        parse_numbered_paragraphs(text, Selection(start=2))
+
+
+def test_parse_with_selection_still_rejects_leading_content() -> None:
+    with pytest.raises(ValueError, match=r"before first paragraph header"):
+        parse_numbered_paragraphs("Intro\n1. One\n", Selection(limit=0))
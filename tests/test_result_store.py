@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import csv
+import sqlite3
+from pathlib import Path
+
+from generate_prompts import main
+from src.openai_client import OpenAIClient, PromptResult
+from src.result_store import ResultStore
+
+
+def _row(i: int, prompt: str) -> dict[str, str]:
+    return {
+        "id": str(i),
+        "paragraph": f"p{i}",
+        "prompt": prompt,
+        "model": "m",
+        "response_id": "r",
+        "timestamp": "t",
+    }
+
+
+def _count(db: Path) -> int:
+    with sqlite3.connect(db) as conn:
+        return int(conn.execute("SELECT count(*) FROM results").fetchone()[0])
+
+
+def test_store_upserts_and_commits_in_batches(tmp_path: Path) -> None:
+    db = tmp_path / "out.db"
+    store = ResultStore(db, commit_interval=2)
+
+    store.upsert("doc", _row(1, "old"))
+    assert _count(db) == 0
+    store.upsert("doc", _row(1, "new"))
+    assert _count(db) == 1
+    store.upsert("other", _row(1, "x"))
+    store.close()
+
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        rows = conn.execute(
+            "SELECT document, prompt FROM results ORDER BY 1"
+        ).fetchall()
+    assert rows == [("doc", "new"), ("other", "x")]
+
+
+def test_reruns_update_rows_in_place_and_export(tmp_path: Path, monkeypatch) -> None:
+    inp = tmp_path / "script.txt"
+    inp.write_text("1. One\n2. Two\n3. Three\n", encoding="utf-8")
+    db = tmp_path / "out.db"
+    calls = {"n": 0}
+
+    def fake_generate_prompt(
+        self, *, paragraph_id: int, paragraph_text: str
+    ) -> PromptResult:
+        calls["n"] += 1
+        return PromptResult(
+            prompt=f"{paragraph_text} v{calls['n']}",
+            model="m",
+            response_id="r",
+            timestamp="t",
+        )
+
+    monkeypatch.setattr(OpenAIClient, "generate_prompt", fake_generate_prompt)
+
+    base = ["generate_prompts", "--input", str(inp), "--sqlite", str(db)]
+    monkeypatch.setattr("sys.argv", [*base, "--end", "2"])
+    assert main() == 0
+    monkeypatch.setattr("sys.argv", [*base, "--start", "2"])
+    assert main() == 0
+    assert _count(db) == 3
+
+    out = tmp_path / "export.csv"
+    monkeypatch.setattr(
+        "sys.argv",
+        ["generate_prompts", "export", "--sqlite", str(db), "--output", str(out)],
+    )
+    assert main() == 0
+    with out.open(encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [(r["document"], r["id"], r["prompt"]) for r in rows] == [
+        ("script", "1", "One v1"),
+        ("script", "2", "Two v3"),
+        ("script", "3", "Three v4"),
+    ]
+
+    jsonl = tmp_path / "export.jsonl"
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "generate_prompts",
+            "export",
+            "--sqlite",
+            str(db),
+            "--output",
+            str(tmp_path / "script.csv"),
+            "--document",
+            "script",
+            "--jsonl",
+            str(jsonl),
+        ],
+    )
+    assert main() == 0
+    header = (tmp_path / "script.csv").read_text(encoding="utf-8").splitlines()[0]
+    assert header == "id,paragraph,prompt"
+    assert len(jsonl.read_text(encoding="utf-8").splitlines()) == 3
+
+
+def test_output_or_sqlite_is_required(tmp_path: Path, monkeypatch) -> None:
+    inp = tmp_path / "script.txt"
+    inp.write_text("1. One\n", encoding="utf-8")
+    monkeypatch.setattr("sys.argv", ["generate_prompts", "--input", str(inp)])
+    assert main() == 1
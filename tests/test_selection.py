@@ -52,3 +52,79 @@ def test_negative_limit_rejected() -> None:
     paragraphs = [Paragraph(id=1, text="a")]
     with pytest.raises(ValueError, match=r"--limit must be >= 0"):
         select_paragraphs(paragraphs, ids_csv=None, start=None, end=None, limit=-1)
+
+
+def test_shards_cover_selection_once_balanced_by_cost() -> None:
+    # One long paragraph costs as much as many short ones.
+    paragraphs = [Paragraph(id=1, text="x" * 16000)] + [
+        Paragraph(id=i, text="short") for i in range(2, 12)
+    ]
+    shards = [
+        select_paragraphs(
+            paragraphs, ids_csv=None, start=None, end=None, limit=None, shard=f"{k}/2"
+        )
+        for k in (1, 2)
+    ]
+    assert [p.id for p in shards[0]] == [1]
+    assert [p.id for p in shards[1]] == list(range(2, 12))
+
+
+def test_shards_of_a_selection_are_contiguous_and_disjoint() -> None:
+    paragraphs = [Paragraph(id=i, text="t" * (i * 37 % 500)) for i in range(1, 41)]
+    ids: list[int] = []
+    for k in range(1, 5):
+        shard = select_paragraphs(
+            paragraphs, ids_csv=None, start=5, end=34, limit=None, shard=f"{k}/4"
+        )
+        assert shard
+        ids += [p.id for p in shard]
+    assert ids == list(range(5, 35))
+
+
+def test_invalid_shard_rejected() -> None:
+    paragraphs = [Paragraph(id=1, text="a")]
+    for spec in ("3/2", "0/2", "1", "a/b"):
+        with pytest.raises(ValueError, match=r"--shard must be K/N"):
+            select_paragraphs(
+                paragraphs, ids_csv=None, start=None, end=None, limit=None, shard=spec
+            )
+
+
+def test_shard_output_carries_shard_column(tmp_path, monkeypatch) -> None:
+    from generate_prompts import main
+    from src.openai_client import OpenAIClient, PromptResult
+
+    def fake_generate_prompt(
+        self, *, paragraph_id: int, paragraph_text: str
+    ) -> PromptResult:
+        return PromptResult(
+            prompt=paragraph_text, model="m", response_id="r", timestamp="t"
+        )
+
+    monkeypatch.setattr(OpenAIClient, "generate_prompt", fake_generate_prompt)
+    inp = tmp_path / "script.txt"
+    inp.write_text("1. One\n2. Two\n3. Three\n4. Four\n", encoding="utf-8")
+
+    lines: list[str] = []
+    for k in (1, 2):
+        out = tmp_path / f"out-{k}.csv"
+        argv = ["generate_prompts", "--input", str(inp), "--output", str(out)]
+        monkeypatch.setattr("sys.argv", [*argv, "--shard", f"{k}/2"])
+        assert main() == 0
+        header, *rows = out.read_text(encoding="utf-8").splitlines()
+        assert header == "id,paragraph,prompt,shard"
+        lines += rows
+    assert lines == [
+        "1,One,One,1/2",
+        "2,Two,Two,1/2",
+        "3,Three,Three,2/2",
+        "4,Four,Four,2/2",
+    ]
+
+    # More shards than paragraphs: the extra shard is empty, not an error.
+    inp.write_text("1. One\n", encoding="utf-8")
+    out = tmp_path / "empty.csv"
+    argv = ["generate_prompts", "--input", str(inp), "--output", str(out)]
+    monkeypatch.setattr("sys.argv", [*argv, "--shard", "1/2"])
+    assert main() == 0
+    assert not out.exists()
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections.abc import Iterator
+from pathlib import Path
+from typing import cast
+
+import pytest
+
+from generate_prompts import job_preparer
+from src.openai_client import OpenAIClient, OpenAIClientPool, PromptResult
+from src.server import JobManager, JobServer, JobSink
+
+
+def _start(tmp_path: Path, *, token: str | None = None) -> Iterator[str]:
+    defaults: dict[str, object] = {"model": "served-model"}
+    prepare = job_preparer(
+        defaults, workers=2, clients=OpenAIClientPool(), output_root=tmp_path
+    )
+    manager = JobManager(prepare, max_jobs=3)
+    httpd = JobServer(("127.0.0.1", 0), manager, verbose=False, token=token)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    host, port = httpd.server_address[:2]
+    yield f"http://{host}:{port}"
+    httpd.shutdown()
+    httpd.server_close()
+    manager.close()
+
+
+@pytest.fixture
+def server(tmp_path: Path) -> Iterator[str]:
+    yield from _start(tmp_path)
+
+
+@pytest.fixture
+def token_server(tmp_path: Path) -> Iterator[str]:
+    yield from _start(tmp_path, token="s3cret")
+
+
+def _request(
+    url: str,
+    body: object | None = None,
+    *,
+    headers: dict[str, str] | None = None,
+) -> tuple[int, bytes]:
+    data = None if body is None else json.dumps(body).encode("utf-8")
+    headers = dict(headers or {})
+    if data is not None:
+        _ = headers.setdefault("Content-Type", "application/json")
+    request = urllib.request.Request(url, data=data, headers=headers)
+    try:
+        with urllib.request.urlopen(request) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def test_jobs_share_one_call_limit_and_stream_results(
+    server: str, tmp_path: Path, monkeypatch
+) -> None:
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def fake_generate_prompt(
+        self, *, paragraph_id: int, paragraph_text: str
+    ) -> PromptResult:
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+        return PromptResult(
+            prompt=f"prompt {paragraph_text}",
+            model=self.config.model,
+            response_id="r",
+            timestamp="t",
+        )
+
+    monkeypatch.setattr(OpenAIClient, "generate_prompt", fake_generate_prompt)
+    inp = tmp_path / "script.txt"
+    inp.write_text("".join(f"{i}. Text {i}\n" for i in range(1, 7)), encoding="utf-8")
+
+    ids = []
+    for n in range(3):
+        status, body = _request(
+            f"{server}/jobs",
+            {
+                "input": str(inp),
+                "output": str(tmp_path / f"out-{n}.csv"),
+                "start": 2,
+                "workers": 4,
+            },
+        )
+        assert status == 202
+        ids.append(json.loads(body)["id"])
+
+    # Streams until the job ends.
+    status, body = _request(f"{server}/jobs/{ids[0]}/results")
+    assert status == 200
+    records = [json.loads(line) for line in body.splitlines()]
+    assert sorted(r["id"] for r in records) == ["2", "3", "4", "5", "6"]
+    assert {r["model"] for r in records} == {"served-model"}
+
+    for job_id in ids:
+        _ = _request(f"{server}/jobs/{job_id}/results")
+        status, body = _request(f"{server}/jobs/{job_id}")
+        job = json.loads(body)
+        assert (job["state"], job["exit_code"], job["results"]) == ("done", 0, 5)
+    assert peak <= 2
+    assert len((tmp_path / "out-2.csv").read_text(encoding="utf-8").splitlines()) == 6
+
+    status, body = _request(f"{server}/jobs/{ids[1]}/results?from=3&follow=0")
+    # Results are kept in completion order.
+    assert len(body.splitlines()) == 2
+    status, body = _request(f"{server}/jobs")
+    assert len(json.loads(body)["jobs"]) == 3
+
+
+def test_bad_jobs_are_rejected_or_reported(server: str, tmp_path: Path) -> None:
+    status, body = _request(f"{server}/jobs", {"input": "x.txt", "bogus": 1})
+    assert status == 400
+    assert "unrecognized arguments" in json.loads(body)["error"]
+
+    status, _ = _request(f"{server}/jobs", ["--input", "x.txt"])
+    assert status == 400
+    assert _request(f"{server}/jobs/nope")[0] == 404
+
+    # Valid options, but the input does not exist: the job itself fails.
+    status, body = _request(
+        f"{server}/jobs",
+        {"input": str(tmp_path / "missing.txt"), "output": str(tmp_path / "o.csv")},
+    )
+    assert status == 202
+    job_id = json.loads(body)["id"]
+    assert _request(f"{server}/jobs/{job_id}/results")[1] == b""
+    job = json.loads(_request(f"{server}/jobs/{job_id}")[1])
+    assert job["state"] == "failed"
+    assert job["error"]
+
+
+def test_jobs_start_in_order_and_queued_ones_are_cancelled_on_close() -> None:
+    started: list[int] = []
+    release = threading.Event()
+
+    def prepare(spec: dict[str, object]):
+        def run(sink) -> int:
+            started.append(cast(int, spec["n"]))
+            assert release.wait(timeout=5)
+            return 0
+
+        return run
+
+    release.set()
+    manager = JobManager(prepare, max_jobs=1)
+    for job in [manager.submit({"n": n}) for n in range(6)]:
+        _ = list(job.follow())
+    manager.close()
+    assert started == list(range(6))
+
+    started.clear()
+    release.clear()
+    manager = JobManager(prepare, max_jobs=1)
+    jobs = [manager.submit({"n": n}) for n in range(4)]
+    while not started:
+        time.sleep(0.01)
+
+    closer = threading.Thread(target=manager.close)
+    closer.start()
+    while jobs[3].status()["state"] != "cancelled":
+        time.sleep(0.01)
+    release.set()
+    closer.join()
+
+    assert started == [0]
+    assert [j.status()["state"] for j in jobs] == ["done", *["cancelled"] * 3]
+    # Followers of a cancelled job see the end of its stream.
+    assert list(jobs[2].follow()) == []
+    with pytest.raises(RuntimeError):
+        _ = manager.submit({"n": 4})
+
+
+def test_requests_that_a_web_page_could_forge_are_refused(
+    server: str, tmp_path: Path
+) -> None:
+    spec = {"input": str(tmp_path / "a.txt"), "output": str(tmp_path / "o.csv")}
+
+    # A form post or simple fetch cannot send application/json.
+    status, _ = _request(f"{server}/jobs", spec, headers={"Content-Type": "text/plain"})
+    assert status == 415
+    # DNS rebinding: the page reaches 127.0.0.1 under its own host name.
+    status, body = _request(f"{server}/jobs", spec, headers={"Host": "evil.test"})
+    assert status == 403
+    assert _request(f"{server}/jobs", headers={"Host": "evil.test"})[0] == 403
+    port = server.rsplit(":", 1)[1]
+    assert _request(f"{server}/health", headers={"Host": f"localhost:{port}"})[0] == 200
+
+    # Outputs may only go under the server's output root.
+    for key in ("output", "jsonl", "sqlite", "queue", "cache_dir"):
+        status, body = _request(
+            f"{server}/jobs", {"input": "a.txt", key: str(tmp_path.parent / "x")}
+        )
+        assert status == 400
+        assert f"{key} must be inside" in json.loads(body)["error"]
+    assert json.loads(_request(f"{server}/jobs")[1])["jobs"] == []
+
+
+def test_token_is_required_when_configured(token_server: str) -> None:
+    assert _request(f"{token_server}/health")[0] == 401
+    wrong = {"Authorization": "Bearer nope"}
+    assert _request(f"{token_server}/health", headers=wrong)[0] == 401
+    right = {"Authorization": "Bearer s3cret"}
+    assert _request(f"{token_server}/health", headers=right)[0] == 200
+    assert _request(f"{token_server}/jobs", {}, headers=wrong)[0] == 401
+
+
+def test_job_keeps_only_its_most_recent_results() -> None:
+    def prepare(spec: dict[str, object]):
+        def run(sink: JobSink) -> int:
+            for i in range(5):
+                sink.write({"id": str(i)})
+            return 0
+
+        return run
+
+    manager = JobManager(prepare, max_jobs=1, keep_finished=1, max_records=3)
+    try:
+        first = manager.submit({})
+        _ = list(first.follow())
+        assert [r["id"] for r in first.current()] == ["2", "3", "4"]
+        assert [r["id"] for r in first.follow(1)] == ["2", "3", "4"]
+        assert [r["id"] for r in first.current(3)] == ["3", "4"]
+        assert first.status()["results"] == 5
+
+        # Finished jobs beyond ``keep_finished`` are evicted as soon as
+        # another one finishes.
+        second = manager.submit({})
+        _ = list(second.follow())
+    finally:
+        manager.close()
+    assert [j.id for j in manager.jobs()] == [second.id]
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Heavy packages that only a real model call, a Yandex download or the
+# SQLite-backed options and commands (--sqlite, --queue, worker, export) need.
+_HEAVY = {"openai", "httpx", "pydantic", "http", "ssl", "multiprocessing", "sqlite3"}
+
+_PROBE = """
+import json, runpy, sys
+sys.argv = json.loads(sys.argv[1])
+try:
+    runpy.run_path("generate_prompts.py", run_name="__main__")
+except SystemExit:
+    pass
+print(json.dumps(sorted({m.split(".")[0] for m in sys.modules})))
+"""
+
+
+def _loaded(argv: list[str]) -> set[str]:
+    proc = subprocess.run(
+        [sys.executable, "-c", _PROBE, json.dumps(["generate_prompts", *argv])],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        check=True,
+    )
+    return set(json.loads(proc.stdout.splitlines()[-1]))
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--version"],
+        ["--input", "script.txt", "--print-instructions"],
+        ["--input", "{script}", "--output", "{out}", "--dry-run"],
+    ],
+)
+def test_offline_commands_skip_heavy_imports(tmp_path: Path, argv: list[str]) -> None:
+    script = tmp_path / "script.txt"
+    script.write_text("1. Hello\n", encoding="utf-8")
+    argv = [a.format(script=script, out=tmp_path / "out.csv") for a in argv]
+
+    loaded = _loaded(argv)
+
+    assert not loaded & _HEAVY
+    if "--dry-run" not in argv:
+        assert "dotenv" not in loaded
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import bz2
+import gzip
+import importlib.util
+import lzma
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from generate_prompts import main
+from src.batch import collect_sources
+from src.parser import Paragraph, Selection, parse_numbered_paragraphs
+from src.text_input import detect_codec, open_text_input
+
+_SCRIPT = "1. Привет\r\nmore text\n\n2) Second\n3 - Third\n"
+_EXPECTED = [
+    Paragraph(id=1, text="Привет more text"),
+    Paragraph(id=2, text="Second"),
+    Paragraph(id=3, text="Third"),
+]
+
+_HAS_ZSTD = importlib.util.find_spec("zstandard") is not None
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    import zstandard
+
+    return zstandard.ZstdCompressor().compress(data)
+
+
+_CODECS: dict[str, tuple[str, Callable[[bytes], bytes]]] = {
+    "gzip": (".gz", gzip.compress),
+    "bz2": (".bz2", bz2.compress),
+    "xz": (".xz", lzma.compress),
+    "zstd": (".zst", _zstd_compress),
+}
+
+
+@pytest.fixture(params=sorted(_CODECS))
+def codec(request: pytest.FixtureRequest) -> str:
+    name = str(request.param)
+    if name == "zstd" and not _HAS_ZSTD:
+        pytest.skip("zstandard is not installed")
+    return name
+
+
+def test_compressed_inputs_parse_like_plain_text(tmp_path: Path, codec: str) -> None:
+    suffix, compress = _CODECS[codec]
+    path = tmp_path / f"script.txt{suffix}"
+    path.write_bytes(compress(_SCRIPT.encode("utf-8")))
+
+    assert detect_codec(path) == codec
+    with open_text_input(path) as f:
+        assert parse_numbered_paragraphs(f) == _EXPECTED
+
+
+def test_codec_detected_from_magic_bytes(tmp_path: Path, codec: str) -> None:
+    _, compress = _CODECS[codec]
+    path = tmp_path / "script.txt"
+    path.write_bytes(compress(_SCRIPT.encode("utf-8")))
+
+    assert detect_codec(path) == codec
+    with open_text_input(path) as f:
+        assert parse_numbered_paragraphs(f) == _EXPECTED
+
+
+def test_plain_text_is_not_treated_as_compressed(tmp_path: Path) -> None:
+    path = tmp_path / "script.txt"
+    path.write_text(_SCRIPT, encoding="utf-8")
+
+    assert detect_codec(path) is None
+    with open_text_input(path) as f:
+        assert parse_numbered_paragraphs(f) == parse_numbered_paragraphs(_SCRIPT)
+
+
+@pytest.mark.skipif(_HAS_ZSTD, reason="zstandard is installed")
+def test_zstd_without_zstandard_is_a_clear_error(tmp_path: Path) -> None:
+    path = tmp_path / "script.txt.zst"
+    path.write_bytes(b"\x28\xb5\x2f\xfd")
+
+    with pytest.raises(RuntimeError, match="zstandard is required"):
+        with open_text_input(path):
+            pass
+
+
+def test_stream_parse_stops_reading_after_limit() -> None:
+    consumed: list[str] = []
+
+    def lines():
+        for i in range(1, 1000):
+            consumed.append(f"{i}. text\n")
+            yield f"{i}. text\n"
+
+    paragraphs = parse_numbered_paragraphs(lines(), Selection(limit=2))
+
+    assert [p.id for p in paragraphs] == [1, 2]
+    assert len(consumed) == 3
+
+
+def test_input_dir_picks_up_compressed_scripts(tmp_path: Path, monkeypatch) -> None:
+    in_dir = tmp_path / "in"
+    in_dir.mkdir()
+    (in_dir / "a.txt.gz").write_bytes(gzip.compress(b"1. A\n"))
+    (in_dir / "b.csv.gz").write_bytes(gzip.compress(b"x"))
+
+    sources = collect_sources(input_dir=in_dir)
+    assert [s.name for s in sources] == ["a"]
+
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "generate_prompts",
+            "--input",
+            str(in_dir / "a.txt.gz"),
+            "--output",
+            str(tmp_path / "out.csv"),
+            "--dry-run",
+        ],
+    )
+    assert main() == 0
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import csv
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from generate_prompts import main, worker_main
+from src.openai_client import OpenAIClient, PromptResult
+from src.parser import Paragraph
+from src.work_queue import WorkQueue
+
+
+def _row(task_id: int, prompt: str) -> dict[str, str]:
+    return {
+        "id": str(task_id),
+        "paragraph": "p",
+        "prompt": prompt,
+        "model": "m",
+        "response_id": "r",
+        "timestamp": "t",
+    }
+
+
+def test_expired_lease_is_reclaimed_and_first_result_wins(tmp_path: Path) -> None:
+    queue = WorkQueue(tmp_path / "q.db", lease_seconds=0.05, max_attempts=2)
+    assert queue.enqueue("doc", [Paragraph(id=1, text="a")]) == 1
+    assert queue.enqueue("doc", [Paragraph(id=1, text="a")]) == 0
+
+    first = queue.claim("crashed")
+    assert first is not None and first.attempts == 1
+    assert queue.claim("other") is None
+    time.sleep(0.1)
+
+    second = queue.claim("other")
+    assert second is not None and second.attempts == 2
+    assert queue.complete(second, _row(1, "second"))
+    # The first worker was only slow; its late result is dropped.
+    assert not queue.complete(first, _row(1, "first"))
+    assert queue.counts().done == 1
+    assert queue.next_expiry() is None
+    queue.close()
+
+
+def test_failed_attempts_are_retried_up_to_the_limit(tmp_path: Path) -> None:
+    queue = WorkQueue(tmp_path / "q.db", max_attempts=2)
+    _ = queue.enqueue("doc", [Paragraph(id=1, text="a")])
+
+    for _ in range(2):
+        task = queue.claim("w")
+        assert task is not None
+        queue.release(task, "w", "boom")
+    assert queue.claim("w") is None
+    assert queue.counts().failed == 1
+    queue.close()
+
+
+def test_workers_share_a_queue_and_store_each_paragraph_once(
+    tmp_path: Path, monkeypatch
+) -> None:
+    inp = tmp_path / "script.txt"
+    inp.write_text("".join(f"{i}. Text {i}\n" for i in range(1, 21)), encoding="utf-8")
+    db = tmp_path / "queue.db"
+    calls: list[int] = []
+    lock = threading.Lock()
+
+    def fake_generate_prompt(
+        self, *, paragraph_id: int, paragraph_text: str
+    ) -> PromptResult:
+        with lock:
+            calls.append(paragraph_id)
+            # Paragraph 7 fails on its first attempt only.
+            if paragraph_id == 7 and calls.count(7) == 1:
+                raise RuntimeError("rate limited")
+        time.sleep(0.01)
+        return PromptResult(
+            prompt=f"prompt {paragraph_text}", model="m", response_id="r", timestamp="t"
+        )
+
+    monkeypatch.setattr(OpenAIClient, "generate_prompt", fake_generate_prompt)
+    monkeypatch.setattr(
+        "sys.argv", ["generate_prompts", "--input", str(inp), "--queue", str(db)]
+    )
+    assert main() == 0
+
+    codes: list[int] = []
+    threads = [
+        threading.Thread(
+            target=lambda n=n: codes.append(
+                worker_main(["--queue", str(db), "--workers", "2", "--worker-id", n])
+            )
+        )
+        for n in ("a", "b")
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert codes == [0, 0]
+    assert sorted(calls) == sorted([*range(1, 21), 7])
+
+    out = tmp_path / "out.csv"
+    monkeypatch.setattr(
+        "sys.argv",
+        ["generate_prompts", "export", "--sqlite", str(db), "--output", str(out)],
+    )
+    assert main() == 0
+    with out.open(encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["id"] for r in rows] == [str(i) for i in range(1, 21)]
+    assert rows[6]["prompt"] == "prompt Text 7"
+    # Exporting must not switch the queue to WAL, which shared filesystems
+    # cannot use.
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+
+
+def test_worker_survives_failed_renewals_and_stops_claiming_when_they_persist(
+    tmp_path: Path, monkeypatch, capsys
+) -> None:
+    db = tmp_path / "queue.db"
+    queue = WorkQueue(db)
+    _ = queue.enqueue("doc", [Paragraph(id=i, text=f"p{i}") for i in range(1, 6)])
+    queue.close()
+    calls: list[int] = []
+
+    def slow_generate_prompt(
+        self, *, paragraph_id: int, paragraph_text: str
+    ) -> PromptResult:
+        calls.append(paragraph_id)
+        time.sleep(0.1)
+        return PromptResult(
+            prompt=f"prompt {paragraph_text}", model="m", response_id="r", timestamp="t"
+        )
+
+    def locked(self, owner: str) -> None:
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(OpenAIClient, "generate_prompt", slow_generate_prompt)
+    monkeypatch.setattr(WorkQueue, "renew", locked)
+    argv = ["--queue", str(db), "--lease-seconds", "0.03", "--worker-id", "w"]
+
+    # The heartbeat keeps running after a failure; once renewals keep failing
+    # the worker finishes its paragraph and claims no more.
+    assert worker_main(argv) == 1
+    assert calls == [1]
+    err = capsys.readouterr().err
+    assert err.count("lease renewal failed: database is locked") >= 3
+    assert "claiming no more" in err
+
+    # A single failure is only retried.
+    failed: list[str] = []
+
+    def locked_once(self, owner: str) -> None:
+        if not failed:
+            failed.append(owner)
+            raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(WorkQueue, "renew", locked_once)
+    argv = ["--queue", str(db), "--lease-seconds", "0.6", "--worker-id", "w"]
+    assert worker_main(argv) == 0
+    assert calls == [1, 2, 3, 4, 5]
+    assert failed == ["w"]
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src import yandex_docx
+
+
+class _FileServer(ThreadingHTTPServer):
+    # Serves ``payload`` at any path. The first ``drop_after`` responses stop
+    # after ``cut`` bytes and close the connection; Range is honoured unless
+    # ``ignore_range`` is set.
+    payload: bytes = b""
+    cut: int = 0
+    drop_after: int = 0
+    ignore_range: bool = False
+    ranges: list[str | None]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: _FileServer
+
+    def do_GET(self) -> None:
+        srv = self.server
+        header = self.headers.get("Range")
+        srv.ranges.append(header)
+
+        start = 0
+        if header is not None and not srv.ignore_range:
+            start = int(header.removeprefix("bytes=").rstrip("-"))
+        body = srv.payload[start:]
+
+        self.send_response(206 if start else 200)
+        if start:
+            end = len(srv.payload) - 1
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(srv.payload)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        if len(srv.ranges) <= srv.drop_after:
+            _ = self.wfile.write(body[: srv.cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        _ = self.wfile.write(body)
+
+
+@pytest.fixture
+def server(serve, monkeypatch) -> _FileServer:
+    srv = serve(_FileServer, _Handler)
+    srv.ranges = []
+    url = f"http://127.0.0.1:{srv.server_address[1]}/file.docx"
+    monkeypatch.setattr(
+        yandex_docx, "resolve_public_download_href", lambda _, **kwargs: url
+    )
+    monkeypatch.setattr(
+        yandex_docx,
+        "_default_fetcher",
+        yandex_docx.HttpFetcher(yandex_docx.FetcherConfig(backoff_base=0)),
+    )
+    return srv
+
+
+def test_download_public_buffer_spills_large_files(server: _FileServer) -> None:
+    server.payload = b"x" * 4096
+
+    small = yandex_docx.download_public_buffer("https://disk/x", spill_threshold=1024)
+    large = yandex_docx.download_public_buffer("https://disk/x")
+    try:
+        assert small.read() == server.payload
+        assert large.read() == server.payload
+        assert small._rolled
+        assert not large._rolled
+    finally:
+        small.close()
+        large.close()
+
+
+def test_dropped_download_resumes_with_range(server: _FileServer) -> None:
+    server.payload = bytes(range(256)) * 1000
+    server.cut = 10_000
+    server.drop_after = 2
+    seen: list[yandex_docx.DownloadStats] = []
+
+    with yandex_docx.download_public_buffer(
+        "https://disk/x", report=seen.append
+    ) as buf:
+        assert buf.read() == server.payload
+
+    assert server.ranges == [None, "bytes=10000-", "bytes=20000-"]
+    assert seen[0].size == len(server.payload)
+    assert seen[0].attempts == 3
+
+
+def test_server_ignoring_range_restarts_from_scratch(server: _FileServer) -> None:
+    server.payload = b"abcdef" * 5000
+    server.cut = 1000
+    server.drop_after = 1
+    server.ignore_range = True
+    seen: list[yandex_docx.DownloadStats] = []
+
+    with yandex_docx.download_public_buffer(
+        "https://disk/x", report=seen.append
+    ) as buf:
+        assert buf.read() == server.payload
+
+    assert seen[0].attempts == 2
+
+
+def test_incomplete_download_gives_up_after_retries(server: _FileServer) -> None:
+    server.payload = b"z" * 5000
+    server.cut = 100
+    server.drop_after = 100
+
+    with pytest.raises(RuntimeError, match=r"incomplete after 3 attempt\(s\)"):
+        _ = yandex_docx.download_public_buffer("https://disk/x", retries=2)
+
+
+class _ListingServer(ThreadingHTTPServer):
+    entries: list[dict[str, object]]
+    offsets: list[str]
+
+
+class _ListingHandler(BaseHTTPRequestHandler):
+    server: _ListingServer
+
+    def do_GET(self) -> None:
+        query = parse_qs(urlparse(self.path).query)
+        offset = int(query["offset"][0])
+        limit = int(query["limit"][0])
+        self.server.offsets.append(str(offset))
+        payload = {
+            "type": "dir",
+            "_embedded": {
+                "items": self.server.entries[offset : offset + limit],
+                "total": len(self.server.entries),
+            },
+        }
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        _ = self.wfile.write(body)
+
+
+def test_list_public_folder_pages_and_filters_docx(serve, monkeypatch) -> None:
+    srv = serve(_ListingServer, _ListingHandler)
+    srv.entries = [
+        {"type": "file", "name": f"{i:02}.docx", "path": f"/{i:02}.docx"}
+        for i in range(5)
+    ]
+    srv.entries += [
+        {"type": "file", "name": "notes.txt", "path": "/notes.txt"},
+        {"type": "dir", "name": "sub.docx", "path": "/sub.docx"},
+    ]
+    srv.offsets = []
+    monkeypatch.setattr(
+        yandex_docx,
+        "_YANDEX_PUBLIC_RESOURCES_ENDPOINT",
+        f"http://127.0.0.1:{srv.server_address[1]}",
+    )
+    items = yandex_docx.list_public_folder("https://disk/d/folder", page_size=3)
+
+    assert [it.path for it in items] == [f"/{i:02}.docx" for i in range(5)]
+    assert srv.offsets == ["0", "3", "6"]
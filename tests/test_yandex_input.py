@@ -1,25 +1,32 @@
 from __future__ import annotations
 
+import io
 from pathlib import Path
+from typing import IO
 
 from generate_prompts import main
 from src.openai_client import PromptResult
+from src.parser import Paragraph
 
 
 def test_yandex_url_downloads_and_reads_docx(tmp_path: Path, monkeypatch) -> None:
     out = tmp_path / "out.csv"
 
-    def fake_download(public_url: str, dest: Path) -> None:
+    def fake_download(public_url: str, **kwargs: object) -> IO[bytes]:
         assert public_url == "https://yandex.example/public"
-        dest.write_bytes(b"fake-docx")
+        return io.BytesIO(b"fake-docx")
 
-    monkeypatch.setattr("generate_prompts.download_public_file", fake_download)
+    monkeypatch.setattr("src.yandex_docx.download_public_buffer", fake_download)
 
-    def fake_read_docx_text(path: Path) -> str:
-        assert path.read_bytes() == b"fake-docx"
-        return "1. Hello\n"
+    def fake_iter_docx_paragraphs(
+        source: IO[bytes], *, selection: object = None
+    ) -> list[Paragraph]:
+        assert source.read() == b"fake-docx"
+        return [Paragraph(id=1, text="Hello")]
 
-    monkeypatch.setattr("generate_prompts.read_docx_text", fake_read_docx_text)
+    monkeypatch.setattr(
+        "generate_prompts.iter_docx_paragraphs", fake_iter_docx_paragraphs
+    )
 
     from src.openai_client import OpenAIClient
 